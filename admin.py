@@ -0,0 +1,408 @@
+# admin.py
+# Admin pages, and the maintenance commands behind the `flask` CLI
+# (upgrade-db, import-voters, reconcile-tallies, reconcile-stats, purge-election,
+# export-election, archive-elections).
+# Forms and the migration code are imported where they're used, so building
+# the app (e.g. a freshly started worker) doesn't pay for them up front.
+import click
+import logging
+from functools import wraps
+from flask import Blueprint, Response, stream_with_context, current_app, render_template, redirect, url_for, flash, request, make_response
+from flask_login import login_required, current_user
+from models import db, User, Election, Candidate, ElectionSummary, PurgeJob
+from roster import import_roster, voter_page, start_import, import_in_background, recent_imports
+from dashboard import listing_version, bump_listing_version
+from tally import reconcile_counters, bump_tally_version
+from timeutil import utcnow, local_to_utc
+from cache import results_cache
+from identity import identity_cache
+from eligibility import eligibility_cache
+from stats import bump_counter, site_stats, reconcile_stats
+from purge import start_purge, purge_election, purge_in_background
+from httpcache import make_etag, viewer_key, is_not_modified, cache_headers, not_modified_response
+from metrics import request_metrics
+import export
+
+admin = Blueprint('admin', __name__, cli_group=None)
+logger = logging.getLogger(__name__)
+
+
+# Admin required decorator
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_admin:
+            flash('You need administrator privileges to access this page.', 'danger')
+            return redirect(url_for('public.index'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+# --- Add Admin Voter Management Route ---
+@admin.route('/admin/voters', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def manage_voters():
+    from forms import VoterForm, VoterImportForm
+    voter_form = VoterForm()
+    if voter_form.validate_on_submit():
+        try:
+            new_voter = User(id=voter_form.user_id.data, is_admin=voter_form.is_admin.data)
+            new_voter.set_password(voter_form.password.data)
+            db.session.add(new_voter)
+            bump_counter('users')
+            db.session.commit()
+            identity_cache.invalidate(new_voter.id)
+            flash(f'Voter {new_voter.id} added successfully.', 'success')
+            return redirect(url_for('admin.manage_voters')) # Redirect to clear form
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error adding voter: {e}', 'danger')
+
+    # One keyset-paginated page of voters, with vote counts for that page only
+    search = request.args.get('q', '').strip()
+    import_jobs = recent_imports()
+    now = utcnow()
+    page = voter_page(current_app.config['VOTERS_PAGE_SIZE'],
+                      after=request.args.get('after') or None,
+                      before=request.args.get('before') or None,
+                      prefix=search or None)
+
+    return render_template('admin/manage_voters.html',
+                           title='Manage Voters',
+                           voters=page.voters,
+                           voter_form=voter_form,
+                           import_form=VoterImportForm(),
+                           user_vote_counts=page.vote_counts,
+                           search=search,
+                           prev_before=page.prev_before,
+                           next_after=page.next_after,
+                           import_jobs=import_jobs,
+                           stale_import_ids={job.id for job in import_jobs
+                                             if job.is_stale(now, current_app.config['JOB_STALE_AFTER'])})
+
+# --- Bulk Voter Import (CSV roster) ---
+@admin.route('/admin/voters/import', methods=['POST'])
+@login_required
+@admin_required
+def import_voters():
+    from forms import VoterImportForm
+    import_form = VoterImportForm()
+    if not import_form.validate_on_submit():
+        for errors in import_form.errors.values():
+            for error in errors:
+                flash(f'Import failed: {error}', 'danger')
+        return redirect(url_for('admin.manage_voters'))
+
+    # Hashing every password takes far longer than a request may, so the saved
+    # upload is imported in the background; progress is shown on Manage Voters
+    job, path = start_import(import_form.roster.data)
+    import_in_background(job.id, path)
+    flash(f'Importing {job.filename} in the background; progress is shown below.', 'success')
+    return redirect(url_for('admin.manage_voters'))
+
+# --- Add Admin Election List Route ---
+@admin.route('/admin/election_list')
+@login_required
+@admin_required
+def admin_election_list():
+     # Moves whenever an election is added, deleted, archived, opens or closes
+     version = listing_version(utcnow())
+     # Purge progress changes the page too
+     purge_jobs = PurgeJob.query.filter(PurgeJob.status != 'done').order_by(PurgeJob.started_at).all()
+     stale_purge_ids = {job.election_id for job in purge_jobs
+                        if job.is_stale(utcnow(), current_app.config['JOB_STALE_AFTER'])}
+     purge_state = [(job.election_id, job.status, job.deleted_rows, job.election_id in stale_purge_ids)
+                    for job in purge_jobs]
+     etag = make_etag('elections', *version, purge_state, viewer_key())
+     if is_not_modified(etag):
+         return not_modified_response(etag)
+
+     elections = Election.query.order_by(Election.start_time.desc()).all()
+     # Check if we just created a new election
+     just_created = request.args.get('created', False)
+
+     # Pass datetime if needed by template (e.g., for status calculation)
+     response = make_response(render_template('admin/election_list.html',
+                            title='All Elections',
+                            elections=elections,
+                            purge_jobs=purge_jobs,
+                            purging_ids={job.election_id for job in purge_jobs
+                                         if job.status == 'running' and job.election_id not in stale_purge_ids},
+                            stale_purge_ids=stale_purge_ids,
+                            just_created=just_created
+                           ))
+     return cache_headers(response, etag)
+
+
+# Delete Election Route
+@admin.route('/admin/delete_election/<int:election_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_election(election_id):
+    # Get the election
+    election = Election.query.get_or_404(election_id)
+    election_name = election.name
+
+    try:
+        # Deactivate it and hand the row deletion to a background purge, which
+        # deletes in small chunks so voters in other elections aren't blocked
+        start_purge(election)
+        db.session.commit()
+        eligibility_cache.clear()
+        purge_in_background(election_id)
+
+        flash(f'Election "{election_name}" is being deleted. Progress is shown below.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error deleting election: {e}', 'danger')
+
+    return redirect(url_for('admin.admin_election_list'))
+
+
+# Audit export of an election's votes or turnout, streamed in chunks
+@admin.route('/admin/elections/<int:election_id>/export/<table>')
+@login_required
+@admin_required
+def export_election(election_id, table):
+    election = Election.query.get_or_404(election_id)
+    fmt = request.args.get('format', 'csv')
+    if table not in export.TABLES or fmt not in export.FORMATS:
+        flash(f'Unknown export "{table}" ({fmt}).', 'danger')
+        return redirect(url_for('admin.admin_election_list'))
+    if _archive_in_progress(election):
+        flash(f'"{election.name}" is being archived; export it once archiving has finished.', 'warning')
+        return redirect(url_for('admin.admin_election_list'))
+
+    chunks = export.export_election(election.id, table, fmt, current_app.config['EXPORT_CHUNK_SIZE'],
+                                    archived=election.archived_at is not None)
+    response = Response(stream_with_context(chunks),
+                        mimetype='text/csv' if fmt == 'csv' else 'application/octet-stream')
+    response.headers['Content-Disposition'] = f'attachment; filename={export.export_filename(election.id, table, fmt)}'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Admin Dashboard
+@admin.route('/admin')
+@login_required
+@admin_required
+def admin_dashboard():
+    # Totals come from running counters, so this doesn't scan the user or vote tables
+    stats = site_stats(utcnow())
+
+    return render_template('admin/dashboard.html',
+                          title='Admin Dashboard',
+                          user_count=stats.users,
+                          election_count=stats.elections,
+                          vote_count=stats.votes,
+                          active_elections=stats.active,
+                          cache_stats=results_cache.stats())
+
+
+# Per-endpoint request metrics (Prometheus text format; this worker process only)
+@admin.route('/admin/metrics')
+@login_required
+@admin_required
+def metrics():
+    return Response(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Manage Elections
+@admin.route('/admin/elections', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def manage_elections():
+    from forms import ElectionForm
+    form = ElectionForm()
+    if form.validate_on_submit():
+        try:
+            election = Election(
+                name=form.name.data,
+                position=form.position.data,
+                # The form takes display-timezone wall-clock times; store UTC
+                start_time=local_to_utc(form.start_time.data),
+                end_time=local_to_utc(form.end_time.data),
+                is_active=form.is_active.data,
+                voting_method=form.voting_method.data,
+                seats=form.seats.data or 1
+            )
+            db.session.add(election)
+            bump_counter('elections')
+            bump_listing_version()
+            db.session.commit()
+            # Every cached dashboard is missing the new election
+            eligibility_cache.clear()
+            flash(f'Election "{election.name}" created successfully.', 'success')
+            return redirect(url_for('admin.admin_election_list', created=True))
+        except Exception as e:
+            db.session.rollback()
+            logger.exception('Creating election failed')
+            flash(f'Error creating election: {e}', 'danger')
+    elif form.is_submitted():
+        logger.debug('Election form rejected: %s', form.errors)
+
+    return render_template('admin/manage_elections.html',
+                          title='Manage Elections',
+                          form=form)
+
+
+# Manage Candidates
+@admin.route('/admin/elections/<int:election_id>/candidates', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def manage_candidates(election_id):
+    # Get the election
+    election = Election.query.get_or_404(election_id)
+
+    # Get existing candidates
+    candidates = Candidate.query.filter_by(election_id=election_id).all()
+
+    # Create form
+    from forms import CandidateForm
+    form = CandidateForm()
+
+    if form.validate_on_submit():
+        try:
+            # Create new candidate
+            candidate = Candidate(
+                name=form.name.data,
+                election_id=election_id
+            )
+            db.session.add(candidate)
+            # The results list gains a row: new ETag and results cache key
+            bump_tally_version(election_id)
+            db.session.commit()
+            flash(f'Candidate "{form.name.data}" added successfully.', 'success')
+            return redirect(url_for('admin.manage_candidates', election_id=election_id))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error adding candidate: {e}', 'danger')
+
+    return render_template('admin/manage_candidates.html',
+                          title=f'Manage Candidates - {election.name}',
+                          election=election,
+                          candidates=candidates,
+                          form=form)
+
+
+# Upgrade an existing database (new tables and indexes) in place
+@admin.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Add missing tables and indexes to an existing database."""
+    from migrations import upgrade_database
+    changes = upgrade_database()
+    if not changes:
+        click.echo('Database schema is already up to date.')
+        return
+    for change in changes:
+        click.echo(change)
+
+
+# Bulk-import voters from a CSV roster
+@admin.cli.command('import-voters')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='Rows per batch insert.')
+@click.option('--workers', type=int, default=None, help='Password hashing processes (default: CPU count).')
+def import_voters_command(csv_file, chunk_size, workers):
+    """Import voters from CSV_FILE (user_id,password[,is_admin])."""
+    report = import_roster(csv_file, chunk_size=chunk_size, workers=workers)
+    for error in report.errors:
+        click.echo(f'Line {error.line} ({error.user_id}): {error.message}', err=True)
+    click.echo(f'Imported {report.imported} voter(s); skipped {report.skipped} row(s).')
+
+
+# Rebuild the CandidateTally counters from the raw vote table
+@admin.cli.command('reconcile-tallies')
+@click.option('--election-id', type=int, default=None, help='Only reconcile this election.')
+def reconcile_tallies_command(election_id):
+    """Recount votes per candidate and fix any counter drift."""
+    # Elections whose counters it fixes get their tally_version bumped, which
+    # retires their cached results in every worker
+    drift = reconcile_counters(election_id)
+    db.session.commit()
+    if not drift:
+        click.echo('All tallies match the vote table.')
+        return
+    for eid, candidate_id, stored, actual in drift:
+        click.echo(f'Election {eid} candidate {candidate_id}: counter {stored} -> {actual}')
+    click.echo(f'Fixed {len(drift)} tally counter(s).')
+
+
+# Recount the admin dashboard counters from the tables (safe to run from cron)
+@admin.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Recount users, elections and per-election votes and fix counter drift."""
+    drift = reconcile_stats()
+    db.session.commit()
+    if not drift:
+        click.echo('All dashboard counters match the tables.')
+        return
+    for name, stored, actual in drift:
+        click.echo(f'{name}: counter {stored} -> {actual}')
+    click.echo(f'Fixed {len(drift)} dashboard counter(s).')
+
+
+# Delete an election from the command line, in the foreground
+@admin.cli.command('purge-election')
+@click.argument('election_id', type=int)
+@click.option('--chunk-size', default=None, type=int, help='Rows deleted per transaction.')
+def purge_election_command(election_id, chunk_size):
+    """Delete an election and all its ballots in small transactions."""
+    election = db.session.get(Election, election_id)
+    if election is None:
+        job = db.session.get(PurgeJob, election_id)
+        if job is None or job.status == 'done':
+            raise click.ClickException(f'No election with id {election_id}.')
+    else:
+        job = start_purge(election)
+        db.session.commit()
+    purge_election(election_id,
+                   chunk_size=chunk_size or current_app.config['PURGE_CHUNK_SIZE'],
+                   pause=current_app.config['PURGE_CHUNK_PAUSE'])
+    click.echo(f'Deleted election "{job.election_name}" ({job.total_rows} rows).')
+
+
+# Write an election's votes or turnout to a file (or stdout) for audit
+@admin.cli.command('export-election')
+@click.argument('election_id', type=int)
+@click.option('--table', type=click.Choice(sorted(export.TABLES)), default='votes', show_default=True)
+@click.option('--format', 'fmt', type=click.Choice(export.FORMATS), default='csv', show_default=True)
+@click.option('--output', type=click.File('wb'), default='-', help='File to write (default: stdout).')
+@click.option('--chunk-size', default=None, type=int, help='Rows fetched and written at a time.')
+def export_election_command(election_id, table, fmt, output, chunk_size):
+    """Export an election's raw votes or turnout as CSV or columnar binary."""
+    election = db.session.get(Election, election_id)
+    if election is None:
+        raise click.ClickException(f'No election with id {election_id}.')
+    if _archive_in_progress(election):
+        raise click.ClickException(f'Election {election_id} is being archived; run archive-elections first.')
+    for chunk in export.export_election(election_id, table, fmt,
+                                        chunk_size or current_app.config['EXPORT_CHUNK_SIZE'],
+                                        archived=election.archived_at is not None):
+        output.write(chunk)
+
+
+def _archive_in_progress(election):
+    # Its rows are split between the live and archive databases until the move finishes
+    return election.archived_at is not None and db.session.query(ElectionSummary.status).filter(
+        ElectionSummary.election_id == election.id).scalar() != 'done'
+
+
+# Freeze results and move ballots of long-finished elections to the archive database (cron)
+@admin.cli.command('archive-elections')
+@click.option('--after-days', type=int, default=None,
+              help='Archive elections ended more than this many days ago (default: ARCHIVE_AFTER_DAYS).')
+@click.option('--dry-run', is_flag=True, help='Only list the elections that would be archived.')
+def archive_elections_command(after_days, dry_run):
+    """Move finished elections' ballots to the archive database."""
+    from archive import archive_due_elections, due_elections
+    if dry_run:
+        days = current_app.config['ARCHIVE_AFTER_DAYS'] if after_days is None else after_days
+        for election in due_elections(utcnow(), days):
+            click.echo(f'Would archive election {election.id} "{election.name}" ({election.vote_count} votes).')
+        return
+    archived = archive_due_elections(after_days=after_days)
+    for election, moved in archived:
+        click.echo(f'Archived election {election.id} "{election.name}": {moved} rows moved.')
+    click.echo(f'Archived {len(archived)} election(s).')
@@ -0,0 +1,243 @@
+# api.py
+# Read-only JSON API (/api/v1) for kiosks and displays, so they don't have to
+# scrape index.html/results.html.
+#
+# - ?fields=id,name,... picks the fields returned; only those columns are
+#   selected from the database.
+# - Lists are keyset-paginated by id: ?limit=N&after=<last id>, with the next
+#   page's URL in "next".
+# - Responses carry an ETag (and Cache-Control), so pollers get a bodiless 304.
+# - Results follow the same visibility rule as the results page and come
+#   from the same results cache. So does vote_count: a running election's
+#   turnout is left out for everyone but admins.
+import json
+import datetime
+from flask import Blueprint, Response, current_app, request, url_for
+from flask_login import current_user
+from models import db, Election, Candidate, results_visible
+from tally import compute_tally
+from dashboard import is_open, get_dashboard_elections
+from timeutil import utcnow
+from cache import results_cache
+from httpcache import make_etag, viewer_key, shareable, is_not_modified, cache_headers, not_modified_response
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+ELECTION_FIELDS = {
+    'id': Election.id,
+    'name': Election.name,
+    'position': Election.position,
+    'start_time': Election.start_time,
+    'end_time': Election.end_time,
+    'is_active': Election.is_active,
+    'vote_count': Election.vote_count,
+    'voting_method': Election.voting_method,
+    'seats': Election.seats,
+}
+CANDIDATE_FIELDS = {
+    'id': Candidate.id,
+    'name': Candidate.name,
+}
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@api.errorhandler(ApiError)
+def api_error(e):
+    return json_response({'error': e.message}, e.status)
+
+
+@api.errorhandler(404)
+def api_not_found(e):
+    return json_response({'error': 'Not found.'}, 404)
+
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def json_response(payload, status=200):
+    """Compact JSON (no whitespace) regardless of the app's debug setting."""
+    body = json.dumps(payload, separators=(',', ':'), default=_encode)
+    return Response(body, status=status, mimetype='application/json')
+
+
+def cached_json(payload, etag, public=False, max_age=0):
+    """200 with validators, or 304 if the client already has this version."""
+    if is_not_modified(etag):
+        return not_modified_response(etag, public=public, max_age=max_age)
+    return cache_headers(json_response(payload), etag, public=public, max_age=max_age)
+
+
+def requested_fields(available):
+    """The ?fields= selection as a list of names (all of `available` by default)."""
+    raw = request.args.get('fields')
+    if not raw:
+        return list(available)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(400, f'Unknown field(s): {", ".join(unknown)}. '
+                            f'Available: {", ".join(available)}.')
+    return fields
+
+
+def select_rows(columns, fields, query_filter, order_by, limit=None):
+    """Query only the selected columns; returns a list of dicts."""
+    query = db.session.query(*(columns[name] for name in fields)).filter(*query_filter).order_by(order_by)
+    if limit is not None:
+        query = query.limit(limit)
+    return [dict(zip(fields, row)) for row in query.all()]
+
+
+def select_elections(fields, query_filter, now, limit=None):
+    """select_rows() over ELECTION_FIELDS, plus each row's id (callers drop it if
+    not asked for). vote_count is left out where the viewer may not see the
+    results yet; end_time and is_active are selected to tell."""
+    extra = [name for name in ('end_time', 'is_active') if 'vote_count' in fields and name not in fields]
+    select = ([] if 'id' in fields else ['id']) + fields + extra
+    rows = select_rows(ELECTION_FIELDS, select, query_filter, Election.id, limit)
+    for row in rows:
+        if 'vote_count' in row and not results_visible(row['end_time'], row['is_active'], current_user, now):
+            del row['vote_count']
+        for name in extra:
+            del row[name]
+    return rows
+
+
+def _page_size():
+    limit = request.args.get('limit', type=int) or current_app.config['API_PAGE_SIZE']
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+
+def _status_filter(status, now):
+    if status == 'open':
+        return [is_open(now)]
+    if status == 'upcoming':
+        return [Election.is_active == True, Election.start_time > now]
+    if status == 'finished':
+        return [Election.end_time < now]
+    if status == 'all':
+        return []
+    raise ApiError(400, 'status must be one of: all, open, upcoming, finished.')
+
+
+@api.route('/elections')
+def elections():
+    now = utcnow()
+    fields = requested_fields(ELECTION_FIELDS)
+    limit = _page_size()
+    after = request.args.get('after', type=int)
+    status = request.args.get('status', 'all')
+
+    query_filter = _status_filter(status, now)
+    if after is not None:
+        query_filter.append(Election.id > after)
+    rows = select_elections(fields, query_filter, now, limit + 1)
+
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_url = url_for('api.elections', status=status, fields=request.args.get('fields'),
+                           limit=limit, after=rows[-1]['id'])
+    if 'id' not in fields:
+        for row in rows:
+            del row['id']
+
+    payload = {'items': rows, 'next': next_url}
+    # The same for every anonymous viewer (admins also get running elections'
+    # vote_count); vote_count moves with each ballot, so keep max-age short
+    etag = make_etag('api-elections', json.dumps(payload, default=_encode))
+    return cached_json(payload, etag, public=shareable(), max_age=current_app.config['API_MAX_AGE'])
+
+
+@api.route('/elections/<int:election_id>')
+def election_detail(election_id):
+    fields = requested_fields(list(ELECTION_FIELDS) + ['candidates'])
+    election_fields = [name for name in fields if name != 'candidates']
+
+    payload = {}
+    if election_fields:
+        rows = select_elections(election_fields, [Election.id == election_id], utcnow())
+        if not rows:
+            raise ApiError(404, 'Election not found.')
+        payload = rows[0]
+        if 'id' not in election_fields:
+            del payload['id']
+    elif db.session.get(Election, election_id) is None:
+        raise ApiError(404, 'Election not found.')
+    if 'candidates' in fields:
+        payload['candidates'] = select_rows(CANDIDATE_FIELDS, list(CANDIDATE_FIELDS),
+                                            [Candidate.election_id == election_id], Candidate.id)
+
+    etag = make_etag('api-election', json.dumps(payload, default=_encode))
+    return cached_json(payload, etag, public=shareable(), max_age=current_app.config['API_MAX_AGE'])
+
+
+@api.route('/elections/<int:election_id>/results')
+def election_results(election_id):
+    election = db.session.get(Election, election_id)
+    if election is None:
+        raise ApiError(404, 'Election not found.')
+    now = utcnow()
+    if not election.results_visible_to(current_user, now):
+        raise ApiError(403, 'Results are not available until the election has ended.')
+
+    # Versioned exactly like the results page: a 304 costs one primary-key lookup
+    ended = election.has_ended(now)
+    etag = make_etag('api-results', election.id, election.tally_version, ended, viewer_key())
+    public = ended and shareable()
+    max_age = current_app.config['RESULTS_PUBLIC_MAX_AGE'] if public else 0
+    if is_not_modified(etag):
+        return not_modified_response(etag, public=public, max_age=max_age)
+
+    if election.archived_at is not None:
+        from archive import load_frozen_result
+        payload = results_cache.get_or_compute(election_id, election.tally_version, load_frozen_result,
+                                               ended=True).as_dict()
+    elif election.is_ranked:
+        from ranked import compute_ranked_result
+        payload = results_cache.get_or_compute(election_id, election.tally_version, compute_ranked_result,
+                                               ended=ended).as_dict()
+    else:
+        payload = results_cache.get_or_compute(election_id, election.tally_version, compute_tally,
+                                               ended=ended).as_dict()
+    payload['ended'] = ended
+    return cache_headers(json_response(payload), etag, public=public, max_age=max_age)
+
+
+@api.route('/me/elections')
+def my_elections():
+    """The index() dashboard buckets for the logged-in user.
+
+    The user's open/voted lists come from the eligibility cache, so their
+    vote_count may be up to ELIGIBILITY_CACHE_TTL seconds old.
+    """
+    if not current_user.is_authenticated:
+        raise ApiError(401, 'Log in to see your elections.')
+    fields = requested_fields(ELECTION_FIELDS)
+    now = utcnow()
+    buckets = get_dashboard_elections(current_user.id, now)
+
+    def pick(election):
+        row = {name: getattr(election, name) for name in fields}
+        if 'vote_count' in row and not results_visible(election.end_time, election.is_active, current_user, now):
+            del row['vote_count']
+        return row
+
+    payload = {
+        'available': [pick(election) for election in buckets.available],
+        'voted': [dict(pick(election), has_ended=bool(has_ended)) for election, has_ended in buckets.voted],
+        'upcoming': [pick(election) for election in buckets.upcoming],
+        'finished': [pick(election) for election in buckets.finished],
+    }
+    etag = make_etag('api-me', viewer_key(), json.dumps(payload, default=_encode))
+    return cached_json(payload, etag)
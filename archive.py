@@ -0,0 +1,196 @@
+# archive.py
+# Cold archival of finished elections. Without it every ballot ever cast
+# stays in the vote / ranked_ballot / user_vote_status tables, and their
+# indexes and counts keep growing term after term.
+#
+# An election ARCHIVE_AFTER_DAYS past its end_time is archived in two steps:
+# 1. Its final results (a TallyResult, or a RankedResult for ranked
+#    elections) are frozen as JSON into ElectionSummary and
+#    Election.archived_at is set, in one transaction. From then on the
+#    results page and the API serve the summary.
+# 2. Its raw rows move, ARCHIVE_CHUNK_SIZE at a time, into tables of the same
+#    name in a separate archive database (ARCHIVE_DATABASE_URL, default
+#    instance/archive.db). Each chunk is committed to the archive before it
+#    is deleted from the live database, and copying a chunk first drops any
+#    earlier copy of it, so an interrupted run simply resumes.
+#
+# Elections, candidates and the per-candidate counters stay in the live
+# database; they're a row or two per election. Run `flask archive-elections`
+# from cron. Voters' "voted in" lists and vote counts on Manage Voters only
+# cover elections that haven't been archived.
+import os
+import json
+import time
+import logging
+import datetime
+import threading
+from flask import current_app
+from sqlalchemy import MetaData, Table, Column, Index, create_engine, exists, select
+from models import db, Election, Vote, RankedBallot, UserVoteStatus, ElectionSummary, PurgeJob
+from tally import TallyResult, compute_tally_from_votes, bump_tally_version
+from timeutil import utcnow
+from eligibility import eligibility_cache
+from dashboard import bump_listing_version
+
+logger = logging.getLogger(__name__)
+
+# Live tables whose rows move to the archive, in move order
+ARCHIVED_MODELS = (Vote, RankedBallot, UserVoteStatus)
+
+# Copies of those tables for the archive database: same columns and indexes,
+# no foreign keys (elections, candidates and users stay behind)
+_metadata = MetaData()
+_tables = {
+    model: Table(model.__tablename__, _metadata,
+                 *[Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+                   for column in model.__table__.columns],
+                 *[Index(index.name, *[column.name for column in index.columns])
+                   for index in model.__table__.indexes])
+    for model in ARCHIVED_MODELS
+}
+
+
+def archive_table(model):
+    """The archive database's copy of `model`'s table."""
+    return _tables[model]
+
+
+class ArchiveStore:
+    """Connection to the archive database; created (with its tables) on first use."""
+
+    def __init__(self, app=None):
+        self.url = None
+        self._engine = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.url = app.config.get('ARCHIVE_DATABASE_URL') or \
+            'sqlite:///' + os.path.join(app.instance_path, 'archive.db')
+        self._engine = None
+        app.extensions['archive_store'] = self
+
+    @property
+    def engine(self):
+        with self._lock:
+            if self._engine is None:
+                if self.url.startswith('sqlite'):
+                    path = self.url.split(':///', 1)[-1]
+                    if path and path != ':memory:':
+                        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                    options = {'connect_args': {'timeout': 15}}
+                else:
+                    options = {'pool_pre_ping': True}
+                self._engine = create_engine(self.url, **options)
+                _metadata.create_all(self._engine)
+            return self._engine
+
+
+archive_store = ArchiveStore()
+
+
+def due_elections(now, after_days):
+    """Elections to archive: ended more than `after_days` days ago and not archived,
+    or archived but with rows still to move. Elections being deleted are left alone."""
+    cutoff = now - datetime.timedelta(days=after_days)
+    purging = exists().where(PurgeJob.election_id == Election.id, PurgeJob.status != 'done')
+    unfinished = exists().where(ElectionSummary.election_id == Election.id, ElectionSummary.status != 'done')
+    return Election.query.filter(
+        ((Election.archived_at.is_(None) & (Election.end_time < cutoff)) | unfinished), ~purging
+    ).order_by(Election.end_time).all()
+
+
+def freeze_results(election):
+    """Store the election's final results in ElectionSummary and mark it archived."""
+    if election.is_ranked:
+        from ranked import compute_ranked_result
+        result = compute_ranked_result(election.id)
+        total_votes = result.total_ballots
+    else:
+        # Count the raw votes rather than trust the counters one last time
+        result = compute_tally_from_votes(election.id)
+        total_votes = result.total_votes
+    now = utcnow()
+    db.session.add(ElectionSummary(election_id=election.id, total_votes=total_votes,
+                                   result=json.dumps(result.as_dict()), frozen_at=now))
+    election.archived_at = now
+    bump_listing_version()
+    # Results pages switch to the summary (and say so): new ETag and cache key
+    bump_tally_version(election.id)
+    db.session.commit()
+
+
+def load_frozen_result(election_id):
+    """The TallyResult (or RankedResult) frozen for an archived election."""
+    summary = db.session.get(ElectionSummary, election_id)
+    data = json.loads(summary.result)
+    if 'rounds' in data:
+        from ranked import RankedResult
+        return RankedResult.from_dict(data)
+    return TallyResult.from_dict(data)
+
+
+def move_rows(election_id, chunk_size=5000, pause=0.01):
+    """Move an archived election's rows to the archive database, chunk by chunk. Resumable."""
+    moved = 0
+    for model in ARCHIVED_MODELS:
+        live, archived = model.__table__, archive_table(model)
+        while True:
+            rows = [row._asdict() for row in db.session.execute(
+                select(live).where(live.c.election_id == election_id).order_by(live.c.id).limit(chunk_size))]
+            if not rows:
+                break
+            ids = [row['id'] for row in rows]
+            with archive_store.engine.begin() as conn:
+                conn.execute(archived.delete().where(archived.c.id.in_(ids)))
+                conn.execute(archived.insert(), rows)
+            db.session.execute(live.delete().where(live.c.id.in_(ids)))
+            ElectionSummary.query.filter_by(election_id=election_id).update(
+                {'moved_rows': ElectionSummary.moved_rows + len(rows)})
+            db.session.commit()
+            moved += len(rows)
+            if len(rows) < chunk_size:
+                break
+            time.sleep(pause)
+
+    ElectionSummary.query.filter_by(election_id=election_id).update({'status': 'done', 'finished_at': utcnow()})
+    db.session.commit()
+    # Their "voted in" lists just lost this election
+    eligibility_cache.clear()
+    return moved
+
+
+def archive_election(election, chunk_size=5000, pause=0.01):
+    """Freeze an election's results (unless already frozen) and move its rows; returns rows moved."""
+    if election.archived_at is None:
+        freeze_results(election)
+    return move_rows(election.id, chunk_size=chunk_size, pause=pause)
+
+
+def archive_due_elections(now=None, after_days=None):
+    """Archive every due election with the app's ARCHIVE_* settings; returns [(election, rows moved)]."""
+    config = current_app.config
+    after_days = config['ARCHIVE_AFTER_DAYS'] if after_days is None else after_days
+    archived = []
+    for election in due_elections(now or utcnow(), after_days):
+        moved = archive_election(election, chunk_size=config['ARCHIVE_CHUNK_SIZE'],
+                                 pause=config['ARCHIVE_CHUNK_PAUSE'])
+        logger.info('Archived election %s (%s rows moved)', election.id, moved)
+        archived.append((election, moved))
+    return archived
+
+
+def delete_archived(election_id, chunk_size=5000):
+    """Delete an election's rows from the archive database (when the election is purged)."""
+    deleted = 0
+    for model in ARCHIVED_MODELS:
+        table = archive_table(model)
+        while True:
+            chunk = select(table.c.id).where(table.c.election_id == election_id).limit(chunk_size).scalar_subquery()
+            with archive_store.engine.begin() as conn:
+                count = conn.execute(table.delete().where(table.c.id.in_(chunk))).rowcount
+            deleted += count
+            if count < chunk_size:
+                break
+    return deleted
@@ -0,0 +1,84 @@
+# ballot.py
+# Casting a ballot: one transaction that inserts the UserVoteStatus row
+# first and lets the _user_election_uc unique constraint reject a second
+# ballot (no check-then-insert race), then records the Vote and bumps the
+# candidate's counter.
+#
+# The counter is bumped with an upsert (tally.add_to_counter), so the unique
+# constraint is the only IntegrityError that means "already voted".
+#
+# On SQLite a burst of voters queues on the single write lock; "database is
+# locked" errors that outlast the busy timeout are retried with jittered
+# exponential backoff before giving up.
+import time
+import random
+from sqlalchemy.exc import IntegrityError, OperationalError
+from models import db, Vote, UserVoteStatus, RankedBallot
+from tally import increment_counter
+from ranked import pack_ranking
+
+
+class AlreadyVoted(Exception):
+    """The user already has a ballot recorded for this election."""
+
+
+class BallotContention(Exception):
+    """The database stayed locked through every retry; the ballot was NOT recorded."""
+
+
+class ElectionClosed(Exception):
+    """The election isn't taking ballots: inactive, not started, ended or archived."""
+
+
+def _is_duplicate_ballot(error):
+    # The _user_election_uc violation. SQLite names the columns rather than the constraint
+    message = str(error.orig) if error.orig is not None else str(error)
+    return '_user_election_uc' in message or 'user_vote_status.user_id, user_vote_status.election_id' in message
+
+
+def _is_lock_error(error):
+    message = str(error.orig).lower() if error.orig is not None else str(error).lower()
+    # SQLite: "database is locked"/"database table is locked";
+    # PostgreSQL: serialization failures and deadlocks are safe to retry too
+    return 'locked' in message or 'could not serialize' in message or 'deadlock' in message
+
+
+def cast_ballot(user_id, election_id, candidate_id, max_retries=5, base_delay=0.05, ranking=None):
+    """Record one ballot atomically and return the new Vote.
+
+    For a ranked election pass the full `ranking` (candidate ids, most
+    preferred first); candidate_id is then its first choice.
+    Runs in its own transaction: anything pending in the session is rolled
+    back first. Raises AlreadyVoted or BallotContention; any other
+    IntegrityError (say, a candidate deleted meanwhile) propagates as is.
+    """
+    attempt = 0
+    while True:
+        db.session.rollback()
+        try:
+            # Insert-or-fail on the unique (user_id, election_id) pair first, so a
+            # duplicate ballot fails before any other row is written
+            db.session.add(UserVoteStatus(user_id=user_id, election_id=election_id))
+            db.session.flush()
+
+            vote = Vote(election_id=election_id, candidate_id=candidate_id)
+            db.session.add(vote)
+            if ranking is not None:
+                db.session.add(RankedBallot(election_id=election_id, ranking=pack_ranking(ranking)))
+            increment_counter(election_id, candidate_id)
+            db.session.commit()
+            return vote
+        except IntegrityError as e:
+            db.session.rollback()
+            if _is_duplicate_ballot(e):
+                raise AlreadyVoted(f'{user_id} has already voted in election {election_id}') from e
+            raise
+        except OperationalError as e:
+            db.session.rollback()
+            if not _is_lock_error(e) or attempt >= max_retries:
+                if _is_lock_error(e):
+                    raise BallotContention('The voting system is busy, please try again.') from e
+                raise
+            # Full jitter keeps retrying voters from stampeding the lock together
+            time.sleep(random.uniform(0, base_delay * (2 ** attempt)))
+            attempt += 1
@@ -0,0 +1,65 @@
+# benchmarks/bench_api.py
+# Requests/second of the JSON API against the HTML pages showing the same
+# data, for an anonymous client (the kiosk / notice-board case).
+#
+#   python benchmarks/bench_api.py --requests 1000 --elections 2000
+import os
+import time
+import argparse
+
+from common import make_app, seed_election, seed_history
+
+
+def rate(client, path, requests, headers=None):
+    """(requests/second, status, body bytes) for `requests` sequential GETs of `path`."""
+    response = client.get(path, headers=headers)  # Warm up (and fill the results cache)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, response.status_code, len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON API vs HTML requests/sec')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--elections', type=int, default=2000)
+    parser.add_argument('--votes', type=int, default=100000)
+    args = parser.parse_args()
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            seed_history(args.elections)
+            election_id = seed_election(args.votes, num_candidates=20)
+            from tally import reconcile_counters
+            from models import db
+            reconcile_counters(election_id)
+            db.session.commit()
+            db.session.remove()
+
+        client = app.test_client()
+        pairs = [
+            ('dashboard', '/', '/api/v1/elections?status=open'),
+            ('results', f'/results/{election_id}', f'/api/v1/elections/{election_id}/results'),
+        ]
+        print(f"{'data':<12} {'route':<44} {'req/s':>8} {'bytes':>8}")
+        for label, html_path, api_path in pairs:
+            for path in (html_path, api_path):
+                per_second, status, size = rate(client, path, args.requests)
+                assert status == 200, (path, status)
+                print(f'{label:<12} {path:<44} {per_second:>8.0f} {size:>8}')
+
+        # A poller that sends back the ETag it was given
+        etag = client.get(f'/api/v1/elections/{election_id}/results').headers['ETag']
+        per_second, status, _ = rate(client, f'/api/v1/elections/{election_id}/results', args.requests,
+                                     headers={'If-None-Match': etag})
+        print(f"{'revalidate':<12} {'(If-None-Match on the results API)':<44} {per_second:>8.0f} {status:>8}")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
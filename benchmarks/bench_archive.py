@@ -0,0 +1,149 @@
+# benchmarks/bench_archive.py
+# What cold archival (archive.py) buys: the same requests and maintenance
+# jobs timed with every past term's ballots still in the live tables, then
+# again after `archive-elections` has moved them to the archive database.
+#
+#   python benchmarks/bench_archive.py --terms 20 --votes 50000
+import os
+import time
+import argparse
+import datetime
+
+from common import make_app, seed_election, seed_users, timed
+
+PASSWORD = 'bench-password'
+
+
+def seed_turnout(election_id, prefix, count):
+    """Record voters <prefix>0000000.. as having voted in `election_id`."""
+    from models import db, UserVoteStatus
+    now = datetime.datetime.now(datetime.timezone.utc)
+    db.session.execute(UserVoteStatus.__table__.insert(),
+                       [{'user_id': f'{prefix}{i:07d}', 'election_id': election_id, 'timestamp': now}
+                        for i in range(count)])
+    db.session.commit()
+
+
+def age(election_id, days):
+    """Move an election's voting period `days` further into the past."""
+    from models import db, Election
+    election = db.session.get(Election, election_id)
+    election.start_time -= datetime.timedelta(days=days)
+    election.end_time -= datetime.timedelta(days=days)
+    db.session.commit()
+
+
+def live_size():
+    """(vote rows, user_vote_status rows, MB of used pages) in the live database."""
+    from sqlalchemy import func, text
+    from models import db, Vote, UserVoteStatus
+    votes = db.session.query(func.count(Vote.id)).scalar()
+    statuses = db.session.query(func.count(UserVoteStatus.id)).scalar()
+    page_size = db.session.execute(text('PRAGMA page_size')).scalar()
+    used = db.session.execute(text('PRAGMA page_count')).scalar() - db.session.execute(text('PRAGMA freelist_count')).scalar()
+    return votes, statuses, used * page_size / 1e6
+
+
+def measure(app, client, archived_id, live_id, voters, ballots):
+    """Seconds for each operation (best of a few runs where repeatable)."""
+    from models import db
+    from ballot import cast_ballot
+    from cache import results_cache
+    from stats import reconcile_stats
+    from tally import reconcile_counters
+    from eligibility import eligibility_cache
+    timings = {}
+    with app.app_context():
+        timings['reconcile-stats'], _ = timed(lambda: (reconcile_stats(), db.session.rollback()), repeat=3)
+        timings['reconcile-tallies'], _ = timed(lambda: (reconcile_counters(), db.session.rollback()), repeat=3)
+        db.session.remove()
+
+    def get(url):
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+
+    def uncached(url):
+        results_cache.clear()
+        eligibility_cache.clear()
+        get(url)
+    timings['GET / (voter)'], _ = timed(lambda: uncached('/'), repeat=20)
+    timings['GET /admin'], _ = timed(lambda: get('/admin'), repeat=20)
+    timings[f'GET /results/{archived_id} (uncached)'], _ = timed(lambda: uncached(f'/results/{archived_id}'), repeat=20)
+
+    with app.app_context():
+        from models import Candidate
+        candidate_id = Candidate.query.filter_by(election_id=live_id).first().id
+        start = time.perf_counter()
+        for user_id in voters[:ballots]:
+            cast_ballot(user_id, live_id, candidate_id)
+        timings[f'cast {ballots} ballots'] = time.perf_counter() - start
+        db.session.remove()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live-table costs before and after archiving past elections')
+    parser.add_argument('--terms', type=int, default=20, help='Finished elections to archive')
+    parser.add_argument('--votes', type=int, default=50000, help='Ballots (and turnout rows) per finished election')
+    parser.add_argument('--ballots', type=int, default=1000, help='Ballots cast into the open election per phase')
+    args = parser.parse_args()
+    os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1'
+
+    app, db_path = make_app()
+    archive_path = db_path[:-len('.db')] + '-archive.db'
+    from archive import archive_store
+    archive_store.url = 'sqlite:///' + archive_path
+    try:
+        with app.app_context():
+            from models import db, User
+            start = time.perf_counter()
+            seed_users('BA', args.votes)
+            seed_users('BL', args.ballots * 2)
+            seed_users('ADM', 1, PASSWORD)
+            User.query.filter_by(id='ADM0000000').update({'is_admin': True})
+            db.session.commit()
+            for term in range(args.terms):
+                election_id = seed_election(args.votes, num_candidates=10, seed=term)
+                seed_turnout(election_id, 'BA', args.votes)
+                age(election_id, 60 + 30 * term)
+            archived_id = election_id
+            live_id = seed_election(0, num_candidates=5, ended=False)
+            print(f'seeded {args.terms} past elections x {args.votes} ballots in {time.perf_counter() - start:.1f}s')
+            db.session.remove()
+
+        client = app.test_client()
+        client.post('/login', data={'user_id': 'ADM0000000', 'password': PASSWORD})
+        live_voters = [f'BL{i:07d}' for i in range(args.ballots * 2)]
+
+        with app.app_context():
+            before_size = live_size()
+        before = measure(app, client, archived_id, live_id, live_voters[:args.ballots], args.ballots)
+
+        with app.app_context():
+            from archive import archive_due_elections
+            start = time.perf_counter()
+            archived = archive_due_elections()
+            archive_s = time.perf_counter() - start
+            moved = sum(rows for _, rows in archived)
+            after_size = live_size()
+            db.session.remove()
+        print(f'archived {len(archived)} elections ({moved} rows) in {archive_s:.1f}s '
+              f'({moved / archive_s:.0f} rows/s)')
+        after = measure(app, client, archived_id, live_id, live_voters[args.ballots:], args.ballots)
+
+        print(f"\n{'':36} {'before':>12} {'after':>12}")
+        print(f"{'vote rows':36} {before_size[0]:>12} {after_size[0]:>12}")
+        print(f"{'user_vote_status rows':36} {before_size[1]:>12} {after_size[1]:>12}")
+        print(f"{'live database MB (used pages)':36} {before_size[2]:>12.1f} {after_size[2]:>12.1f}")
+        for name in before:
+            label = f'{name} ms'
+            print(f'{label:36} {before[name] * 1000:>12.2f} {after[name] * 1000:>12.2f}')
+    finally:
+        for path in (db_path, archive_path):
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
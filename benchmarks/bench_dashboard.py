@@ -0,0 +1,75 @@
+# benchmarks/bench_dashboard.py
+# Dashboard (GET /) time for voters with longer and longer voting histories,
+# with the eligibility cache off (every view runs the eligibility query) and on.
+#
+#   python benchmarks/bench_dashboard.py --history 0 100 1000 5000 --elections 20000
+import os
+import time
+import random
+import argparse
+import datetime
+
+from common import make_app, seed_history, seed_users
+
+PASSWORD = 'bench-password'
+
+
+def seed_votes(user_id, election_ids):
+    """Record `user_id` as having voted in each of `election_ids` (status rows only)."""
+    from models import db, UserVoteStatus
+    if not election_ids:
+        return
+    now = datetime.datetime.now(datetime.timezone.utc)
+    db.session.execute(UserVoteStatus.__table__.insert(),
+                       [{'user_id': user_id, 'election_id': id, 'timestamp': now} for id in election_ids])
+    db.session.commit()
+
+
+def rate(client, requests):
+    client.get('/')  # Warm up
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get('/')
+    assert response.status_code == 200
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dashboard cost vs voting history length')
+    parser.add_argument('--history', type=int, nargs='+', default=[0, 100, 1000, 5000],
+                        help='Elections each measured voter has voted in')
+    parser.add_argument('--elections', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1'
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            from models import db, Election
+            seed_history(args.elections)
+            seed_users('BD', len(args.history), PASSWORD)
+            all_ids = [id for (id,) in db.session.query(Election.id)]
+            rng = random.Random(1)
+            for i, history in enumerate(args.history):
+                seed_votes(f'BD{i:07d}', rng.sample(all_ids, min(history, len(all_ids))))
+            db.session.remove()
+
+        from eligibility import eligibility_cache
+        print(f"{'history':>8} {'cache off ms':>13} {'cache on ms':>12}")
+        for i, history in enumerate(args.history):
+            client = app.test_client()
+            client.post('/login', data={'user_id': f'BD{i:07d}', 'password': PASSWORD})
+            timings = []
+            for ttl in (0, 30):
+                eligibility_cache.ttl = ttl
+                eligibility_cache.clear()
+                timings.append(rate(client, args.requests))
+            print(f'{history:>8} {timings[0] * 1000:>13.2f} {timings[1] * 1000:>12.2f}')
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_export.py
+# Peak memory of the vote export (export.py) as the election grows: each
+# export runs in a fresh process that reports its peak RSS, and the script
+# fails if the largest export peaks more than --max-growth-mb above the
+# smallest. --naive-max also times the obvious Vote.query...all() + csv
+# export for comparison, up to that many rows.
+#
+#   python benchmarks/bench_export.py --rows 10000 100000 1000000 5000000
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+from common import make_app, seed_election
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+def run_child(db_path, election_id, fmt, naive):
+    """Export one election to a byte counter; print rows, bytes, seconds and peak RSS as JSON."""
+    import csv
+    from app import create_app
+    from models import db, Vote
+    import export
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path})
+    with app.app_context():
+        db.session.get(Vote, 1)  # Connect and load the mappers before taking the baseline
+        base = peak_rss_mb()
+        start = time.perf_counter()
+        size = 0
+        if naive:
+            class Sink:
+                def write(self, text):
+                    nonlocal size
+                    size += len(text.encode('utf-8'))
+            writer = csv.writer(Sink())
+            writer.writerow(['vote_id', 'candidate_id', 'timestamp'])
+            for vote in Vote.query.filter_by(election_id=election_id).all():
+                writer.writerow([vote.id, vote.candidate_id, vote.timestamp.isoformat()])
+        else:
+            for chunk in export.export_election(election_id, 'votes', fmt,
+                                                app.config['EXPORT_CHUNK_SIZE']):
+                size += len(chunk)
+        print(json.dumps({'bytes': size, 'seconds': time.perf_counter() - start,
+                          'base_mb': base, 'peak_mb': peak_rss_mb()}))
+
+
+def measure(db_path, election_id, fmt, naive=False):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', db_path, str(election_id), fmt]
+                            + (['--naive'] if naive else []),
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vote export memory use vs election size')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000, 5000000])
+    parser.add_argument('--formats', nargs='+', default=['csv', 'columnar'], choices=['csv', 'columnar'])
+    parser.add_argument('--naive-max', type=int, default=1000000,
+                        help='Largest election to also export with Vote.query...all() (0 to skip)')
+    parser.add_argument('--max-growth-mb', type=float, default=16,
+                        help='Allowed peak RSS growth from the smallest to the largest export')
+    parser.add_argument('--child', nargs=3, metavar=('DB', 'ELECTION_ID', 'FORMAT'), help=argparse.SUPPRESS)
+    parser.add_argument('--naive', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child[0], int(args.child[1]), args.child[2], args.naive)
+        return
+
+    app, db_path = make_app()
+    failed = False
+    try:
+        with app.app_context():
+            from models import db
+            elections = []
+            for rows in args.rows:
+                start = time.perf_counter()
+                elections.append((rows, seed_election(rows, seed=rows)))
+                print(f'seeded {rows} votes in {time.perf_counter() - start:.1f}s')
+            db.session.remove()
+
+        print(f"\n{'rows':>9} {'export':>9} {'seconds':>8} {'MB out':>8} {'rows/s':>10} {'peak RSS MB':>12} {'growth MB':>10}")
+        for fmt in args.formats + (['naive'] if args.naive_max else []):
+            peaks = []
+            for rows, election_id in elections:
+                if fmt == 'naive' and rows > args.naive_max:
+                    continue
+                result = measure(db_path, election_id, 'csv' if fmt == 'naive' else fmt, naive=fmt == 'naive')
+                peaks.append(result['peak_mb'])
+                print(f"{rows:>9} {fmt:>9} {result['seconds']:>8.2f} {result['bytes'] / 1e6:>8.1f} "
+                      f"{rows / result['seconds']:>10.0f} {result['peak_mb']:>12.1f} "
+                      f"{result['peak_mb'] - result['base_mb']:>10.1f}")
+            if fmt != 'naive' and peaks[-1] - peaks[0] > args.max_growth_mb:
+                print(f'FAIL: {fmt} export peak RSS grew {peaks[-1] - peaks[0]:.1f} MB '
+                      f'(limit {args.max_growth_mb:.0f} MB)')
+                failed = True
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_hashing.py
+# Password verification cost and login throughput for different
+# PASSWORD_HASH_METHOD settings, single-threaded and through the
+# PasswordHasher thread pool.
+#
+#   python benchmarks/bench_hashing.py --logins 200 --workers 4
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import common  # noqa: F401  (puts the project on sys.path)
+
+METHODS = ['scrypt', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:100000']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Password hashing throughput')
+    parser.add_argument('--methods', nargs='+', default=METHODS)
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    from flask import Flask
+    from hashing import PasswordHasher
+
+    print(f"{'method':<24} {'ms/verify':>10} {'logins/s (1 thread)':>20} "
+          f"{'logins/s (' + str(args.workers) + ' workers)':>22}")
+    for method in args.methods:
+        app = Flask(__name__)
+        app.config.update(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=args.workers)
+        hasher = PasswordHasher(app)
+        stored = hasher.hash('correct horse battery')
+
+        start = time.perf_counter()
+        for _ in range(args.logins):
+            hasher.verify(stored, 'correct horse battery')
+        serial = time.perf_counter() - start
+
+        # Simulate concurrent login requests, each waiting on the shared pool
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers * 4) as requests:
+            list(requests.map(lambda _: hasher.verify(stored, 'correct horse battery'), range(args.logins)))
+        pooled = time.perf_counter() - start
+
+        print(f'{method:<24} {serial / args.logins * 1000:>10.1f} {args.logins / serial:>20.1f} '
+              f'{args.logins / pooled:>22.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/bench_identity.py
+# Queries and latency per authenticated request with the user identity
+# cache off (USER_CACHE_TTL = 0) and on.
+#
+#   python benchmarks/bench_identity.py --requests 500
+import os
+import time
+import argparse
+
+from common import make_app, seed_election, count_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Identity cache: queries per request')
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    from models import db, User
+    from identity import identity_cache
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            user = User(id='bench-user', is_admin=False)
+            user.set_password('bench-password')
+            db.session.add(user)
+            election_id = seed_election(1000, num_candidates=5)
+            db.session.remove()
+
+        client = app.test_client()
+        client.post('/login', data={'user_id': 'bench-user', 'password': 'bench-password'})
+        paths = ['/', f'/results/{election_id}']
+
+        print(f"{'USER_CACHE_TTL':>14} {'path':<16} {'queries/req':>12} {'ms/req':>8}")
+        for ttl in (0, 30):
+            app.config['USER_CACHE_TTL'] = ttl
+            identity_cache.init_app(app)
+            for path in paths:
+                client.get(path)  # Warm up (and fill the cache)
+                with app.app_context():
+                    engine = db.engine
+                with count_queries(engine) as queries:
+                    start = time.perf_counter()
+                    for _ in range(args.requests):
+                        client.get(path)
+                    elapsed = time.perf_counter() - start
+                print(f'{ttl:>14} {path:<16} {queries[0] / args.requests:>12.2f} '
+                      f'{elapsed / args.requests * 1000:>8.2f}')
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_indexes.py
+# Show the SQLite query plans for the dashboard/results/delete queries and
+# time them with and without the indexes declared in models.py.
+#
+#   python benchmarks/bench_indexes.py --votes 1000000 --elections 5000
+import os
+import argparse
+import datetime
+
+from common import make_app, seed_election, seed_history, explain, timed
+
+
+def hot_queries(election_id):
+    from sqlalchemy import func
+    from models import db, Election, Vote, UserVoteStatus
+    from tally import count_votes, read_counters
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return {
+        'index: active elections': Election.query.filter(
+            Election.is_active == True).order_by(Election.start_time),
+        'index: finished elections': Election.query.filter(
+            Election.end_time < now).order_by(Election.end_time.desc()).limit(10),
+        'admin: active now': Election.query.filter(
+            Election.is_active == True, Election.start_time <= now, Election.end_time >= now),
+        'results: raw GROUP BY': (lambda: count_votes(election_id)),
+        'results: counters': (lambda: read_counters(election_id)),
+        'delete: votes of election': db.session.query(func.count(Vote.id)).filter(
+            Vote.election_id == election_id),
+        'delete: statuses of election': db.session.query(func.count(UserVoteStatus.id)).filter(
+            UserVoteStatus.election_id == election_id),
+    }
+
+
+def run(election_id, repeat, show_plans):
+    from sqlalchemy import event
+    from models import db
+    for label, query in hot_queries(election_id).items():
+        if callable(query):
+            # Capture the SQL the helper emits so it can be explained too
+            captured = []
+            listener = lambda conn, cur, stmt, params, ctx, many: captured.append((stmt, params))
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                query()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            statement, params = captured[-1]
+            plan = [row[-1] for row in db.session.connection().exec_driver_sql(
+                'EXPLAIN QUERY PLAN ' + statement, params).all()]
+            best, _ = timed(query, repeat)
+        else:
+            plan = explain(query)
+            best, _ = timed(query.all, repeat)
+        print(f'  {label:<30} {best * 1000:>9.2f} ms')
+        if show_plans:
+            for line in plan:
+                print(f'      {line}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query plans and timings for indexed queries')
+    parser.add_argument('--votes', type=int, default=1000000)
+    parser.add_argument('--elections', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from sqlalchemy import text
+    from models import db
+    from tally import reconcile_counters
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            seed_history(args.elections)
+            election_id = seed_election(args.votes)
+            reconcile_counters(election_id)
+            db.session.commit()
+            db.session.execute(text('ANALYZE'))
+
+            print(f'With indexes ({args.votes} votes, {args.elections} elections):')
+            run(election_id, args.repeat, show_plans=True)
+
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.drop(bind=db.engine)
+            db.session.execute(text('ANALYZE'))
+            print('Without indexes:')
+            run(election_id, args.repeat, show_plans=True)
+            db.session.remove()
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# benchmarks/bench_live_stream.py
+# Hold many SSE subscribers open on /results/<id>/stream while ballots come
+# in, and measure the server process's CPU time.
+#
+# The server runs in a child process (so its CPU can be read from /proc,
+# Linux only); this process opens the streams with non-blocking sockets
+# and casts ballots straight into the shared SQLite file.
+#
+#   python benchmarks/bench_live_stream.py --subscribers 1000 --seconds 10
+import os
+import sys
+import time
+import socket
+import argparse
+import selectors
+import subprocess
+import urllib.parse
+import urllib.request
+import http.cookiejar
+
+from common import ROOT, make_app, seed_election
+
+
+def serve(db_path, tick):
+    """Child process: serve the app on a free port and print it."""
+    import logging
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    from werkzeug.serving import make_server
+    from app import create_app
+    app = create_app({'WTF_CSRF_ENABLED': False, 'LIVE_TICK_INTERVAL': tick})
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    print(server.server_port, flush=True)
+    server.serve_forever()
+
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process, from /proc/<pid>/stat."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def admin_cookie(base_url):
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    opener.open(base_url + '/login', urllib.parse.urlencode(
+        {'user_id': 'benchadmin', 'password': 'bench-pass'}).encode()).read()
+    return '; '.join(f'{cookie.name}={cookie.value}' for cookie in jar)
+
+
+def open_streams(port, path, cookie, count):
+    selector = selectors.DefaultSelector()
+    request = (f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n'
+               f'Cookie: {cookie}\r\n\r\n').encode()
+    for _ in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(request)
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, data=[0, 0])  # [bytes, events]
+    return selector
+
+
+def pump(selector, seconds):
+    """Read whatever the streams send for `seconds`."""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=0.1):
+            chunk = key.fileobj.recv(65536)
+            key.data[0] += len(chunk)
+            key.data[1] += chunk.count(b'event: turnout')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SSE fan-out CPU benchmark')
+    parser.add_argument('--subscribers', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--votes-per-second', type=int, default=50)
+    parser.add_argument('--tick', type=float, default=1.0)
+    parser.add_argument('--serve', metavar='DB_PATH', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.serve, args.tick)
+
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1')
+    from models import db, User, Candidate
+    from ballot import cast_ballot
+
+    app, db_path = make_app()
+    child = None
+    try:
+        with app.app_context():
+            election_id = seed_election(0, num_candidates=10, ended=False)
+            candidate_ids = [id for (id,) in db.session.query(Candidate.id).filter_by(election_id=election_id)]
+            admin = User(id='benchadmin', is_admin=True)
+            admin.set_password('bench-pass')
+            db.session.add(admin)
+            voters = int(args.seconds * args.votes_per_second) + 1
+            db.session.execute(User.__table__.insert(), [
+                {'id': f'SV{i:07d}', 'password_hash': '', 'is_admin': False, 'has_voted': False}
+                for i in range(voters)])
+            db.session.commit()
+            db.session.remove()
+
+        child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', db_path,
+                                  '--tick', str(args.tick)], stdout=subprocess.PIPE, text=True, cwd=ROOT)
+        port = int(child.stdout.readline())
+        base_url = f'http://127.0.0.1:{port}'
+        cookie = admin_cookie(base_url)
+
+        start = time.perf_counter()
+        selector = open_streams(port, f'/results/{election_id}/stream', cookie, args.subscribers)
+        pump(selector, 2)  # Let every stream get its first snapshot
+        print(f'{args.subscribers} subscribers connected in {time.perf_counter() - start:.1f}s')
+
+        # Idle: streams open, nothing changing
+        cpu_before = cpu_seconds(child.pid)
+        pump(selector, args.seconds)
+        idle_cpu = cpu_seconds(child.pid) - cpu_before
+
+        # Busy: ballots arriving throughout
+        cpu_before = cpu_seconds(child.pid)
+        events_before = sum(key.data[1] for key in selector.get_map().values())
+        voter = 0
+        deadline = time.monotonic() + args.seconds
+        with app.app_context():
+            while time.monotonic() < deadline:
+                cast_ballot(f'SV{voter:07d}', election_id, candidate_ids[voter % len(candidate_ids)])
+                voter += 1
+                pump(selector, 1 / args.votes_per_second)
+        pump(selector, args.tick * 2)  # Last tick
+        busy_cpu = cpu_seconds(child.pid) - cpu_before
+        keys = list(selector.get_map().values())
+        events = sum(key.data[1] for key in keys) - events_before
+        starved = sum(1 for key in keys if key.data[1] < 2)
+
+        print(f'idle: {idle_cpu:.2f}s server CPU over {args.seconds:.0f}s ({idle_cpu / args.seconds * 100:.1f}%)')
+        print(f'busy: {voter} ballots, {busy_cpu:.2f}s server CPU over {args.seconds:.0f}s '
+              f'({busy_cpu / args.seconds * 100:.1f}%), {events} updates delivered '
+              f'({events / max(busy_cpu, 1e-9):.0f} per CPU second)')
+        print(f'subscribers that missed updates: {starved}')
+        for key in keys:
+            key.fileobj.close()
+
+        # For comparison: the same viewers each reloading the results page once
+        opener = urllib.request.build_opener()
+        opener.addheaders = [('Cookie', cookie)]
+        cpu_before = cpu_seconds(child.pid)
+        for _ in range(args.subscribers):
+            opener.open(f'{base_url}/results/{election_id}').read()
+        reload_cpu = cpu_seconds(child.pid) - cpu_before
+        print(f'one results page reload per subscriber instead: {reload_cpu:.2f}s server CPU '
+              f'(every tick, if they polled at the tick rate)')
+    finally:
+        if child is not None:
+            child.terminate()
+            child.wait()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# benchmarks/bench_ranked.py
+# Ranked-choice tabulation: the vectorized counter in ranked.py against a
+# per-ballot Python count with the same rules (which it also cross-checks),
+# then the full path from the database (load + tabulate) at scale.
+#
+#   python benchmarks/bench_ranked.py --ballots 1000000 --candidates 30
+#   python benchmarks/bench_ranked.py --ballots 1000000 --candidates 30 --seats 5
+import os
+import time
+import argparse
+
+import numpy as np
+
+from common import make_app
+
+
+def generate(num_ballots, num_candidates, max_rank, seed=42, chunk=100000):
+    """Plackett-Luce ballots: a few popular candidates, random ranking lengths 1..max_rank."""
+    rng = np.random.default_rng(seed)
+    popularity = np.log(rng.dirichlet(np.full(num_candidates, 0.8)))
+    rankings = np.full((num_ballots, max_rank), -1, dtype=np.int32)
+    for start in range(0, num_ballots, chunk):
+        size = min(chunk, num_ballots - start)
+        order = np.argsort(-(popularity + rng.gumbel(size=(size, num_candidates))), axis=1)[:, :max_rank]
+        lengths = rng.integers(1, max_rank + 1, size=size)
+        order[np.arange(order.shape[1]) >= lengths[:, None]] = -1
+        rankings[start:start + size] = order
+    return rankings
+
+
+def reference(ballots, num_candidates, seats):
+    """Per-ballot Python count with ranked.tabulate's rules; returns the winners."""
+    hopeful = set(range(num_candidates))
+    weights = [1.0] * len(ballots)
+    pos = [0] * len(ballots)
+
+    def current(i):
+        ballot = ballots[i]
+        while pos[i] < len(ballot) and ballot[pos[i]] not in hopeful:
+            pos[i] += 1
+        return ballot[pos[i]] if pos[i] < len(ballot) else None
+
+    valid = sum(1 for i in range(len(ballots)) if current(i) is not None)
+    quota = valid // (seats + 1) + 1 if seats > 1 else None
+    winners, history = [], []
+    while len(winners) < seats and hopeful:
+        votes = [0.0] * num_candidates
+        piles = {c: [] for c in hopeful}
+        for i in range(len(ballots)):
+            c = current(i)
+            if c is not None:
+                votes[c] += weights[i]
+                piles[c].append(i)
+        history.append(votes)
+        candidates = sorted(hopeful)
+        if len(candidates) <= seats - len(winners):
+            elected = sorted(candidates, key=lambda c: -votes[c])
+        elif quota is not None:
+            elected = sorted((c for c in candidates if votes[c] >= quota), key=lambda c: -votes[c])
+            elected = elected[:seats - len(winners)]
+        else:
+            elected = [c for c in candidates if votes[c] > sum(votes) / 2]
+        if elected:
+            for c in elected:
+                hopeful.discard(c)
+                winners.append(c)
+            if quota is not None and len(winners) < seats:
+                for c in elected:
+                    ratio = (votes[c] - quota) / votes[c]
+                    for i in piles[c]:
+                        weights[i] *= ratio
+            continue
+        tied = candidates
+        for round_votes in reversed(history):
+            low = min(round_votes[c] for c in tied)
+            tied = [c for c in tied if abs(round_votes[c] - low) <= 1e-8 + 1e-5 * abs(low)]
+            if len(tied) == 1:
+                break
+        hopeful.discard(max(tied))
+    return winners
+
+
+def seed_ranked_election(rankings, num_candidates, seats, chunk_size=50000):
+    """Store `rankings` as RankedBallot rows of a new election; returns its id."""
+    import datetime
+    from models import db, Election, Candidate, RankedBallot
+    from ranked import pack_ranking
+    now = datetime.datetime.now(datetime.timezone.utc)
+    election = Election(name='Ranked Benchmark', position='Council', start_time=now - datetime.timedelta(days=2),
+                        end_time=now - datetime.timedelta(days=1), is_active=True,
+                        voting_method='stv' if seats > 1 else 'irv', seats=seats)
+    db.session.add(election)
+    db.session.flush()
+    candidates = [Candidate(name=f'Candidate {i}', election_id=election.id) for i in range(num_candidates)]
+    db.session.add_all(candidates)
+    db.session.flush()
+    ids = np.array([c.id for c in candidates])
+    for start in range(0, len(rankings), chunk_size):
+        db.session.execute(RankedBallot.__table__.insert(), [
+            {'election_id': election.id, 'ranking': pack_ranking(ids[row[row >= 0]].tolist())}
+            for row in rankings[start:start + chunk_size]])
+    db.session.commit()
+    return election.id, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ranked-choice tabulation speed')
+    parser.add_argument('--ballots', type=int, default=1000000)
+    parser.add_argument('--candidates', type=int, default=30)
+    parser.add_argument('--seats', type=int, default=1, help='1 = IRV, more = STV')
+    parser.add_argument('--max-rank', type=int, default=6, help='Longest ranking on a ballot')
+    parser.add_argument('--reference-ballots', type=int, default=50000,
+                        help='Ballots for the per-ballot Python comparison (it is slow)')
+    parser.add_argument('--skip-db', action='store_true', help='Only time the in-memory count')
+    args = parser.parse_args()
+
+    from ranked import tabulate
+
+    rankings = generate(args.ballots, args.candidates, args.max_rank)
+    method = 'STV' if args.seats > 1 else 'IRV'
+    print(f'{method}: {args.ballots} ballots, {args.candidates} candidates, {args.seats} seat(s)')
+
+    subset = rankings[:args.reference_ballots]
+    start = time.perf_counter()
+    rounds, vector_winners, _ = tabulate(subset, args.candidates, args.seats)
+    vector_s = time.perf_counter() - start
+    ballots = [[c for c in row if c >= 0] for row in subset.tolist()]
+    start = time.perf_counter()
+    python_winners = reference(ballots, args.candidates, args.seats)
+    python_s = time.perf_counter() - start
+    assert vector_winners == python_winners, (vector_winners, python_winners)
+    print(f'  {len(subset)} ballots, {len(rounds)} rounds: per-ballot Python {python_s * 1000:8.0f} ms, '
+          f'vectorized {vector_s * 1000:6.0f} ms ({python_s / vector_s:.0f}x), same winners')
+
+    start = time.perf_counter()
+    rounds, winners, _ = tabulate(rankings, args.candidates, args.seats)
+    print(f'  {args.ballots} ballots, {len(rounds)} rounds: vectorized {(time.perf_counter() - start) * 1000:.0f} ms')
+
+    if args.skip_db:
+        return
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            from models import db
+            from ranked import compute_ranked_result, load_rankings
+            start = time.perf_counter()
+            election_id, ids = seed_ranked_election(rankings, args.candidates, args.seats)
+            print(f'  stored {args.ballots} ballots in {time.perf_counter() - start:.1f}s '
+                  f'({os.path.getsize(db_path) / 1e6:.0f} MB database)')
+            start = time.perf_counter()
+            load_rankings(election_id, sorted(ids.tolist()))
+            load_s = time.perf_counter() - start
+            start = time.perf_counter()
+            result = compute_ranked_result(election_id)
+            total_s = time.perf_counter() - start
+            assert list(result.winners) == ids[winners].tolist()
+            print(f'  from the database: load {load_s * 1000:.0f} ms, load + count {total_s * 1000:.0f} ms')
+            db.session.remove()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
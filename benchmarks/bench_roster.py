@@ -0,0 +1,46 @@
+# benchmarks/bench_roster.py
+# Time roster.import_roster() on a generated CSV.
+#
+#   python benchmarks/bench_roster.py --users 100000 --workers 8
+import io
+import os
+import time
+import argparse
+
+from common import make_app
+
+
+def generate_csv(num_users):
+    buf = io.StringIO()
+    buf.write('user_id,password,is_admin\n')
+    for i in range(num_users):
+        buf.write(f'S{i:08d},pass-{i:08d},\n')
+    buf.seek(0)
+    return buf
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk roster import throughput')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    from models import db
+    from roster import import_roster
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            start = time.perf_counter()
+            report = import_roster(generate_csv(args.users), chunk_size=args.chunk_size, workers=args.workers)
+            elapsed = time.perf_counter() - start
+            print(f'imported {report.imported} users ({report.skipped} skipped) '
+                  f'in {elapsed:.1f}s -> {report.imported / elapsed:.0f} users/s')
+            db.session.remove()
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_startup.py
+# How long a fresh worker takes to import the app and run create_app(), from
+# `python -X importtime` plus a wall clock around create_app().
+#
+#   python benchmarks/bench_startup.py --runs 5 --top 15
+#   python benchmarks/bench_startup.py --save startup.json      # record a baseline
+#   python benchmarks/bench_startup.py --compare startup.json   # fail if >20% slower
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+from common import ROOT
+
+# Runs in a fresh interpreter each time, like a newly started worker
+PROBE = '''
+import time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+built = time.perf_counter()
+print(f"STARTUP {imported - start:.6f} {built - imported:.6f}")
+'''
+
+IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def probe(db_url):
+    env = dict(os.environ, DATABASE_URL=db_url)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    self_us = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if match:
+            self_us[match.group(4)] = int(match.group(1))
+    imported, built = (float(x) for x in result.stdout.split('STARTUP ')[1].split())
+    return imported, built, self_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker startup time (import + create_app)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+    parser.add_argument('--save', metavar='JSON', help='Write the medians to this file')
+    parser.add_argument('--compare', metavar='JSON', help='Compare with a saved run; exit 1 if >20%% slower')
+    args = parser.parse_args()
+
+    db_url = 'sqlite:///' + os.path.join(ROOT, 'instance', 'bench-startup-unused.db')  # never opened
+    runs = [probe(db_url) for _ in range(args.runs)]
+    import_s = statistics.median(r[0] for r in runs)
+    build_s = statistics.median(r[1] for r in runs)
+    modules = {name: statistics.median(r[2].get(name, 0) for r in runs) for name in runs[0][2]}
+
+    print(f'import app:   {import_s * 1000:7.1f} ms (median of {args.runs})')
+    print(f'create_app(): {build_s * 1000:7.1f} ms')
+    print(f'total:        {(import_s + build_s) * 1000:7.1f} ms')
+    print('\nslowest modules (self time, ms):')
+    for name, us in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f'  {us / 1000:7.2f}  {name}')
+    project = sorted((name for name in modules if os.path.exists(os.path.join(ROOT, name + '.py'))),
+                     key=lambda name: -modules[name])
+    print('\nproject modules loaded: ' + ', '.join(project))
+
+    result = {'import_ms': round(import_s * 1000, 1), 'create_app_ms': round(build_s * 1000, 1),
+              'total_ms': round((import_s + build_s) * 1000, 1), 'project_modules': project}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        change = result['total_ms'] / baseline['total_ms'] - 1
+        print(f"\nvs {args.compare}: {baseline['total_ms']:.1f} -> {result['total_ms']:.1f} ms ({change:+.0%})")
+        sys.exit(1 if change > 0.2 else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_tally.py
+# Compare the old per-candidate COUNT loop in results() against the
+# single GROUP BY over the vote table and the CandidateTally counter read.
+#
+#   python benchmarks/bench_tally.py --votes 10000 1000000 --candidates 40
+import os
+import argparse
+
+from common import make_app, seed_election, count_queries, timed
+
+
+def per_candidate_counts(election_id):
+    # What results() used to do: one COUNT(*) per candidate
+    from models import Candidate, Vote
+    counts = {}
+    for candidate in Candidate.query.filter_by(election_id=election_id).all():
+        counts[candidate.id] = Vote.query.filter_by(election_id=election_id, candidate_id=candidate.id).count()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-candidate COUNT vs GROUP BY vs counter tally')
+    parser.add_argument('--votes', type=int, nargs='+', default=[10000, 1000000])
+    parser.add_argument('--candidates', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from tally import compute_tally, compute_tally_from_votes, reconcile_counters
+    from models import db
+
+    app, db_path = make_app()
+    print(f"{'votes':>10} {'method':<22} {'queries':>8} {'best ms':>10}")
+    try:
+        with app.app_context():
+            for num_votes in args.votes:
+                election_id = seed_election(num_votes, args.candidates)
+                # Seeding bypasses vote(), so build the counters once
+                reconcile_counters(election_id)
+                db.session.commit()
+                for label, fn in (('per-candidate COUNT', per_candidate_counts),
+                                  ('GROUP BY tally', compute_tally_from_votes),
+                                  ('counter read', compute_tally)):
+                    with count_queries(db.engine) as queries:
+                        fn(election_id)
+                    best, _ = timed(lambda: fn(election_id), args.repeat)
+                    print(f"{num_votes:>10} {label:<22} {queries[0]:>8} {best * 1000:>10.1f}")
+            db.session.remove()
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_vote_queue.py
+# Ballot throughput with one transaction per vote (ballot.cast_ballot)
+# versus the journaled group-commit queue (vote_queue.VoteQueue), plus a
+# crash-recovery check that replays an uncommitted journal.
+#
+#   python benchmarks/bench_vote_queue.py --voters 5000 --threads 32
+import os
+import json
+import time
+import tempfile
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from common import make_app, seed_election, seed_users
+
+
+def check(election_id, expected):
+    from models import Vote, UserVoteStatus
+    votes = Vote.query.filter_by(election_id=election_id).count()
+    statuses = UserVoteStatus.query.filter_by(election_id=election_id).count()
+    return 'ok' if votes == statuses == expected else f'MISMATCH votes={votes} statuses={statuses} expected={expected}'
+
+
+def run(app, label, vote, voters, threads, candidate_ids, election_id):
+    def one(i):
+        with app.app_context():
+            vote(f'{label}{i:07d}', election_id, candidate_ids[i % len(candidate_ids)])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(voters)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-vote commit vs group-commit queue')
+    parser.add_argument('--voters', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args()
+
+    from models import db, Candidate
+    from ballot import cast_ballot
+    from vote_queue import VoteQueue
+
+    app, db_path = make_app()
+    journal_path = tempfile.mktemp(prefix='vote-journal-', suffix='.log')
+    app.config['VOTE_JOURNAL_PATH'] = journal_path
+    try:
+        with app.app_context():
+            direct_election = seed_election(0, num_candidates=10, ended=False)
+            queued_election = seed_election(0, num_candidates=10, ended=False)
+            recovery_election = seed_election(0, num_candidates=10, ended=False)
+            candidates = {eid: [id for (id,) in db.session.query(Candidate.id).filter_by(election_id=eid)]
+                          for eid in (direct_election, queued_election, recovery_election)}
+            for prefix in ('D', 'Q', 'R'):
+                seed_users(prefix, args.voters)
+
+        elapsed = run(app, 'D', cast_ballot, args.voters, args.threads,
+                      candidates[direct_election], direct_election)
+        with app.app_context():
+            print(f'per-vote commit: {args.voters / elapsed:8.0f} ballots/s  ({check(direct_election, args.voters)})')
+
+        app.config['VOTE_INGEST_MODE'] = 'queue'
+        queue = VoteQueue(app)
+        queue.start()
+        elapsed = run(app, 'Q', queue.submit, args.voters, args.threads,
+                      candidates[queued_election], queued_election)
+        queue.stop()  # Drains the queue into the database
+        with app.app_context():
+            print(f'group commit:    {args.voters / elapsed:8.0f} ballots/s  ({check(queued_election, args.voters)})')
+
+        # Crash recovery: a journal whose ballots were fsynced but never marked committed
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with open(journal_path, 'w') as journal:
+            for i in range(args.voters):
+                journal.write(json.dumps({'seq': i + 1, 'receipt': f'r{i}', 'user_id': f'R{i:07d}',
+                                          'election_id': recovery_election,
+                                          'candidate_id': candidates[recovery_election][0],
+                                          'cast_at': now}) + '\n')
+        start = time.perf_counter()
+        recovery = VoteQueue(app)
+        recovery.start()  # Replays the journal
+        recovery.stop()
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            print(f'replay:          {args.voters / elapsed:8.0f} ballots/s  ({check(recovery_election, args.voters)})')
+            db.session.remove()
+    finally:
+        for path in (db_path, db_path + '-wal', db_path + '-shm', journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/common.py
+# Shared helpers for the benchmark scripts: a throwaway SQLite database,
+# bulk seeding through the models, and a per-block SQL query counter.
+import os
+import sys
+import time
+import random
+import tempfile
+import datetime
+from contextlib import contextmanager
+
+# Make the project modules importable when run as `python benchmarks/<script>.py`
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def make_app(db_path=None):
+    """Create the Flask app bound to a scratch SQLite file (never instance/election.db).
+
+    The app (and its engine) is built once per process, so call this once and
+    seed as many elections as needed into the same database.
+    """
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='election-bench-', suffix='.db')
+        os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    from app import create_app
+    from models import db
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path, 'WTF_CSRF_ENABLED': False})
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app, db_path
+
+
+def seed_election(num_votes, num_candidates=40, chunk_size=50000, seed=42, ended=True):
+    """Insert one election with `num_candidates` candidates and `num_votes` votes.
+
+    The election ended yesterday, or is open until tomorrow with ended=False.
+    Must be called inside an app context. Returns the election id.
+    """
+    from models import db, Election, Candidate, Vote
+    rng = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    election = Election(name='Benchmark Election', position='Bench',
+                        start_time=now - datetime.timedelta(days=2),
+                        end_time=now - datetime.timedelta(days=1) if ended else now + datetime.timedelta(days=1),
+                        is_active=True)
+    db.session.add(election)
+    db.session.flush()
+    candidates = [Candidate(name=f'Candidate {i}', election_id=election.id)
+                  for i in range(num_candidates)]
+    db.session.add_all(candidates)
+    db.session.flush()
+    candidate_ids = [c.id for c in candidates]
+
+    remaining = num_votes
+    while remaining > 0:
+        batch = min(chunk_size, remaining)
+        db.session.execute(
+            Vote.__table__.insert(),
+            [{'election_id': election.id, 'candidate_id': rng.choice(candidate_ids), 'timestamp': now}
+             for _ in range(batch)]
+        )
+        remaining -= batch
+    db.session.commit()
+    return election.id
+
+
+def seed_history(num_elections, seed=7):
+    """Bulk-insert `num_elections` past/current/future elections to fill the election table."""
+    from models import db, Election
+    rng = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rows = []
+    for i in range(num_elections):
+        start = now + datetime.timedelta(days=rng.randint(-2000, 60))
+        rows.append({'name': f'History {i}', 'position': 'Seat',
+                     'start_time': start, 'end_time': start + datetime.timedelta(days=1),
+                     'is_active': rng.random() < 0.9})
+    db.session.execute(Election.__table__.insert(), rows)
+    db.session.commit()
+
+
+def seed_users(prefix, count, password=None):
+    """Bulk-insert `count` voters with ids `<prefix>0000000`, ... sharing one password.
+
+    Without a password they can't log in (handy when ballots are cast directly).
+    Must be called inside an app context.
+    """
+    from models import db, User
+    from hashing import password_hasher
+    password_hash = password_hasher.hash(password) if password else ''
+    db.session.execute(User.__table__.insert(), [
+        {'id': f'{prefix}{i:07d}', 'password_hash': password_hash, 'is_admin': False, 'has_voted': False}
+        for i in range(count)])
+    db.session.commit()
+
+
+def start_server(app):
+    """Serve `app` on a free local port from a background thread; returns (server, base_url)."""
+    import logging
+    import threading
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # No per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def explain(query):
+    """Return SQLite's EXPLAIN QUERY PLAN lines for an ORM query or Core select."""
+    from sqlalchemy import text
+    from models import db
+    statement = getattr(query, 'statement', query)
+    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+    return [row[-1] for row in rows]
+
+
+@contextmanager
+def count_queries(engine):
+    """Count statements executed on `engine` inside the block: `with count_queries(e) as c: ...; c[0]`"""
+    from sqlalchemy import event
+    counter = [0]
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', _before)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', _before)
+
+
+def timed(fn, repeat=5):
+    """Run fn() `repeat` times, return (best_seconds, last_result)."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
@@ -0,0 +1,105 @@
+# benchmarks/loadtest_votes.py
+# Fire a burst of concurrent ballots at a real local HTTP server and check
+# that every voter ends up with exactly one counted vote.
+#
+# Every user logs in and then submits their ballot; --double makes a share
+# of them submit twice at the same moment to exercise the double-vote guard.
+#
+#   python benchmarks/loadtest_votes.py --users 10000 --concurrency 200
+import os
+import sys
+import time
+import random
+import argparse
+import urllib.parse
+import urllib.request
+import http.cookiejar
+from concurrent.futures import ThreadPoolExecutor
+
+from common import make_app, seed_election, seed_users, start_server
+
+
+def voter(base_url, user_id, election_id, candidate_ids, double):
+    """Log in and vote; returns (status, seconds) for each ballot POST."""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    login = urllib.parse.urlencode({'user_id': user_id, 'password': 'loadtest-pass'}).encode()
+    opener.open(base_url + '/login', login).read()
+
+    ballot = urllib.parse.urlencode({'candidate_id': random.choice(candidate_ids)}).encode()
+
+    def post():
+        start = time.perf_counter()
+        try:
+            response = opener.open(f'{base_url}/vote/{election_id}', ballot)
+            response.read()
+            return response.status, time.perf_counter() - start
+        except Exception as e:
+            return repr(e), time.perf_counter() - start
+
+    if not double:
+        return [post()]
+    with ThreadPoolExecutor(max_workers=2) as pair:
+        return list(pair.map(lambda _: post(), range(2)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent ballot load test')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--candidates', type=int, default=10)
+    parser.add_argument('--double', type=float, default=0.1, help='Share of voters who submit twice at once')
+    args = parser.parse_args()
+
+    # Cheap hashing: this measures ballot writes, not password verification
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1')
+    from sqlalchemy import func
+    from models import db, Vote, UserVoteStatus, Candidate, CandidateTally
+    from tally import reconcile_counters
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            election_id = seed_election(0, num_candidates=args.candidates, ended=False)
+            candidate_ids = [id for (id,) in db.session.query(Candidate.id).filter_by(election_id=election_id)]
+            seed_users('LT', args.users, 'loadtest-pass')
+            db.session.remove()
+
+        server, base_url = start_server(app)
+        print(f'Server on {base_url}; {args.users} voters, concurrency {args.concurrency}')
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(
+                lambda i: voter(base_url, f'LT{i:07d}', election_id, candidate_ids, random.random() < args.double),
+                range(args.users)))
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+
+        posts = [post for user_posts in results for post in user_posts]
+        errors = [status for status, _ in posts if status != 200]
+        latencies = sorted(seconds for _, seconds in posts)
+        print(f'{len(posts)} ballot POSTs in {elapsed:.1f}s ({len(posts) / elapsed:.0f}/s); '
+              f'p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, '
+              f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms; {len(errors)} transport errors')
+
+        with app.app_context():
+            statuses = UserVoteStatus.query.filter_by(election_id=election_id).count()
+            votes = Vote.query.filter_by(election_id=election_id).count()
+            counted = db.session.query(func.coalesce(func.sum(CandidateTally.votes), 0)).filter(
+                CandidateTally.election_id == election_id).scalar()
+            drift = reconcile_counters(election_id)
+            db.session.rollback()
+        lost = args.users - statuses
+        double = votes - statuses
+        print(f'voters {args.users}, statuses {statuses}, votes {votes}, counters {counted}')
+        print(f'lost votes: {lost}, double votes: {double}, counter drift: {len(drift)}')
+        ok = lost == 0 and double == 0 and not drift and counted == votes
+        print('PASS' if ok else 'FAIL')
+        sys.exit(0 if ok else 1)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
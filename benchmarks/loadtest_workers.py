@@ -0,0 +1,128 @@
+# benchmarks/loadtest_workers.py
+# Requests/second under gunicorn (wsgi.py + gunicorn.conf.py) as the number
+# of worker processes grows. Needs gunicorn (and gevent for --worker-class gevent);
+# run it on a machine with several cores to see the scaling.
+#
+# Load comes from several client processes, each with keep-alive connections
+# on a pool of threads, so the client's own GIL doesn't cap the numbers.
+#
+#   python benchmarks/loadtest_workers.py --workers 1 2 4 8 --seconds 10
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+import http.client
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from common import ROOT, make_app, seed_election, seed_history
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(db_path, port, workers, worker_class, threads):
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path, BIND=f'127.0.0.1:{port}',
+               WEB_CONCURRENCY=str(workers), WORKER_CLASS=worker_class, THREADS=str(threads))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                               '--access-logfile', '/dev/null', 'wsgi:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/')
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def client_process(port, paths, threads, seconds):
+    """One load-generating process: `threads` keep-alive connections for `seconds`."""
+    deadline = time.monotonic() + seconds
+
+    def loop(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        latencies, errors = [], 0
+        n = i
+        while time.monotonic() < deadline:
+            path = paths[n % len(paths)]
+            n += 1
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors += 1
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+            latencies.append(time.perf_counter() - start)
+        return latencies, errors
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(loop, range(threads)))
+    return [l for lat, _ in results for l in lat], sum(errors for _, errors in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Requests/sec vs gunicorn worker count')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--worker-class', default='gthread', choices=['gthread', 'gevent', 'sync'])
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gthread worker')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--client-processes', type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument('--client-threads', type=int, default=16)
+    args = parser.parse_args()
+
+    app, db_path = make_app()
+    try:
+        with app.app_context():
+            from models import db
+            from tally import reconcile_counters
+            seed_history(500)
+            election_id = seed_election(20000, num_candidates=10)
+            reconcile_counters(election_id)
+            db.session.commit()
+            db.session.remove()
+        # The same mix a busy election night sees from anonymous visitors
+        paths = ['/', f'/results/{election_id}', f'/api/v1/elections/{election_id}/results',
+                 '/api/v1/elections?status=open']
+
+        print(f'{args.worker_class} workers, {args.client_processes} client process(es) x '
+              f'{args.client_threads} connections, {os.cpu_count()} CPUs')
+        print(f"{'workers':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for workers in args.workers:
+            port = free_port()
+            server = start_gunicorn(db_path, port, workers, args.worker_class, args.threads)
+            try:
+                with multiprocessing.Pool(args.client_processes) as clients:
+                    results = clients.starmap(client_process, [(port, paths, args.client_threads, args.seconds)]
+                                              * args.client_processes)
+            finally:
+                server.terminate()
+                server.wait()
+            latencies = sorted(l for lat, _ in results for l in lat)
+            errors = sum(errors for _, errors in results)
+            print(f'{workers:>8} {len(latencies) / args.seconds:>8.0f} '
+                  f'{latencies[len(latencies) // 2] * 1000:>8.1f} '
+                  f'{latencies[int(len(latencies) * 0.99)] * 1000:>8.1f} {errors:>7}')
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
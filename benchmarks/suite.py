@@ -0,0 +1,296 @@
+# benchmarks/suite.py
+# End-to-end benchmark of the main election routes: seeds a scratch SQLite
+# database, then drives /login, /, /vote/<id>, /results/<id> and /admin
+# through the Flask test client (one request at a time, no network) and a
+# real local HTTP server (concurrent clients). Reports p50/p95/p99 latency,
+# throughput and SQL queries per request, optionally as JSON so runs can be
+# compared.
+#
+#   python benchmarks/suite.py --users 5000 --elections 500 --votes 200000 --requests 300
+#   python benchmarks/suite.py --json before.json
+#   python benchmarks/suite.py --compare before.json
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from common import make_app, seed_election, seed_history, seed_users, start_server, count_queries
+
+PASSWORD = 'bench-password'
+ADMIN_ID = 'bench-admin'
+
+# name -> (method, who is asking, expected status)
+SCENARIOS = {
+    'login': ('POST', 'anonymous', 302),
+    'dashboard': ('GET', 'voter', 200),
+    'vote': ('POST', 'new voter', 302),
+    'results': ('GET', 'voter', 200),         # an ended election
+    'live_results': ('GET', 'admin', 200),    # a running election
+    'admin': ('GET', 'admin', 200),
+}
+
+
+def seed(args):
+    """Fill the scratch database; returns (finished_election_id, open_election_id, candidate_ids)."""
+    from models import db, User, Candidate
+    from tally import reconcile_counters
+    from stats import reconcile_stats
+    seed_history(args.elections)
+    finished_id = seed_election(args.votes, num_candidates=args.candidates, seed=1)
+    open_id = seed_election(args.votes, num_candidates=args.candidates, seed=2, ended=False)
+    seed_users('BU', args.users, PASSWORD)
+    admin = User(id=ADMIN_ID, is_admin=True)
+    admin.set_password(PASSWORD)
+    db.session.add(admin)
+    reconcile_counters()
+    reconcile_stats()
+    db.session.commit()
+    candidate_ids = [id for (id,) in db.session.query(Candidate.id).filter_by(election_id=open_id)]
+    db.session.remove()
+    return finished_id, open_id, candidate_ids
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(mode, name, latencies, errors, queries, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'mode': mode,
+        'scenario': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'req_per_s': round(len(latencies) / elapsed, 1),
+        'queries_per_req': round(queries / len(latencies), 2),
+    }
+
+
+class Plan:
+    """The request each scenario sends, and which user (if any) must be logged in for it."""
+
+    def __init__(self, finished_id, open_id, candidate_ids):
+        self.finished_id = finished_id
+        self.open_id = open_id
+        self.candidate_ids = candidate_ids
+
+    def request(self, name, i, voter_offset):
+        """(path, form data) for the i-th request of a scenario."""
+        if name == 'login':
+            return '/login', {'user_id': f'BU{i:07d}', 'password': PASSWORD}
+        if name == 'dashboard':
+            return '/', None
+        if name == 'vote':
+            return f'/vote/{self.open_id}', {'candidate_id': random.choice(self.candidate_ids)}
+        if name == 'results':
+            return f'/results/{self.finished_id}', None
+        if name == 'live_results':
+            return f'/results/{self.open_id}', None
+        return '/admin', None
+
+    @staticmethod
+    def user_for(name, i, voter_offset):
+        who = SCENARIOS[name][1]
+        if who == 'admin':
+            return ADMIN_ID
+        if who == 'voter':
+            return f'BU{voter_offset:07d}'
+        if who == 'new voter':
+            return f'BU{voter_offset + i:07d}'
+        return None
+
+
+# --- Flask test client ---------------------------------------------------------
+
+def run_test_client(app, engine, plan, name, requests, voter_offset):
+    method, who, expected = SCENARIOS[name]
+    clients = []
+    for i in range(requests if who == 'new voter' or who == 'anonymous' else 1):
+        client = app.test_client()
+        user_id = plan.user_for(name, i, voter_offset)
+        if user_id:
+            client.post('/login', data={'user_id': user_id, 'password': PASSWORD})
+        clients.append(client)
+
+    latencies, errors = [], 0
+    with count_queries(engine) as queries:
+        start = time.perf_counter()
+        for i in range(requests):
+            client = clients[i % len(clients)]
+            path, data = plan.request(name, i, voter_offset)
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            latencies.append(time.perf_counter() - t0)
+            errors += response.status_code != expected
+        elapsed = time.perf_counter() - start
+    return summarize('test_client', name, latencies, errors, queries[0], elapsed)
+
+
+# --- Real HTTP server ----------------------------------------------------------
+
+class HttpSession:
+    """Minimal cookie-keeping HTTP client that does not follow redirects."""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookies = {}
+
+    def request(self, method, path, data=None):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        headers = {}
+        body = None
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        if data is not None:
+            body = urllib.parse.urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            for header in response.msg.get_all('Set-Cookie') or []:
+                name, _, value = header.split(';', 1)[0].partition('=')
+                self.cookies[name.strip()] = value
+            return response.status
+        finally:
+            conn.close()
+
+
+def run_server(port, engine, plan, name, requests, voter_offset, concurrency):
+    method, who, expected = SCENARIOS[name]
+    sessions = []
+    for i in range(requests if who == 'new voter' or who == 'anonymous' else 1):
+        session = HttpSession(port)
+        user_id = plan.user_for(name, i, voter_offset)
+        if user_id:
+            session.request('POST', '/login', {'user_id': user_id, 'password': PASSWORD})
+        sessions.append(session)
+
+    def one(i):
+        path, data = plan.request(name, i, voter_offset)
+        t0 = time.perf_counter()
+        try:
+            status = sessions[i % len(sessions)].request(method, path, data)
+        except (OSError, http.client.HTTPException):
+            status = None
+        return time.perf_counter() - t0, status == expected
+
+    with count_queries(engine) as queries:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(requests)))
+        elapsed = time.perf_counter() - start
+    return summarize('server', name, [seconds for seconds, _ in results],
+                     sum(1 for _, ok in results if not ok), queries[0], elapsed)
+
+
+# --- Reporting -----------------------------------------------------------------
+
+def print_table(rows):
+    print(f"{'mode':<12} {'scenario':<13} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'queries':>8} {'errors':>7}")
+    for row in rows:
+        print(f"{row['mode']:<12} {row['scenario']:<13} {row['req_per_s']:>8.1f} {row['p50_ms']:>8.2f} "
+              f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['queries_per_req']:>8.2f} {row['errors']:>7}")
+
+
+def print_comparison(rows, path):
+    with open(path) as f:
+        baseline = {(row['mode'], row['scenario']): row for row in json.load(f)['results']}
+    print(f'\nchange vs {path}:')
+    print(f"{'mode':<12} {'scenario':<13} {'req/s':>10} {'p95':>10} {'queries':>10}")
+    for row in rows:
+        old = baseline.get((row['mode'], row['scenario']))
+        if old is None:
+            continue
+
+        def change(key):
+            return f"{row[key] / old[key] - 1:+.0%}" if old[key] else 'n/a'
+        print(f"{row['mode']:<12} {row['scenario']:<13} {change('req_per_s'):>10} {change('p95_ms'):>10} "
+              f"{row['queries_per_req'] - old['queries_per_req']:>+10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite for the election routes')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--elections', type=int, default=200)
+    parser.add_argument('--candidates', type=int, default=10)
+    parser.add_argument('--votes', type=int, default=50000, help='Votes in each benchmark election')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients against the server')
+    parser.add_argument('--mode', choices=['test_client', 'server', 'both'], default='both')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--real-hashing', action='store_true',
+                        help='Keep the configured password hash cost (default: a cheap one, so login measures the route)')
+    parser.add_argument('--json', metavar='PATH', help='Write the results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='Show the change against a saved JSON run')
+    args = parser.parse_args()
+
+    modes = ['test_client', 'server'] if args.mode == 'both' else [args.mode]
+    if 'vote' in args.scenarios and args.users < args.requests * len(modes) + 1:
+        parser.error('--users must exceed --requests x modes (every vote needs a voter who has not voted)')
+    if not args.real_hashing:
+        os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1'
+
+    random.seed(42)
+    app, db_path = make_app()
+    try:
+        start = time.perf_counter()
+        with app.app_context():
+            finished_id, open_id, candidate_ids = seed(args)
+            engine = app.extensions['sqlalchemy'].engine
+        print(f'seeded {args.users} users, {args.elections + 2} elections, '
+              f'{args.votes * 2} votes in {time.perf_counter() - start:.1f}s')
+        plan = Plan(finished_id, open_id, candidate_ids)
+
+        rows = []
+        # Voters who vote in each mode must not have voted yet: give each mode its own block
+        # (block 0's first voter doubles as the logged-in voter for the read-only scenarios)
+        for block, mode in enumerate(modes):
+            voter_offset = block * args.requests
+            if mode == 'server':
+                server, _ = start_server(app)
+                port = server.server_port
+            for name in args.scenarios:
+                if mode == 'test_client':
+                    rows.append(run_test_client(app, engine, plan, name, args.requests, voter_offset))
+                else:
+                    rows.append(run_server(port, engine, plan, name, args.requests, voter_offset,
+                                           args.concurrency))
+            if mode == 'server':
+                server.shutdown()
+
+        print_table(rows)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({
+                    'meta': {
+                        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        'python': platform.python_version(),
+                        'platform': platform.platform(),
+                        'cpus': os.cpu_count(),
+                        'args': vars(args),
+                    },
+                    'results': rows,
+                }, f, indent=2)
+            print(f'\nwrote {args.json}')
+        if args.compare:
+            print_comparison(rows, args.compare)
+        sys.exit(1 if any(row['errors'] for row in rows) else 0)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
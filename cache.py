@@ -0,0 +1,154 @@
+# cache.py
+# Read-through cache for computed election tallies.
+#
+# The default backend is an in-process LRU with per-entry TTL. Setting
+# RESULTS_CACHE_BACKEND = 'redis' stores entries in a Redis-compatible server
+# instead (needs the optional `redis` package), so all workers share them.
+#
+# Entries are keyed on the election's tally_version, which every change to a
+# tally bumps in the database (a ballot, a new candidate, reconcile-tallies,
+# archiving), so no worker can serve a tally older than the row it just read
+# and nothing has to be invalidated across processes. Superseded versions just
+# age out: live tallies (only admins can see them) after RESULTS_CACHE_LIVE_TTL
+# seconds, tallies of ended elections after RESULTS_CACHE_ENDED_TTL.
+import time
+import pickle
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with optional per-entry TTL."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires_at or None, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """Cache backend on a Redis-compatible client.
+
+    Any object with redis-py's get(key), set(key, value, ex=None),
+    delete(key) and scan_iter(match=...) works, so tests can pass a simple
+    stand-in instead of a server.
+    """
+
+    def __init__(self, client, prefix='election:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis  # Optional dependency, only needed for this backend
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ResultsCache:
+    """Read-through cache of TallyResult objects keyed by election id."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.live_ttl = 5
+        self.ended_ttl = 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RESULTS_CACHE_BACKEND', 'memory')
+        if backend == 'redis':
+            self.backend = RedisCache.from_url(app.config['RESULTS_CACHE_URL'])
+        elif backend == 'memory':
+            self.backend = LRUCache(maxsize=app.config.get('RESULTS_CACHE_SIZE', 1024))
+        else:
+            raise ValueError(f'Unknown RESULTS_CACHE_BACKEND: {backend!r}')
+        self.live_ttl = app.config.get('RESULTS_CACHE_LIVE_TTL', 5)
+        self.ended_ttl = app.config.get('RESULTS_CACHE_ENDED_TTL', 3600)
+        app.extensions['results_cache'] = self
+
+    @staticmethod
+    def _key(election_id, version):
+        return f'results:{election_id}:{version}'
+
+    def get_or_compute(self, election_id, version, compute, ended):
+        """Return the cached tally for an election at tally_version `version`,
+        computing and storing it on a miss.
+
+        `ended` entries use the long ended TTL; live ones the short live TTL.
+        """
+        key = self._key(election_id, version)
+        tally = self.backend.get(key)
+        with self._lock:
+            if tally is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if tally is None:
+            tally = compute(election_id)
+            self.backend.set(key, tally, ttl=self.ended_ttl if ended else self.live_ttl)
+        return tally
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': (hits / lookups) * 100 if lookups else 0,
+        }
+
+
+results_cache = ResultsCache()
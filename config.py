@@ -3,4 +3,77 @@ import os
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a-very-secret-key-change-this' # IMPORTANT: Use environment variable
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///election.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    if SQLALCHEMY_DATABASE_URI.startswith('postgres://'):
+        # Some hosts still hand out the old scheme name SQLAlchemy no longer accepts
+        SQLALCHEMY_DATABASE_URI = 'postgresql://' + SQLALCHEMY_DATABASE_URI[len('postgres://'):]
+    if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        # Seconds a connection waits for SQLite's write lock before "database is locked"
+        # (WAL mode itself is switched on in models.py)
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT') or 15)}}
+    else:
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True, 'pool_size': 10, 'max_overflow': 20}
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Timezone admins enter election times in and voters see them in (stored as UTC)
+    DISPLAY_TIMEZONE = os.environ.get('DISPLAY_TIMEZONE') or 'Asia/Kolkata'
+    # Results cache: 'memory' (per-process LRU) or 'redis' (shared, needs the redis package)
+    RESULTS_CACHE_BACKEND = os.environ.get('RESULTS_CACHE_BACKEND') or 'memory'
+    RESULTS_CACHE_URL = os.environ.get('RESULTS_CACHE_URL') or 'redis://localhost:6379/0'
+    RESULTS_CACHE_SIZE = 1024
+    # Seconds a cached tally lives: a running election's, and an ended one's (entries are keyed on
+    # tally_version, so these only bound how long superseded versions linger)
+    RESULTS_CACHE_LIVE_TTL = 5
+    RESULTS_CACHE_ENDED_TTL = 3600
+    # Seconds a shared cache/proxy may serve results of an ended election to anonymous visitors
+    RESULTS_PUBLIC_MAX_AGE = 60
+    # Seconds a shared cache/proxy may serve the dashboard's election lists to anonymous visitors
+    # (never past the next election start or end)
+    ELECTION_LIST_MAX_AGE = 30
+    # Voters shown per page on Manage Voters
+    VOTERS_PAGE_SIZE = 50
+    # Password hashing: any werkzeug method string, e.g. 'scrypt', 'scrypt:16384:8:1',
+    # 'pbkdf2:sha256:600000'. Changing it re-hashes each user's password at their next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt'
+    PASSWORD_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1)
+    # Seconds without progress after which a 'running' background job is presumed dead (its worker
+    # was restarted or killed) and offered for a rerun
+    JOB_STALE_AFTER = 300
+    # Seconds a worker may reuse a logged-in user's identity (id, is_admin) without a DB lookup; 0 disables
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 30)
+    USER_CACHE_SIZE = 10000
+    # Seconds a worker may reuse a user's open/voted election lists (dashboard, /api/v1/me/elections);
+    # dropped at once when they vote in this process. 0 disables
+    ELIGIBILITY_CACHE_TTL = int(os.environ.get('ELIGIBILITY_CACHE_TTL') or 30)
+    ELIGIBILITY_CACHE_SIZE = 10000
+    # Retries (with jittered exponential backoff from BALLOT_RETRY_DELAY seconds) when casting a ballot hits a lock
+    BALLOT_MAX_RETRIES = 5
+    BALLOT_RETRY_DELAY = 0.05
+    # 'direct': each ballot is its own transaction. 'queue': ballots are journaled and
+    # group-committed in the background (see vote_queue.py; single worker process only)
+    VOTE_INGEST_MODE = os.environ.get('VOTE_INGEST_MODE') or 'direct'
+    VOTE_JOURNAL_PATH = os.environ.get('VOTE_JOURNAL_PATH')  # Default: instance/vote-journal.log
+    VOTE_QUEUE_BATCH_SIZE = 500
+    VOTE_QUEUE_FLUSH_INTERVAL = 0.01  # seconds to gather a group before each fsync
+    # Deleting an election removes its rows this many at a time, pausing between chunks
+    PURGE_CHUNK_SIZE = 2000
+    PURGE_CHUNK_PAUSE = 0.01  # seconds
+    # Rows fetched and written at a time by the vote/turnout exports (export.py)
+    EXPORT_CHUNK_SIZE = 5000
+    # Cold archival (archive.py, `flask archive-elections`): elections this many days past their end
+    # get their results frozen and their ballots moved to a separate archive database
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS') or 30)
+    ARCHIVE_DATABASE_URL = os.environ.get('ARCHIVE_DATABASE_URL')  # Default: sqlite:///instance/archive.db
+    ARCHIVE_CHUNK_SIZE = 5000
+    ARCHIVE_CHUNK_PAUSE = 0.01  # seconds
+    # Live results stream: seconds between publisher ticks, and between keepalive comments
+    LIVE_TICK_INTERVAL = 1.0
+    LIVE_KEEPALIVE = 15
+    # JSON API (/api/v1): default and largest page size, and seconds a shared cache may reuse a response
+    API_PAGE_SIZE = 50
+    API_MAX_PAGE_SIZE = 200
+    API_MAX_AGE = 5
+    # Per-request instrumentation (metrics.py): requests slower than SLOW_REQUEST_MS are logged with
+    # their SQL statements (the SLOW_REQUEST_STATEMENTS costliest); admins can scrape /admin/metrics
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or '1') != '0'
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS') or 500)
+    SLOW_REQUEST_STATEMENTS = 10
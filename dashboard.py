@@ -0,0 +1,103 @@
+# dashboard.py
+# Query layer for the index() dashboard. Each bucket is one filtered,
+# ordered (and where it can grow without bound, limited) SQL query that
+# the indexes in models.py can serve, so no Python loop ever walks the
+# whole election table. The per-user buckets come from the eligibility
+# cache (eligibility.py).
+import datetime
+from typing import NamedTuple, Optional
+from sqlalchemy import and_, func, select
+from models import db, Election, SiteCounter
+from eligibility import eligibility_cache
+from stats import bump_counter
+
+UPCOMING_LIMIT = 20
+FINISHED_LIMIT = 5
+# SiteCounter row bumped by bump_listing_version()
+LISTING_COUNTER = 'listings'
+
+
+class DashboardElections(NamedTuple):
+    available: list  # open now and not yet voted in by the user (eligibility.ElectionRow)
+    voted: list      # (ElectionRow, has_ended) pairs for elections the user voted in
+    upcoming: list   # active, not started yet, soonest first
+    finished: list   # most recently ended first
+
+
+class ListingVersion(NamedTuple):
+    """Everything an election listing depends on, as of `now` (conditional GETs)."""
+    changes: int   # the LISTING_COUNTER: moves when an election is added, deactivated, archived or deleted
+    last_change: Optional[datetime.datetime]  # the latest start_time/end_time at or before now
+    next_change: Optional[datetime.datetime]  # the next start_time/end_time after now
+
+    def max_age(self, now, limit):
+        """Seconds a cached listing stays current: at most `limit`, never past next_change."""
+        if self.next_change is None:
+            return limit
+        return max(0, min(limit, int((self.next_change - now).total_seconds())))
+
+
+def bump_listing_version():
+    """Record (in the caller's transaction) that an election was added, deactivated, archived or deleted."""
+    bump_counter(LISTING_COUNTER)
+
+
+def listing_version(now):
+    """The ListingVersion at `now`, in one query that never scans the election table.
+
+    Elections are never edited, so a listing only changes when the
+    LISTING_COUNTER moves or `now` crosses an election's start or end time.
+    The nearest boundaries on either side of `now` are index seeks
+    (ix_election_active_start, ix_election_end_time); the start times of
+    inactive elections don't matter, no listing shows those as open or upcoming.
+    """
+    def nearest(column, *conditions, after):
+        return select(column).where(*conditions).order_by(
+            column if after else column.desc()).limit(1).scalar_subquery()
+
+    active = Election.is_active == True
+    row = db.session.query(
+        func.coalesce(select(SiteCounter.value).where(SiteCounter.name == LISTING_COUNTER).scalar_subquery(), 0),
+        nearest(Election.start_time, active, Election.start_time <= now, after=False),
+        nearest(Election.end_time, Election.end_time < now, after=False),
+        nearest(Election.start_time, active, Election.start_time > now, after=True),
+        nearest(Election.end_time, Election.end_time >= now, after=True),
+    ).one()
+    passed = [time for time in row[1:3] if time is not None]
+    upcoming = [time for time in row[3:] if time is not None]
+    return ListingVersion(changes=row[0], last_change=max(passed) if passed else None,
+                          next_change=min(upcoming) if upcoming else None)
+
+
+def is_open(now):
+    """Filter for elections taking ballots at `now`."""
+    return and_(Election.is_active == True,
+                Election.start_time <= now,
+                Election.end_time >= now)
+
+
+def upcoming_elections(now, limit=UPCOMING_LIMIT):
+    return Election.query.filter(
+        Election.is_active == True, Election.start_time > now
+    ).order_by(Election.start_time).limit(limit).all()
+
+
+def finished_elections(now, limit=FINISHED_LIMIT):
+    return Election.query.filter(
+        Election.end_time < now
+    ).order_by(Election.end_time.desc()).limit(limit).all()
+
+
+def get_dashboard_elections(user_id, now):
+    """Return every dashboard bucket for `user_id` (None when anonymous).
+
+    `now` is an aware UTC datetime (timeutil.utcnow()), matching the UTC storage.
+    """
+    if user_id is not None:
+        available, voted = eligibility_cache.get(user_id, now)
+    else:
+        available, voted = [], []
+    return DashboardElections(available=available,
+                              voted=voted,
+                              upcoming=upcoming_elections(now),
+                              finished=finished_elections(now))
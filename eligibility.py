@@ -0,0 +1,91 @@
+# eligibility.py
+# Per-user eligibility for the dashboard and /api/v1/me/elections: the open
+# elections a user can still vote in, and the ones they already voted in.
+#
+# One UNION ALL query (both halves served by indexes) loads every active
+# election the user hasn't voted in (an anti-join on UserVoteStatus) that is
+# open now or opens before the cache entry expires, plus every election they
+# voted in. The rows are cached per user as plain tuples and split into
+# open/voted at read time, so an entry stays correct as elections open and
+# close during its lifetime. vote() drops the user's
+# entry, and creating or deleting an election clears them all; other worker
+# processes see those changes once ELIGIBILITY_CACHE_TTL runs out.
+# ELIGIBILITY_CACHE_TTL = 0 turns the cache off.
+import datetime
+from typing import NamedTuple, Optional
+from sqlalchemy import exists, literal, select, union_all
+from cache import LRUCache
+from models import db, Election, UserVoteStatus
+
+
+class ElectionRow(NamedTuple):
+    """The Election columns the dashboard and API show (vote_count as of loading)."""
+    id: int
+    name: str
+    position: str
+    start_time: Optional[datetime.datetime]
+    end_time: Optional[datetime.datetime]
+    is_active: bool
+    vote_count: int
+    voting_method: str
+    seats: int
+    voted: bool
+
+
+class Eligibility(NamedTuple):
+    available: list  # open now and not yet voted in, soonest ending first
+    voted: list      # (row, has_ended) pairs, most recently ending first
+
+
+_COLUMNS = (Election.id, Election.name, Election.position, Election.start_time,
+            Election.end_time, Election.is_active, Election.vote_count, Election.voting_method, Election.seats)
+
+
+def load_rows(user_id, now, horizon=0):
+    """Elections `user_id` can vote in between `now` and `horizon` seconds later, plus those
+    they voted in, ordered by end_time."""
+    already_voted = exists().where(UserVoteStatus.election_id == Election.id,
+                                   UserVoteStatus.user_id == user_id)
+    not_voted = select(*_COLUMNS, literal(False).label('voted')).where(
+        Election.is_active == True, Election.end_time >= now,
+        Election.start_time <= now + datetime.timedelta(seconds=horizon), ~already_voted)
+    voted = select(*_COLUMNS, literal(True).label('voted')).join(
+        UserVoteStatus, UserVoteStatus.election_id == Election.id
+    ).where(UserVoteStatus.user_id == user_id)
+    query = union_all(not_voted, voted).order_by('end_time')
+    return tuple(ElectionRow(*row) for row in db.session.execute(query))
+
+
+class EligibilityCache:
+
+    def __init__(self, app=None):
+        self.ttl = 30
+        self._cache = LRUCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('ELIGIBILITY_CACHE_TTL', 30)
+        self._cache = LRUCache(maxsize=app.config.get('ELIGIBILITY_CACHE_SIZE', 10000))
+        app.extensions['eligibility_cache'] = self
+
+    def get(self, user_id, now):
+        """The user's Eligibility at `now` (an aware UTC datetime)."""
+        rows = self._cache.get(user_id) if self.ttl else None
+        if rows is None:
+            rows = load_rows(user_id, now, horizon=self.ttl)
+            if self.ttl:
+                self._cache.set(user_id, rows, ttl=self.ttl)
+        available = [row for row in rows
+                     if not row.voted and row.start_time is not None and row.start_time <= now <= row.end_time]
+        voted = [(row, row.end_time is not None and row.end_time < now) for row in reversed(rows) if row.voted]
+        return Eligibility(available, voted)
+
+    def invalidate(self, user_id):
+        self._cache.delete(user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+
+eligibility_cache = EligibilityCache()
@@ -0,0 +1,219 @@
+# export.py
+# Audit exports of one election's raw rows: its ballots (Vote) and its
+# turnout (UserVoteStatus), as CSV or as a compact binary columnar file.
+#
+# Rows come off a streaming cursor (server-side on PostgreSQL, SQLite's own
+# step-by-step cursor) EXPORT_CHUNK_SIZE at a time, and each chunk is encoded
+# and handed on before the next one is fetched. No ORM objects are built and
+# nothing holds the whole result, so memory stays flat however many rows the
+# election has. Rows follow the election's index (votes by candidate then id,
+# turnout by id) so the database never has to sort millions of rows.
+# Archived elections are read from the archive database (see archive.py).
+#
+# Columnar layout (all integers little-endian):
+#   b'ELXCOL1\n', uint32 header length, JSON header
+#       {"table", "election_id", "columns": [{"name", "type"}], "candidates": {id: name}}
+#   then blocks of: uint32 row count, then each column in header order:
+#       int64      count x int64
+#       timestamp  count x int64 microseconds since 1970-01-01 UTC (INT64_MIN = missing)
+#       string     count x uint32 byte lengths, then the UTF-8 bytes
+#   and a uint32 0 after the last block. read_columnar() reads it back.
+import io
+import csv
+import sys
+import json
+import struct
+import datetime
+from array import array
+from sqlalchemy import select, func, cast, type_coerce, Integer, String
+from models import db, Candidate, Vote, UserVoteStatus
+
+FORMATS = ('csv', 'columnar')
+MAGIC = b'ELXCOL1\n'
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_MISSING = -2 ** 63
+
+# name -> (model, [(column name, column, columnar type)], sort order)
+TABLES = {
+    'votes': (Vote, [('vote_id', Vote.id, 'int64'),
+                     ('candidate_id', Vote.candidate_id, 'int64'),
+                     ('timestamp', Vote.timestamp, 'timestamp')],
+              (Vote.candidate_id, Vote.id)),
+    'turnout': (UserVoteStatus, [('status_id', UserVoteStatus.id, 'int64'),
+                                 ('user_id', UserVoteStatus.user_id, 'string'),
+                                 ('timestamp', UserVoteStatus.timestamp, 'timestamp')],
+                (UserVoteStatus.id,)),
+}
+
+
+def export_filename(election_id, table, fmt):
+    return f'election-{election_id}-{table}.{"csv" if fmt == "csv" else "bin"}'
+
+
+def export_election(election_id, table, fmt='csv', chunk_size=5000, archived=False):
+    """Yield the export of one of an election's TABLES as chunks of bytes.
+
+    archived=True reads the rows from the archive database.
+    """
+    if fmt == 'csv':
+        return _csv_chunks(election_id, table, chunk_size, archived)
+    return _columnar_chunks(election_id, table, chunk_size, archived)
+
+
+def _row_chunks(election_id, table, fmt, chunk_size, archived):
+    model, columns, order = TABLES[table]
+    if archived:
+        from archive import archive_store, archive_table
+        source = archive_table(model).c
+        connection = archive_store.engine.connect()
+    else:
+        source = model.__table__.c
+        # Core rather than session.execute(): plain rows, without the ORM's per-row loading step
+        connection = db.session.connection()
+    dialect = connection.dialect.name
+    statement = (select(*[_timestamp_expression(source[column.key], fmt, dialect) if kind == 'timestamp'
+                          else source[column.key] for _, column, kind in columns])
+                 .where(source.election_id == election_id)
+                 .order_by(*[source[column.key] for column in order])
+                 .execution_options(yield_per=chunk_size))
+    try:
+        result = connection.execute(statement)
+        try:
+            for rows in result.partitions():
+                yield rows
+        finally:
+            result.close()
+    finally:
+        if archived:
+            connection.close()
+
+
+def _timestamp_expression(column, fmt, dialect):
+    """What to SELECT for a timestamp column.
+
+    SQLite keeps UTCDateTime as 'YYYY-MM-DD HH:MM:SS.ffffff' text, and parsing
+    it into a datetime per row is half the cost of an export. There the CSV
+    takes the text as is (see _iso_timestamp) and the columnar format has
+    SQLite compute the microseconds.
+    """
+    if dialect != 'sqlite':
+        return column
+    if fmt == 'csv':
+        return type_coerce(column, String)
+    return cast(func.strftime('%s', column), Integer) * 1000000 + cast(func.substr(column, 21), Integer)
+
+
+def _iso_timestamp(value):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value.replace(' ', 'T', 1) + '+00:00'
+    return value.isoformat(timespec='microseconds')
+
+
+def _epoch_micros(value):
+    if value is None:
+        return _MISSING
+    if isinstance(value, int):
+        return value
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _candidate_names(election_id):
+    return dict(db.session.query(Candidate.id, Candidate.name).filter(Candidate.election_id == election_id))
+
+
+def _csv_chunks(election_id, table, chunk_size, archived):
+    _, columns, _ = TABLES[table]
+    names = _candidate_names(election_id) if table == 'votes' else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = [name for name, _, _ in columns]
+    if names is not None:
+        header.insert(2, 'candidate_name')
+    writer.writerow(header)
+    for rows in _row_chunks(election_id, table, 'csv', chunk_size, archived):
+        if names is not None:
+            writer.writerows((id, candidate_id, names.get(candidate_id, ''), _iso_timestamp(timestamp))
+                             for id, candidate_id, timestamp in rows)
+        else:
+            writer.writerows((id, user_id, _iso_timestamp(timestamp)) for id, user_id, timestamp in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _columnar_chunks(election_id, table, chunk_size, archived):
+    _, columns, _ = TABLES[table]
+    header = {'table': table, 'election_id': election_id,
+              'columns': [{'name': name, 'type': kind} for name, _, kind in columns]}
+    if table == 'votes':
+        header['candidates'] = {str(id): name for id, name in _candidate_names(election_id).items()}
+    encoded = json.dumps(header).encode('utf-8')
+    yield MAGIC + struct.pack('<I', len(encoded)) + encoded
+    for rows in _row_chunks(election_id, table, 'columnar', chunk_size, archived):
+        parts = [struct.pack('<I', len(rows))]
+        for i, (_, _, kind) in enumerate(columns):
+            parts.extend(_encode_column(kind, [row[i] for row in rows]))
+        yield b''.join(parts)
+    yield struct.pack('<I', 0)
+
+
+def _encode_column(kind, values):
+    if kind == 'string':
+        data = [value.encode('utf-8') for value in values]
+        return [_little_endian(array('I', map(len, data))), b''.join(data)]
+    if kind == 'timestamp':
+        values = [_epoch_micros(value) for value in values]
+    return [_little_endian(array('q', values))]
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def read_columnar(stream):
+    """Read a columnar export from a binary file object.
+
+    Returns (header, blocks) where blocks yields one {column name: list} per
+    block; timestamps come back as aware UTC datetimes (or None).
+    """
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Not a columnar election export.')
+    (size,) = struct.unpack('<I', stream.read(4))
+    header = json.loads(stream.read(size))
+
+    def blocks():
+        while True:
+            (count,) = struct.unpack('<I', stream.read(4))
+            if not count:
+                return
+            block = {}
+            for column in header['columns']:
+                if column['type'] == 'string':
+                    lengths = _read_array(stream, 'I', count)
+                    data = stream.read(sum(lengths))
+                    offsets = [0]
+                    for length in lengths:
+                        offsets.append(offsets[-1] + length)
+                    values = [data[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+                else:
+                    values = _read_array(stream, 'q', count).tolist()
+                    if column['type'] == 'timestamp':
+                        values = [_EPOCH + value * _MICROSECOND if value != _MISSING else None for value in values]
+                block[column['name']] = values
+            yield block
+    return header, blocks()
+
+
+def _read_array(stream, typecode, count):
+    values = array(typecode)
+    values.frombytes(stream.read(count * values.itemsize))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
@@ -1,8 +1,8 @@
 # forms.py
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, RadioField, DateTimeField, SelectField
-from wtforms.validators import DataRequired, Length, Optional, EqualTo, ValidationError
-from models import User
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, PasswordField, BooleanField, SubmitField, RadioField, DateTimeField, SelectField, IntegerField
+from wtforms.validators import DataRequired, Length, Optional, EqualTo, ValidationError, NumberRange
 import datetime
 
 # Login Form
@@ -17,6 +17,41 @@ class VoteForm(FlaskForm):
     candidate_id = RadioField('Select a Candidate', validators=[DataRequired()], coerce=int)
     submit = SubmitField('Cast Vote')
 
+# Ranked Vote Form: ranked_vote_form() adds one rank select per candidate
+class RankedVoteForm(FlaskForm):
+    submit = SubmitField('Cast Ballot')
+
+    def rank_fields(self):
+        return [field for field in self if field.name.startswith('rank_')]
+
+    def ranking(self):
+        """Candidate ids in the order the voter ranked them."""
+        ranked = [(int(field.data), int(field.name[len('rank_'):])) for field in self.rank_fields() if field.data]
+        return [candidate_id for _, candidate_id in sorted(ranked)]
+
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators):
+            return False
+        ranks = sorted(int(field.data) for field in self.rank_fields() if field.data)
+        if not ranks:
+            self.form_errors.append('Rank at least one candidate.')
+            return False
+        if ranks != list(range(1, len(ranks) + 1)):
+            self.form_errors.append('Use each rank once, starting from 1 with no gaps.')
+            return False
+        return True
+
+
+def ranked_vote_form(candidates):
+    """A RankedVoteForm with a 'rank_<candidate id>' select (blank or 1..N) per candidate."""
+    choices = [('', '-')] + [(str(i), str(i)) for i in range(1, len(candidates) + 1)]
+
+    class Form(RankedVoteForm):
+        pass
+    for candidate in candidates:
+        setattr(Form, f'rank_{candidate.id}', SelectField(candidate.name, choices=choices, validators=[Optional()]))
+    return Form()
+
 # Election Form
 class ElectionForm(FlaskForm):
     name = StringField('Election Name', validators=[DataRequired(), Length(max=100)])
@@ -24,12 +59,22 @@ class ElectionForm(FlaskForm):
     start_time = DateTimeField('Start Time', format='%Y-%m-%d %H:%M', validators=[DataRequired()])
     end_time = DateTimeField('End Time', format='%Y-%m-%d %H:%M', validators=[DataRequired()])
     is_active = BooleanField('Active')
+    voting_method = SelectField('Voting Method', default='plurality', choices=[
+        ('plurality', 'Single choice (most votes wins)'),
+        ('irv', 'Ranked choice, one seat (instant runoff)'),
+        ('stv', 'Ranked choice, several seats (STV)'),
+    ])
+    seats = IntegerField('Seats', default=1, validators=[Optional(), NumberRange(min=1, max=50)])
     submit = SubmitField('Create Election')
 
     def validate_end_time(self, end_time):
         if end_time.data and self.start_time.data and end_time.data <= self.start_time.data:
             raise ValidationError('End time must be after start time.')
 
+    def validate_seats(self, seats):
+        if seats.data and seats.data > 1 and self.voting_method.data != 'stv':
+            raise ValidationError('Only STV elections can fill more than one seat.')
+
     # Removed validation that prevents start_time from being in the past
     # This allows elections to be created with a start time in the past
     # def validate_start_time(self, start_time):
@@ -48,6 +93,7 @@ class RegisterForm(FlaskForm):
 
     # Custom validator to check if user_id already exists
     def validate_user_id(self, user_id):
+        from models import User  # Deferred so importing forms doesn't load the models
         user = User.query.filter_by(id=user_id.data).first()
         if user:
             raise ValidationError('This College ID is already registered. Please login or use a different ID.')
@@ -63,10 +109,17 @@ class VoterForm(FlaskForm):
 
      # Custom validator to check if user_id already exists (for adding new voters)
      def validate_user_id(self, user_id):
+        from models import User  # Deferred so importing forms doesn't load the models
         user = User.query.filter_by(id=user_id.data).first()
         if user:
             raise ValidationError('This College ID already exists.')
 
+# --- Admin Bulk Voter Import Form ---
+class VoterImportForm(FlaskForm):
+    roster = FileField('Roster CSV (user_id,password[,is_admin])',
+                       validators=[FileRequired(), FileAllowed(['csv', 'txt'], 'CSV files only.')])
+    submit = SubmitField('Import Voters')
+
 # --- Candidate Management Form ---
 class CandidateForm(FlaskForm):
     name = StringField('Candidate Name', validators=[DataRequired(), Length(max=100)])
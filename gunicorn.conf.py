@@ -0,0 +1,43 @@
+# gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Every setting can be overridden from the environment:
+#   WEB_CONCURRENCY  worker processes (default 2 x CPUs + 1)
+#   WORKER_CLASS     'gthread' (default) or 'gevent' (pip install gevent)
+#   THREADS          threads per gthread worker
+#   BIND             address to listen on
+#
+# gevent suits many slow or long-lived clients (e.g. the live results
+# streams, which hold a thread each under gthread) on PostgreSQL. SQLite
+# calls block the whole gevent worker while they wait for the write lock,
+# so with SQLite keep the default gthread workers.
+import os
+import multiprocessing
+
+bind = os.environ.get('BIND') or '0.0.0.0:8000'
+worker_class = os.environ.get('WORKER_CLASS') or 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+threads = int(os.environ.get('THREADS') or 4)  # gthread only
+worker_connections = 1000                      # gevent only
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+# Each worker imports wsgi.py itself, so no database connection or
+# background thread (vote queue, live feed, purge) is ever shared across a fork
+preload_app = False
+
+if os.environ.get('VOTE_INGEST_MODE') == 'queue' and workers > 1:
+    # The queue's duplicate check and journal are per process (see vote_queue.py)
+    workers = 1
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        try:
+            # Let PostgreSQL queries yield to other greenlets instead of blocking the worker
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            pass
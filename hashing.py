@@ -0,0 +1,79 @@
+# hashing.py
+# Password hashing with parameters taken from Config instead of werkzeug's
+# built-in defaults.
+#
+# PASSWORD_HASH_METHOD is any werkzeug method string, e.g. 'scrypt',
+# 'scrypt:16384:8:1' or 'pbkdf2:sha256:600000'. Hashes stored with other
+# parameters still verify; login() re-hashes them with the current ones
+# (see needs_rehash). Verification runs on a bounded thread pool:
+# hashlib's scrypt/pbkdf2 release the GIL, so concurrent logins use every
+# core while at most PASSWORD_HASH_WORKERS hashes run at once.
+# Under gevent the pool uses gevent's native threads, so a login waits on
+# its hash without blocking every other greenlet in the worker.
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+def _thread_pool_class():
+    if 'gevent.monkey' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            # Patched threads are greenlets; hashing on one would stall the whole worker
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            return NativeThreadPoolExecutor
+    return ThreadPoolExecutor
+
+
+class PasswordHasher:
+
+    def __init__(self, app=None):
+        self.method = 'scrypt'
+        self.salt_length = 16
+        self._prefix = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.workers = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        self.salt_length = app.config.get('PASSWORD_SALT_LENGTH', 16)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS')
+        self._prefix = None
+        app.extensions['password_hasher'] = self
+
+    @property
+    def prefix(self):
+        # werkzeug expands shorthand like 'scrypt' to 'scrypt:32768:8:1'; hash once to learn
+        # the full parameter string that needs_rehash() compares stored hashes against.
+        # Done on first use rather than in init_app: one scrypt hash is most of a worker's startup.
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self.method, self.salt_length).split('$', 1)[0]
+        return self._prefix
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = _thread_pool_class()(max_workers=self.workers,
+                                                      thread_name_prefix='password-hash')
+        return self._pool
+
+    def hash(self, password):
+        return generate_password_hash(password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        """Check a password on the hashing pool; blocks the caller until done."""
+        if not password_hash:
+            return False
+        return self._executor().submit(check_password_hash, password_hash, password).result()
+
+    def needs_rehash(self, password_hash):
+        """True if the stored hash was made with different parameters than configured."""
+        return bool(password_hash) and password_hash.split('$', 1)[0] != self.prefix
+
+
+password_hasher = PasswordHasher()
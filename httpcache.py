@@ -0,0 +1,61 @@
+# httpcache.py
+# Conditional GET helpers: strong ETags built from cheap version numbers so a
+# matching If-None-Match is answered with 304 before any tally query or
+# template render, plus Cache-Control headers a reverse proxy can act on.
+import hashlib
+from flask import request, session, make_response
+from flask_login import current_user
+
+
+def make_etag(*parts):
+    """Strong ETag value (unquoted) from the parts that determine a page's content."""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def viewer_key():
+    """The part of a page that depends on who is looking (navbar, admin links)."""
+    if not current_user.is_authenticated:
+        return 'anon'
+    return f'{current_user.id}:{int(bool(current_user.is_admin))}'
+
+
+def shareable():
+    """True if the page may be stored by shared caches: an anonymous viewer
+    with no flash message waiting to be shown on it."""
+    return not current_user.is_authenticated and not session.get('_flashes')
+
+
+def is_not_modified(etag, last_modified=None, public=False):
+    """True if the client's cached copy is still current.
+
+    Pending flash messages force a full render, otherwise a 304 would hide them.
+    If-Modified-Since is only honoured for `public` pages (see shareable()):
+    unlike the ETag, a date says nothing about who the copy was rendered for.
+    """
+    if session.get('_flashes'):
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if public and last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def cache_headers(response, etag, last_modified=None, public=False, max_age=0):
+    """Attach validators and Cache-Control to a response (200 or 304)."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if public:
+        # Shared caches may store it; Vary keeps logged-in pages out of the anonymous copy
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.vary.add('Cookie')
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
+
+def not_modified_response(etag, last_modified=None, public=False, max_age=0):
+    return cache_headers(make_response('', 304), etag, last_modified, public, max_age)
@@ -0,0 +1,59 @@
+# identity.py
+# Per-process cache of logged-in user identities for Flask-Login's
+# user_loader, so authenticated page views don't each cost a User lookup.
+#
+# Only the fields pages need (id, is_admin) are cached, as a plain
+# UserMixin object that is never attached to a database session. Entries
+# expire after USER_CACHE_TTL seconds and are dropped immediately when
+# this process changes a user; other worker processes see the change once
+# the TTL runs out. USER_CACHE_TTL = 0 turns the cache off.
+from flask_login import UserMixin
+from cache import LRUCache
+from models import db, User
+
+_MISSING = object()  # Cached "no such user", so stale sessions don't hit the DB either
+
+
+class CachedUser(UserMixin):
+
+    def __init__(self, id, is_admin):
+        self.id = id
+        self.is_admin = bool(is_admin)
+
+    def get_id(self):
+        return self.id
+
+
+class IdentityCache:
+
+    def __init__(self, app=None):
+        self.ttl = 30
+        self._cache = LRUCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('USER_CACHE_TTL', 30)
+        self._cache = LRUCache(maxsize=app.config.get('USER_CACHE_SIZE', 10000))
+        app.extensions['identity_cache'] = self
+
+    def load(self, user_id):
+        """Return a CachedUser for user_id, or None if there is no such user."""
+        if self.ttl:
+            cached = self._cache.get(user_id)
+            if cached is not None:
+                return None if cached is _MISSING else cached
+        row = db.session.query(User.id, User.is_admin).filter(User.id == user_id).first()
+        identity = CachedUser(row.id, row.is_admin) if row else None
+        if self.ttl:
+            self._cache.set(user_id, identity if identity else _MISSING, ttl=self.ttl)
+        return identity
+
+    def invalidate(self, user_id):
+        self._cache.delete(user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+
+identity_cache = IdentityCache()
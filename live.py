@@ -0,0 +1,154 @@
+# live.py
+# Server-Sent Events feed of turnout and tallies for elections being watched.
+#
+# One publisher thread per process does the work: every LIVE_TICK_INTERVAL
+# seconds it reads tally_version/vote_count for the elections that have
+# subscribers (one query), re-reads the candidate counters only for the ones
+# that changed, and renders each update once. Subscribers just wait on a
+# shared Condition and write out the pre-rendered text, so N open streams
+# cost one aggregation per tick instead of N page renders.
+#
+# Every subscriber gets turnout; the per-candidate counts (full on connect,
+# then only the candidates that changed) go to admins, or to everyone once
+# the election has ended.
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from typing import NamedTuple
+from models import db, Election
+from tally import read_counters
+from stats import read_counters as read_site_counters, turnout
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(event, data):
+    """Format one SSE message."""
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Snapshot(NamedTuple):
+    seq: int
+    version: tuple  # (tally_version, registered users) it was built from
+    tally: dict     # candidate_id -> votes
+    turnout: str
+    tally_full: str
+    tally_delta: str
+
+
+class LiveFeed:
+
+    def __init__(self, app=None):
+        self.app = None
+        self._cond = threading.Condition()
+        self._watchers = Counter()  # election_id -> open streams
+        self._snapshots = {}        # election_id -> latest Snapshot
+        self._publisher = None
+        self.ticks = 0              # aggregation passes so far (for benchmarks)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.tick_interval = app.config.get('LIVE_TICK_INTERVAL', 1.0)
+        self.keepalive = app.config.get('LIVE_KEEPALIVE', 15)
+        app.extensions['live_feed'] = self
+
+    def _ensure_publisher(self):
+        # Started on the first subscriber, so CLI commands never spawn it
+        with self._cond:
+            if self._publisher is None or not self._publisher.is_alive():
+                self._publisher = threading.Thread(target=self._run, name='live-feed', daemon=True)
+                self._publisher.start()
+
+    # --- Publisher ---------------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: +self._watchers)
+                watched = list(+self._watchers)
+                # Forget elections nobody is watching any more
+                for election_id in list(self._snapshots):
+                    if election_id not in self._watchers:
+                        del self._snapshots[election_id]
+            try:
+                with self.app.app_context():
+                    updates = self._collect(watched)
+                    db.session.remove()
+            except Exception:
+                logger.exception('Live feed tick failed')
+                updates = {}
+            with self._cond:
+                self.ticks += 1
+                if updates:
+                    self._snapshots.update(updates)
+                    self._cond.notify_all()
+            time.sleep(self.tick_interval)
+
+    def _collect(self, election_ids):
+        """Build a new Snapshot for every watched election whose numbers moved."""
+        users = read_site_counters()['users']
+        rows = db.session.query(Election.id, Election.tally_version, Election.vote_count).filter(
+            Election.id.in_(election_ids)).all()
+        updates = {}
+        for election_id, tally_version, vote_count in rows:
+            previous = self._snapshots.get(election_id)
+            version = (tally_version, users)
+            if previous is not None and previous.version == version:
+                continue
+            tally = {candidate_id: votes for candidate_id, _, votes in read_counters(election_id)}
+            old = previous.tally if previous is not None else {}
+            delta = {candidate_id: votes for candidate_id, votes in tally.items() if old.get(candidate_id) != votes}
+            updates[election_id] = Snapshot(
+                seq=previous.seq + 1 if previous is not None else 1,
+                version=version,
+                tally=tally,
+                turnout=sse_event('turnout', {'election_id': election_id, 'votes': vote_count,
+                                              'turnout': round(turnout(vote_count, users), 2)}),
+                tally_full=sse_event('tally', {'election_id': election_id, 'full': True, 'candidates': tally}),
+                tally_delta=sse_event('tally', {'election_id': election_id, 'full': False, 'candidates': delta}),
+            )
+        return updates
+
+    # --- Subscribers -------------------------------------------------------
+
+    def stream(self, election_id, include_tally=False):
+        """Generator of SSE text for one subscriber; runs until the client disconnects."""
+        self._ensure_publisher()
+        with self._cond:
+            self._watchers[election_id] += 1
+            self._cond.notify_all()
+        try:
+            yield f'retry: {int(self.tick_interval * 3000)}\n\n'
+            last_seq = 0
+            while True:
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: getattr(self._snapshots.get(election_id), 'seq', 0) > last_seq,
+                        timeout=self.keepalive)
+                    snapshot = self._snapshots.get(election_id)
+                if snapshot is None or snapshot.seq <= last_seq:
+                    yield ': keepalive\n\n'
+                    continue
+                # Consecutive update: send what changed; after a gap (or first time): everything
+                consecutive = last_seq and snapshot.seq == last_seq + 1
+                message = snapshot.turnout
+                if include_tally:
+                    message += snapshot.tally_delta if consecutive else snapshot.tally_full
+                last_seq = snapshot.seq
+                yield message
+        finally:
+            with self._cond:
+                self._watchers[election_id] -= 1
+                if self._watchers[election_id] <= 0:
+                    del self._watchers[election_id]
+
+    def subscriber_count(self, election_id=None):
+        with self._cond:
+            return self._watchers[election_id] if election_id is not None else sum(self._watchers.values())
+
+
+live_feed = LiveFeed()
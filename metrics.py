@@ -0,0 +1,228 @@
+# metrics.py
+# Per-request instrumentation: how many SQL statements each request ran and
+# how long they took (SQLAlchemy engine events), time spent rendering
+# templates (Flask's template signals) and the total time, per endpoint.
+#
+# - Requests slower than SLOW_REQUEST_MS are logged as warnings together with
+#   the statements they ran. Identical statements are grouped, so an N+1
+#   loop shows up as one line run N times.
+# - The aggregated histograms are served to admins in Prometheus text format
+#   at /admin/metrics. They are per process: with several workers, each
+#   scrape sees the worker that answered it.
+#
+# METRICS_ENABLED = False leaves every hook off.
+import re
+import time
+import logging
+import threading
+from bisect import bisect_left
+from flask import g, has_app_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """Bucket counts in the shape Prometheus expects (`le` = less than or equal)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestStats:
+    """What the current request has done so far; lives on flask.g."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_start = None
+        self.statements = {}  # SQL text -> [times run, total seconds]
+
+    def record_query(self, statement, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.slow = 0
+        self.responses = {}  # status code -> count
+
+
+def _current():
+    # Engine events also fire in CLI commands and background threads (purge,
+    # live feed, vote queue); only requests have stats to add to
+    return g.get('_request_stats') if has_app_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    if stats is not None:
+        started = conn.info.get('metrics_query_start')
+        if started is not None:
+            stats.record_query(statement, time.perf_counter() - started)
+
+
+def _label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _one_line(statement, limit=300):
+    statement = re.sub(r'\s+', ' ', statement).strip()
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+
+class RequestMetrics:
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.slow_ms = 500
+        self.slow_statements = 10
+        self._lock = threading.Lock()
+        self._endpoints = {}  # endpoint -> EndpointStats
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from models import db
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.slow_ms = app.config.get('SLOW_REQUEST_MS', 500)
+        self.slow_statements = app.config.get('SLOW_REQUEST_STATEMENTS', 10)
+        app.extensions['request_metrics'] = self
+        if not self.enabled:
+            return
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+
+    # --- Request lifecycle -------------------------------------------------
+
+    def _start_request(self):
+        g._request_stats = RequestStats()
+
+    def _render_started(self, sender, template, context, **extra):
+        stats = _current()
+        if stats is not None:
+            stats.render_start = time.perf_counter()
+
+    def _render_finished(self, sender, template, context, **extra):
+        stats = _current()
+        if stats is not None and stats.render_start is not None:
+            stats.render_time += time.perf_counter() - stats.render_start
+            stats.render_start = None
+
+    def _finish_request(self, response):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return response
+        duration = time.perf_counter() - stats.start
+        endpoint = request.endpoint or 'unmatched'
+        slow = duration * 1000 >= self.slow_ms
+        with self._lock:
+            endpoint_stats = self._endpoints.get(endpoint)
+            if endpoint_stats is None:
+                endpoint_stats = self._endpoints[endpoint] = EndpointStats()
+            endpoint_stats.duration.observe(duration)
+            endpoint_stats.queries.observe(stats.queries)
+            endpoint_stats.db_time += stats.db_time
+            endpoint_stats.render_time += stats.render_time
+            endpoint_stats.slow += slow
+            endpoint_stats.responses[response.status_code] = endpoint_stats.responses.get(response.status_code, 0) + 1
+        if slow:
+            self._log_slow(endpoint, response.status_code, duration, stats)
+        return response
+
+    def _log_slow(self, endpoint, status, duration, stats):
+        # Costliest statements first, each with how often it ran
+        worst = sorted(stats.statements.items(), key=lambda item: -item[1][1])[:self.slow_statements]
+        lines = [f'  {count:>4}x {seconds * 1000:8.1f} ms  {_one_line(statement)}'
+                 for statement, (count, seconds) in worst]
+        logger.warning('Slow request %s %s -> %s (%s): %.0f ms, %d queries (%.0f ms in the database, '
+                       '%d distinct), %.0f ms rendering\n%s',
+                       request.method, request.full_path.rstrip('?'), status, endpoint, duration * 1000,
+                       stats.queries, stats.db_time * 1000, len(stats.statements), stats.render_time * 1000,
+                       '\n'.join(lines))
+
+    # --- Export ------------------------------------------------------------
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render(self):
+        """All endpoints' metrics in Prometheus text exposition format."""
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            out = []
+
+            def header(name, kind, help_text):
+                out.append(f'# HELP {name} {help_text}')
+                out.append(f'# TYPE {name} {kind}')
+
+            def histogram(name, help_text, attr):
+                header(name, 'histogram', help_text)
+                for endpoint, stats in endpoints:
+                    hist = getattr(stats, attr)
+                    for bound, count in hist.cumulative():
+                        out.append(f'{name}_bucket{{endpoint="{_label(endpoint)}",le="{bound}"}} {count}')
+                    out.append(f'{name}_sum{{endpoint="{_label(endpoint)}"}} {hist.sum}')
+                    out.append(f'{name}_count{{endpoint="{_label(endpoint)}"}} {hist.count}')
+
+            def counter(name, help_text, value):
+                header(name, 'counter', help_text)
+                for endpoint, stats in endpoints:
+                    out.append(f'{name}{{endpoint="{_label(endpoint)}"}} {value(stats)}')
+
+            histogram('election_request_duration_seconds', 'Time to build the response.', 'duration')
+            histogram('election_request_queries', 'SQL statements run per request.', 'queries')
+            counter('election_request_db_seconds_total', 'Time spent in SQL statements.', lambda s: s.db_time)
+            counter('election_request_render_seconds_total', 'Time spent rendering templates.',
+                    lambda s: s.render_time)
+            counter('election_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS.', lambda s: s.slow)
+            header('election_responses_total', 'counter', 'Responses by status code.')
+            for endpoint, stats in endpoints:
+                for status, count in sorted(stats.responses.items()):
+                    out.append(f'election_responses_total{{endpoint="{_label(endpoint)}",code="{status}"}} {count}')
+        return '\n'.join(out) + '\n'
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,144 @@
+# migrations.py
+# Lightweight, idempotent schema upgrades for databases created by older
+# versions of the app (e.g. an existing instance/election.db).
+# Every step checks the live schema first, so `flask upgrade-db` is safe to re-run.
+from sqlalchemy import inspect, text
+from models import db, Election, SchemaMigration, SiteCounter
+from timeutil import local_to_utc
+from stats import reconcile_stats
+from tally import reconcile_counters
+
+
+def ensure_indexes():
+    """Create any index declared on the models that the database is missing.
+
+    Returns the names of the indexes that were created.
+    """
+    inspector = inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=db.engine)
+                created.append(index.name)
+    return created
+
+
+def ensure_columns():
+    """Add columns declared on the models that existing tables are missing.
+
+    Only handles nullable columns or ones with a server default, which is
+    all SQLite's ALTER TABLE ADD COLUMN supports. Returns 'table.column' names.
+    """
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect)}'
+            if column.server_default is not None:
+                ddl += f' NOT NULL DEFAULT {column.server_default.arg}' if not column.nullable \
+                    else f' DEFAULT {column.server_default.arg}'
+            with db.engine.begin() as conn:
+                conn.execute(text(ddl))
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def election_times_to_utc():
+    """Older versions stored ElectionForm input as naive display-timezone wall-clock
+    times. Reinterpret them in that timezone and rewrite them as UTC."""
+    for election in Election.query.all():
+        # UTCDateTime reads naive values back as UTC; drop that to get the wall-clock time
+        if election.start_time is not None:
+            election.start_time = local_to_utc(election.start_time.replace(tzinfo=None))
+        if election.end_time is not None:
+            election.end_time = local_to_utc(election.end_time.replace(tzinfo=None))
+    db.session.commit()
+
+
+# One-off data migrations, applied in order and recorded in SchemaMigration
+DATA_MIGRATIONS = [
+    ('election_times_to_utc', election_times_to_utc),
+]
+
+
+def apply_data_migrations(fresh):
+    """Run the data migrations this database hasn't recorded yet.
+
+    A `fresh` database (no tables until now) holds nothing to convert, so the
+    migrations are just recorded. Anything else is judged by what it has
+    recorded, not by which tables exist: a db.create_all() on an old database
+    adds an empty schema_migration table without converting any rows.
+    """
+    applied = {name for (name,) in db.session.query(SchemaMigration.name).all()}
+    changes = []
+    for name, migrate in DATA_MIGRATIONS:
+        if name in applied:
+            continue
+        if not fresh:
+            migrate()
+            changes.append(f'applied data migration {name}')
+        db.session.add(SchemaMigration(name=name))
+        db.session.commit()
+    return changes
+
+
+def create_database():
+    """db.create_all() for the development entry points (`python app.py`, /init-db).
+
+    A database it creates from scratch is stamped with every data migration,
+    so a later `flask upgrade-db` leaves its (already UTC) rows alone; on an
+    existing database it only adds missing tables, leaving upgrade-db to
+    convert the data.
+    """
+    fresh = not inspect(db.engine).has_table('election')
+    db.create_all()
+    if fresh:
+        apply_data_migrations(fresh=True)
+
+
+def upgrade_database():
+    """Bring the database schema up to date with models.py (tables, columns, indexes, data).
+
+    Returns a list of human-readable descriptions of what changed.
+    """
+    changes = []
+
+    inspector = inspect(db.engine)
+    fresh = not inspector.has_table('election')
+    missing_tables = [t.name for t in db.metadata.sorted_tables if not inspector.has_table(t.name)]
+    # create_all only adds missing tables (with their indexes); it never alters existing ones
+    db.create_all()
+    changes.extend(f'created table {name}' for name in missing_tables)
+
+    changes.extend(f'added column {name}' for name in ensure_columns())
+    changes.extend(f'created index {name}' for name in ensure_indexes())
+
+    changes.extend(apply_data_migrations(fresh))
+
+    if db.session.query(SiteCounter.name).first() is None:
+        # No counters yet (first upgrade since they were added, or the table came
+        # from a plain db.create_all()): seed them from the tables
+        if reconcile_stats():
+            changes.append('seeded dashboard counters')
+        db.session.commit()
+
+    # Results read the per-candidate counters, which an older database never
+    # kept (or a plain db.create_all() left empty): bring them up to the votes
+    drifted = reconcile_counters()
+    if drifted:
+        changes.append(f'recounted {len(drifted)} candidate tallies')
+    db.session.commit()
+
+    if changes and db.engine.dialect.name == 'sqlite':
+        # Refresh the query planner's statistics so the new indexes get used
+        with db.engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+    return changes
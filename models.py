@@ -1,10 +1,48 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from hashing import password_hasher
 import datetime
+import sqlite3
 
 db = SQLAlchemy()
 
+
+# SQLite: WAL lets readers keep going while a ballot is being written.
+# synchronous=FULL fsyncs the WAL on every commit, so a ballot acknowledged to
+# a voter survives a power cut; NORMAL would save that fsync but could lose the
+# most recent commits (the database itself stays consistent either way).
+# foreign_keys=ON makes the ON DELETE CASCADE rules below take effect.
+# (The busy timeout is set through SQLALCHEMY_ENGINE_OPTIONS in config.py.)
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=FULL')
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+# Stores datetimes as naive UTC (so range filters compare plain column values
+# and stay index-friendly) and hands them back timezone-aware.
+# Naive values written to it are assumed to already be UTC.
+class UTCDateTime(db.TypeDecorator):
+    impl = db.DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.String(50), primary_key=True)  # College ID or unique identifier
     password_hash = db.Column(db.String(256))
@@ -12,10 +50,13 @@ class User(UserMixin, db.Model):
     has_voted = db.Column(db.Boolean, default=False) # Simple flag - needs refinement for multiple elections/positions
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
     # Required by Flask-Login
     def get_id(self):
@@ -25,37 +66,165 @@ class Election(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     position = db.Column(db.String(100), nullable=False)
-    start_time = db.Column(db.DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
-    end_time = db.Column(db.DateTime)
+    start_time = db.Column(UTCDateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    end_time = db.Column(UTCDateTime, index=True)
     is_active = db.Column(db.Boolean, default=True)
+    # Bumped with every counted vote; results pages derive their ETag from it
+    tally_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    tally_updated_at = db.Column(UTCDateTime)
+    # Ballots counted so far, bumped alongside tally_version (turnout without a COUNT)
+    vote_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # 'plurality' (one choice), 'irv' (ranked, one seat) or 'stv' (ranked, `seats` seats); see ranked.py
+    voting_method = db.Column(db.String(20), nullable=False, default='plurality', server_default=db.text("'plurality'"))
+    seats = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Set when the final results are frozen into ElectionSummary and the ballots
+    # leave for the archive database (archive.py)
+    archived_at = db.Column(UTCDateTime)
+
+    # Dashboard lists filter on is_active and order/compare on start_time
+    __table_args__ = (db.Index('ix_election_active_start', 'is_active', 'start_time'),)
+
+    @property
+    def is_ranked(self):
+        return self.voting_method in ('irv', 'stv')
+
+    def has_ended(self, now):
+        return self.end_time is not None and self.end_time <= now
+
+    def accepts_ballots(self, now):
+        # Open (see dashboard.is_open) and not archived: an archived election's
+        # ballots have moved to the archive database and its results are frozen
+        return (self.is_active and self.archived_at is None
+                and (self.start_time is None or self.start_time <= now)
+                and (self.end_time is None or self.end_time >= now))
+
+    def results_visible_to(self, user, now):
+        return results_visible(self.end_time, self.is_active, user, now)
+
+
+def results_visible(end_time, is_active, user, now):
+    """Election.results_visible_to() from the bare columns (API rows, ElectionRow)."""
+    # Results of a running election (and its turnout) are for admins only
+    if not end_time or end_time <= now or not is_active:
+        return True
+    return user.is_authenticated and user.is_admin
 
 class Candidate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
-    election = db.relationship('Election', backref=db.backref('candidates', lazy=True))
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id', ondelete='CASCADE'), nullable=False, index=True)
+    election = db.relationship('Election', backref=db.backref('candidates', lazy=True,
+                                                              cascade='all, delete-orphan', passive_deletes=True))
     # Add fields for photo, manifesto_url, etc.
 
 # VERY Simplified Vote Model - Needs careful design for security/anonymity
 class Vote(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
-    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), nullable=False)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id', ondelete='CASCADE'), nullable=False)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id', ondelete='CASCADE'), nullable=False)
     # WARNING: Storing voter_id directly links vote to user - NOT ANONYMOUS!
     # A better approach involves cryptographic techniques or careful decoupling
     # For this example, we might rely on the User.has_voted flag (simplistic)
-    timestamp = db.Column(db.DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    timestamp = db.Column(UTCDateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+    # Covers per-election counts/deletes and the per-candidate GROUP BY; the candidate_id
+    # index serves the foreign-key check when a candidate is deleted (purge.py), which
+    # would otherwise scan every election's votes
+    __table_args__ = (db.Index('ix_vote_election_candidate', 'election_id', 'candidate_id'),
+                      db.Index('ix_vote_candidate', 'candidate_id'))
+
+# A ranked ballot's preferences, most preferred first, packed as little-endian
+# uint32 candidate ids (ranked.pack_ranking) so the tabulator can load a whole
+# election with one np.frombuffer. The first preference is also recorded as a
+# Vote, so turnout, counters and reconcile-tallies work as for plurality.
+class RankedBallot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id', ondelete='CASCADE'), nullable=False, index=True)
+    ranking = db.Column(db.LargeBinary, nullable=False)
 
 # Track which users have voted in which elections
 class UserVoteStatus(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(50), db.ForeignKey('user.id'), nullable=False)
-    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
-    timestamp = db.Column(db.DateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id', ondelete='CASCADE'), nullable=False)
+    timestamp = db.Column(UTCDateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
 
     # Relationships
     user = db.relationship('User', backref=db.backref('vote_statuses', lazy=True))
-    election = db.relationship('Election', backref=db.backref('vote_statuses', lazy=True))
+    election = db.relationship('Election', backref=db.backref('vote_statuses', lazy=True,
+                                                              cascade='all, delete-orphan', passive_deletes=True))
+
+    # Ensure a user can only vote once per election (also serves lookups by user_id);
+    # the election_id index serves turnout counts and deletes by election
+    __table_args__ = (db.UniqueConstraint('user_id', 'election_id', name='_user_election_uc'),
+                      db.Index('ix_user_vote_status_election', 'election_id'))
+
+# Running vote count per candidate, bumped in the same transaction as each Vote
+# so results can be read without scanning the vote table.
+# Rebuild from the raw votes with `flask reconcile-tallies`.
+class CandidateTally(db.Model):
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id', ondelete='CASCADE'), primary_key=True)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id', ondelete='CASCADE'), nullable=False, index=True)
+    votes = db.Column(db.Integer, nullable=False, default=0)
+
+# Site-wide running totals ('users', 'elections'), maintained on every write
+# so the admin dashboard never counts whole tables (see stats.py).
+# Rebuild with `flask reconcile-stats`.
+class SiteCounter(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+# Names of the one-off data migrations (see migrations.py) already applied to this database
+class SchemaMigration(db.Model):
+    name = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(UTCDateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+# Progress of a background election deletion (see purge.py). Deliberately no
+# foreign key: the row outlives the election it describes.
+class PurgeJob(db.Model):
+    election_id = db.Column(db.Integer, primary_key=True)
+    election_name = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running / done / failed
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    deleted_rows = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(500))
+    started_at = db.Column(UTCDateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    updated_at = db.Column(UTCDateTime)  # last progress
+    finished_at = db.Column(UTCDateTime)
+
+    @property
+    def percent_done(self):
+        return (self.deleted_rows / self.total_rows) * 100 if self.total_rows else 100
+
+    def is_stale(self, now, after):
+        """Still 'running' but without progress for `after` seconds: its worker died."""
+        last = self.updated_at or self.started_at
+        return self.status == 'running' and (now - last).total_seconds() > after
+
+# Progress of a roster upload being imported in the background (see roster.py)
+class ImportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running / done / failed
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text)  # the first row errors, one per line
+    error = db.Column(db.String(500))
+    started_at = db.Column(UTCDateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    updated_at = db.Column(UTCDateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    finished_at = db.Column(UTCDateTime)
+
+    def is_stale(self, now, after):
+        """Still 'running' but without progress for `after` seconds: its worker died."""
+        return self.status == 'running' and (now - self.updated_at).total_seconds() > after
 
-    # Ensure a user can only vote once per election
-    __table_args__ = (db.UniqueConstraint('user_id', 'election_id', name='_user_election_uc'),)
\ No newline at end of file
+# Final results of an archived election, frozen before its ballots moved to the
+# archive database (see archive.py); results pages read this from then on.
+class ElectionSummary(db.Model):
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id', ondelete='CASCADE'), primary_key=True)
+    total_votes = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(db.Text, nullable=False)  # JSON: TallyResult / RankedResult .as_dict()
+    status = db.Column(db.String(20), nullable=False, default='moving')  # moving / done
+    moved_rows = db.Column(db.Integer, nullable=False, default=0)
+    frozen_at = db.Column(UTCDateTime, default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    finished_at = db.Column(UTCDateTime)
@@ -0,0 +1,224 @@
+# public.py
+# Pages anyone can reach: the dashboard, signing in and registering, and results.
+# Forms are imported inside the views that use them, so building the app
+# (e.g. a freshly started worker) doesn't pay for WTForms up front.
+import datetime
+import logging
+from flask import Blueprint, Response, current_app, render_template, redirect, url_for, flash, request, abort, make_response
+from flask_login import login_user, logout_user, current_user
+from models import db, User, Election
+from tally import compute_tally
+from dashboard import get_dashboard_elections, listing_version
+from timeutil import utcnow, display_timezone
+from cache import results_cache
+from identity import identity_cache
+from stats import bump_counter
+from live import live_feed
+from httpcache import make_etag, viewer_key, shareable, is_not_modified, cache_headers, not_modified_response
+
+public = Blueprint('public', __name__)
+logger = logging.getLogger(__name__)
+
+
+# --- Modify base context processor to include 'now' for footer ---
+@public.app_context_processor
+def inject_now():
+    # The footer clock itself runs in the browser (static/js/script.js), so a
+    # page served from a cache or with a 304 never shows a stale time
+    return {'now': datetime.datetime.now(display_timezone()),
+            'display_timezone_name': current_app.config['DISPLAY_TIMEZONE']}
+
+
+# Index route - Dashboard
+@public.route('/')
+def index():
+    now = utcnow()
+    user_id = current_user.id if current_user.is_authenticated else None
+
+    # Anonymous visitors all see the same upcoming/finished lists, so a shared
+    # cache may keep the page until an election is added, opens or closes
+    public = shareable()
+    if public:
+        version = listing_version(now)
+        etag = make_etag('index', *version, viewer_key())
+        max_age = version.max_age(now, current_app.config['ELECTION_LIST_MAX_AGE'])
+        if is_not_modified(etag):
+            return not_modified_response(etag, public=True, max_age=max_age)
+
+    buckets = get_dashboard_elections(user_id, now)
+
+    response = make_response(render_template('index.html',
+                          title='Election Dashboard',
+                          available_elections=buckets.available,
+                          voted_elections=buckets.voted,
+                          upcoming_elections=buckets.upcoming,
+                          finished_elections=buckets.finished))
+    if public:
+        return cache_headers(response, etag, public=True, max_age=max_age)
+    return response
+
+
+# Login route
+@public.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('public.index'))
+
+    from forms import LoginForm
+    form = LoginForm()
+    if form.validate_on_submit():
+        user = User.query.get(form.user_id.data)
+        if user is None or not user.check_password(form.password.data):
+            flash('Invalid username or password', 'danger')
+            return redirect(url_for('public.login'))
+
+        # Transparently upgrade hashes made with older hashing parameters
+        if user.password_needs_rehash():
+            user.set_password(form.password.data)
+            db.session.commit()
+
+        login_user(user, remember=form.remember_me.data)
+        next_page = request.args.get('next')
+        if not next_page or not next_page.startswith('/'):
+            next_page = url_for('public.index')
+        return redirect(next_page)
+
+    return render_template('login.html', title='Sign In', form=form)
+
+
+# Logout route
+@public.route('/logout')
+def logout():
+    logout_user()
+    return redirect(url_for('public.index'))
+
+
+# Results route
+@public.route('/results/<int:election_id>')
+def results(election_id):
+    election = Election.query.get_or_404(election_id)
+
+    # Only show results if election is over or user is admin
+    now = utcnow()
+    ended = election.has_ended(now)
+    if not election.results_visible_to(current_user, now):
+        flash('Results are not available until the election has ended.', 'info')
+        return redirect(url_for('public.index'))
+
+    # The election row already carries the tally version, so a revalidating
+    # client gets its 304 without any tally query or template render
+    etag = make_etag('results', election.id, election.tally_version, ended, viewer_key())
+    last_modified = election.tally_updated_at or election.start_time
+    if ended:
+        # The page stopped being live when the election closed, even with no ballot since
+        last_modified = max(last_modified, election.end_time)
+    # Only anonymous views of ended elections are identical for everyone
+    public = ended and shareable()
+    max_age = current_app.config['RESULTS_PUBLIC_MAX_AGE'] if public else 0
+    if is_not_modified(etag, last_modified, public):
+        return not_modified_response(etag, last_modified, public, max_age)
+
+    if election.archived_at is not None:
+        # Frozen when the ballots moved to the archive database
+        from archive import load_frozen_result
+        result = results_cache.get_or_compute(election_id, election.tally_version, load_frozen_result, ended=True)
+        ranked = result if election.is_ranked else None
+        tally = ranked.first_preferences if ranked else result
+    elif election.is_ranked:
+        # Elimination rounds plus the first-preference counts, cached together
+        from ranked import compute_ranked_result
+        ranked = results_cache.get_or_compute(election_id, election.tally_version, compute_ranked_result, ended=ended)
+        tally = ranked.first_preferences
+    else:
+        # Counts and percentages from the per-candidate counters, via the results cache
+        ranked = None
+        tally = results_cache.get_or_compute(election_id, election.tally_version, compute_tally, ended=ended)
+
+    response = make_response(render_template('results.html',
+                          title=f'Results: {election.name}',
+                          election=election,
+                          tally=tally,
+                          ranked=ranked,
+                          live=not ended))
+    return cache_headers(response, etag, last_modified, public, max_age)
+
+
+# Live turnout (and, for admins, tally changes) as Server-Sent Events
+@public.route('/results/<int:election_id>/stream')
+def results_stream(election_id):
+    election = Election.query.get_or_404(election_id)
+
+    # Same visibility rule as results(); only admins see a running tally
+    now = utcnow()
+    if not election.results_visible_to(current_user, now):
+        abort(403)
+    ended = election.has_ended(now)
+    is_admin = current_user.is_authenticated and current_user.is_admin
+
+    # One publisher thread aggregates per tick; this response just relays its updates
+    response = Response(live_feed.stream(election_id, include_tally=is_admin or ended),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    return response
+
+
+# --- Add Registration Route (Use with Caution!) ---
+@public.route('/register', methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('public.index')) # Don't allow registration if logged in
+
+    # IMPORTANT: Add configuration check if self-registration is enabled
+    # if not current_app.config.get('ALLOW_SELF_REGISTRATION'):
+    #     flash('Self-registration is currently disabled.', 'warning')
+    #     return redirect(url_for('public.login'))
+
+    from forms import RegisterForm
+    form = RegisterForm()
+    if form.validate_on_submit():
+        try:
+            user = User(id=form.user_id.data)
+            user.set_password(form.password.data)
+            # Default new users to non-admin
+            user.is_admin = False
+            db.session.add(user)
+            bump_counter('users')
+            db.session.commit()
+            identity_cache.invalidate(user.id)
+            flash('Registration successful! Please login.', 'success')
+            # Optional: Automatically log in the user
+            # login_user(user)
+            # return redirect(url_for('public.index'))
+            return redirect(url_for('public.login'))
+        except Exception as e:
+            db.session.rollback()
+            logger.exception('Registration failed')
+            flash(f'An error occurred during registration: {e}', 'danger')
+    elif form.is_submitted():
+        # Field errors only: form.data would include the password
+        logger.debug('Registration form rejected: %s', form.errors)
+
+    return render_template('register.html', title='Register', form=form)
+
+
+# Initialize database route (for development only)
+@public.route('/init-db')
+def init_db():
+    # WARNING: This should be disabled in production!
+    from migrations import create_database
+    create_database()
+
+    # Check if admin user exists, if not create one
+    admin = User.query.filter_by(id='admin').first()
+    if not admin:
+        admin = User(id='admin', is_admin=True)
+        admin.set_password('admin123') # Change this in production!
+        db.session.add(admin)
+        bump_counter('users')
+        db.session.commit()
+        flash('Database initialized with admin user.', 'success')
+    else:
+        flash('Database already initialized.', 'info')
+
+    return redirect(url_for('public.index'))
@@ -0,0 +1,105 @@
+# purge.py
+# Deleting an election with a million votes in one statement holds SQLite's
+# write lock (and blocks every other election's voters) until it finishes.
+# The purge instead deletes the election's rows in small chunks, each its own
+# short transaction, and records progress in PurgeJob so any worker can
+# report it. The election is deactivated first so it takes no new ballots.
+# A purge whose worker died (restart, crash) stays 'running' without progress;
+# after JOB_STALE_AFTER seconds the election list offers to resume it, and
+# `flask purge-election` or deleting the election again picks up where it stopped.
+import time
+import logging
+import threading
+from flask import current_app
+from sqlalchemy import func, select
+from models import db, Election, Candidate, Vote, UserVoteStatus, CandidateTally, RankedBallot, ElectionSummary, PurgeJob
+from timeutil import utcnow
+from eligibility import eligibility_cache
+from stats import bump_counter
+from dashboard import bump_listing_version
+
+logger = logging.getLogger(__name__)
+
+# Child tables in delete order, each with its election column and primary key
+_PURGE_ORDER = [
+    (Vote, Vote.election_id, Vote.id),
+    (RankedBallot, RankedBallot.election_id, RankedBallot.id),
+    (UserVoteStatus, UserVoteStatus.election_id, UserVoteStatus.id),
+    (CandidateTally, CandidateTally.election_id, CandidateTally.candidate_id),
+    (Candidate, Candidate.election_id, Candidate.id),
+    (ElectionSummary, ElectionSummary.election_id, ElectionSummary.election_id),
+]
+
+
+def start_purge(election):
+    """Deactivate the election, record a PurgeJob and return it (caller commits)."""
+    total = sum(
+        db.session.query(func.count()).select_from(model).filter(column == election.id).scalar()
+        for model, column, _ in _PURGE_ORDER
+    ) + 1  # the election row itself
+    election.is_active = False
+    bump_listing_version()
+    job = db.session.get(PurgeJob, election.id)
+    if job is None:
+        job = PurgeJob(election_id=election.id, election_name=election.name)
+        db.session.add(job)
+    job.status, job.total_rows, job.deleted_rows, job.error = 'running', total, 0, None
+    job.started_at = job.updated_at = utcnow()
+    return job
+
+
+def purge_election(election_id, chunk_size=2000, pause=0.01):
+    """Delete everything belonging to an election, chunk by chunk. Resumable.
+
+    Each chunk is one short transaction, followed by a `pause` so waiting
+    voters can take the write lock in between. An archived election's rows
+    are deleted from the archive database too.
+    """
+    if db.session.query(Election.archived_at).filter(Election.id == election_id).scalar() is not None:
+        from archive import delete_archived
+        delete_archived(election_id, chunk_size=chunk_size)
+    for model, column, key in _PURGE_ORDER:
+        table = model.__table__
+        while True:
+            chunk = select(key).where(column == election_id).limit(chunk_size).scalar_subquery()
+            deleted = db.session.execute(table.delete().where(key.in_(chunk))).rowcount
+            # Progress doubles as the heartbeat that tells a live purge from a dead one
+            PurgeJob.query.filter_by(election_id=election_id).update(
+                {'deleted_rows': PurgeJob.deleted_rows + deleted, 'updated_at': utcnow()})
+            db.session.commit()
+            if deleted < chunk_size:
+                break
+            time.sleep(pause)
+
+    if Election.query.filter_by(id=election_id).delete():
+        bump_counter('elections', -1)
+        bump_listing_version()
+    PurgeJob.query.filter_by(election_id=election_id).update(
+        {'deleted_rows': PurgeJob.total_rows, 'status': 'done', 'finished_at': utcnow()})
+    db.session.commit()
+
+    eligibility_cache.clear()
+
+
+def _run_purge(app, election_id):
+    with app.app_context():
+        try:
+            purge_election(election_id,
+                           chunk_size=app.config.get('PURGE_CHUNK_SIZE', 2000),
+                           pause=app.config.get('PURGE_CHUNK_PAUSE', 0.01))
+        except Exception as e:
+            logger.exception('Purging election %s failed', election_id)
+            db.session.rollback()
+            PurgeJob.query.filter_by(election_id=election_id).update(
+                {'status': 'failed', 'error': str(e)[:500], 'finished_at': utcnow()})
+            db.session.commit()
+        finally:
+            db.session.remove()
+
+
+def purge_in_background(election_id):
+    """Run purge_election on a daemon thread with its own app context."""
+    thread = threading.Thread(target=_run_purge, name=f'purge-election-{election_id}',
+                              args=(current_app._get_current_object(), election_id), daemon=True)
+    thread.start()
+    return thread
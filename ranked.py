@@ -0,0 +1,261 @@
+# ranked.py
+# Ranked-choice elections: instant runoff (IRV, one seat) and single
+# transferable vote (STV, several seats).
+#
+# Ballots are stored as packed candidate ids (RankedBallot.ranking). The
+# tabulator loads an election into one ballots x ranks int32 matrix of
+# candidate indexes and keeps a per-ballot pointer to its current
+# preference, so each round is a bincount over the ballots' current choices
+# and an elimination only advances the ballots that sat on the eliminated
+# candidate. Nothing loops over ballots in Python.
+#
+# IRV elects a candidate with more than half of the continuing ballots. STV
+# uses the Droop quota and transfers a winner's surplus by reweighting all
+# of their ballots (Gregory method). Ties for last place are broken by the
+# earlier rounds' totals, then by eliminating the later-added candidate.
+#
+# Needs numpy, imported on first use so the rest of the app starts without it.
+import struct
+from typing import NamedTuple
+from sqlalchemy import select
+from models import db, Election, Candidate, RankedBallot
+from tally import TallyResult, compute_tally
+
+METHODS = ('irv', 'stv')
+
+
+def pack_ranking(candidate_ids):
+    """Candidate ids, most preferred first, as RankedBallot.ranking bytes."""
+    return struct.pack(f'<{len(candidate_ids)}I', *candidate_ids)
+
+
+def unpack_ranking(data):
+    return list(struct.unpack(f'<{len(data) // 4}I', data))
+
+
+class Round(NamedTuple):
+    number: int
+    votes: dict        # continuing candidate_id -> votes (fractional in STV after surplus transfers)
+    exhausted: float   # ballots (or ballot weight) with no continuing preference left
+    elected: tuple     # candidate ids elected this round
+    eliminated: tuple  # candidate ids eliminated this round
+
+
+class RankedResult(NamedTuple):
+    election_id: int
+    method: str
+    seats: int
+    total_ballots: int
+    quota: float                 # votes needed to be elected (IRV: majority of the final round)
+    candidates: tuple            # (candidate_id, name), in candidate id order
+    rounds: tuple                # tuple of Round
+    winners: tuple               # candidate ids in order of election
+    first_preferences: object    # tally.TallyResult of first choices (the live counters)
+
+    def as_dict(self):
+        return {
+            'election_id': self.election_id,
+            'method': self.method,
+            'seats': self.seats,
+            'total_ballots': self.total_ballots,
+            'quota': self.quota,
+            'candidates': [{'candidate_id': id, 'name': name} for id, name in self.candidates],
+            'rounds': [dict(r._asdict(), votes={str(id): votes for id, votes in r.votes.items()})
+                       for r in self.rounds],
+            'winners': list(self.winners),
+            'first_preferences': self.first_preferences.as_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Inverse of as_dict(), for results frozen by archive.py
+        return cls(election_id=data['election_id'],
+                   method=data['method'],
+                   seats=data['seats'],
+                   total_ballots=data['total_ballots'],
+                   quota=data['quota'],
+                   candidates=tuple((row['candidate_id'], row['name']) for row in data['candidates']),
+                   rounds=tuple(Round(number=r['number'],
+                                      votes={int(id): votes for id, votes in r['votes'].items()},
+                                      exhausted=r['exhausted'],
+                                      elected=tuple(r['elected']),
+                                      eliminated=tuple(r['eliminated']))
+                                for r in data['rounds']),
+                   winners=tuple(data['winners']),
+                   first_preferences=TallyResult.from_dict(data['first_preferences']))
+
+
+def load_rankings(election_id, candidate_ids):
+    """All of an election's ballots as an int32 matrix (ballots x longest ranking).
+
+    Entries are indexes into `candidate_ids` (sorted ascending), -1 pads the
+    end of shorter rankings, and len(candidate_ids) marks a candidate that no
+    longer exists (skipped like an eliminated one).
+    """
+    import numpy as np
+    blobs = _fetch_column(select(RankedBallot.ranking).where(RankedBallot.election_id == election_id))
+    lengths = np.fromiter(map(len, blobs), dtype=np.intp, count=len(blobs)) // 4
+    depth = int(lengths.max()) if len(blobs) else 0
+    matrix = np.full((len(blobs), depth), -1, dtype=np.int32)
+    if not depth:
+        return matrix
+    flat = np.frombuffer(b''.join(blobs), dtype='<u4')
+    # Scatter the concatenated preferences back into their (ballot, rank) cells
+    rows = np.repeat(np.arange(len(blobs)), lengths)
+    cols = np.arange(flat.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    ids = np.asarray(candidate_ids, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(ids, flat), max(len(ids) - 1, 0))
+    known = ids[pos] == flat if len(ids) else np.zeros(flat.size, dtype=bool)
+    matrix[rows, cols] = np.where(known, pos, len(ids))
+    return matrix
+
+
+def _fetch_column(statement):
+    """Values of a one-column SELECT, read straight off the DB-API cursor.
+
+    Skips building a SQLAlchemy Row per ballot, which is most of the load
+    time for a million ballots.
+    """
+    connection = db.session.connection()
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(compiled.string, params)
+        return [value for (value,) in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def tabulate(rankings, num_candidates, seats=1):
+    """Run the elimination rounds over a load_rankings() matrix.
+
+    Returns (rounds, winners, quota) with candidates as indexes; each round
+    is (votes array, exhausted, elected, eliminated, continuing candidates).
+    seats == 1 is IRV, more is STV.
+    """
+    import numpy as np
+    n = rankings.shape[0]
+    # A trailing -1 column, so a pointer can always step past a ballot's last preference
+    prefs = np.concatenate([rankings, np.full((n, 1), -1, dtype=np.int32)], axis=1)
+    ptr = np.zeros(n, dtype=np.intp)
+    weight = np.ones(n)
+    # Slot num_candidates stands for withdrawn candidates and is never hopeful
+    hopeful = np.zeros(num_candidates + 1, dtype=bool)
+    hopeful[:num_candidates] = True
+    votes = np.zeros(num_candidates)
+    piles = [[] for _ in range(num_candidates)]  # per candidate: arrays of the ballots sitting on them
+    exhausted = 0.0
+
+    def transfer(idx):
+        # Move these ballots on to their next hopeful preference (or exhaust them),
+        # then add them to their new candidates' piles and totals
+        nonlocal exhausted
+        moving = idx
+        while moving.size:
+            current = prefs[moving, ptr[moving]]
+            stuck = (current >= 0) & ~hopeful[current]
+            moving = moving[stuck]
+            ptr[moving] += 1
+        top = prefs[idx, ptr[idx]]
+        live = top >= 0
+        exhausted += float(weight[idx[~live]].sum())
+        idx, top = idx[live], top[live]
+        votes[:] += np.bincount(top, weights=weight[idx], minlength=num_candidates)
+        order = np.argsort(top, kind='stable')
+        bounds = np.searchsorted(top[order], np.arange(num_candidates + 1))
+        for candidate in np.flatnonzero(np.diff(bounds)):
+            piles[candidate].append(idx[order[bounds[candidate]:bounds[candidate + 1]]])
+
+    def take(candidate):
+        pile = np.concatenate(piles[candidate]) if piles[candidate] else np.zeros(0, dtype=np.intp)
+        piles[candidate] = []
+        votes[candidate] = 0
+        return pile
+
+    transfer(np.arange(n))
+    valid = n - int(exhausted)
+    if not valid:
+        return [], [], 0
+    quota = valid // (seats + 1) + 1 if seats > 1 else None
+
+    rounds, winners, history = [], [], []
+    while len(winners) < seats and hopeful.any():
+        snapshot, exhausted_before = votes.copy(), exhausted
+        history.append(snapshot)
+        candidates = np.flatnonzero(hopeful[:num_candidates])
+        needed = quota if quota is not None else snapshot.sum() / 2
+
+        if candidates.size <= seats - len(winners):
+            # No more candidates than seats left: they are all elected
+            elected = candidates[np.argsort(-snapshot[candidates], kind='stable')]
+        elif quota is not None:
+            elected = candidates[snapshot[candidates] >= quota]
+            elected = elected[np.argsort(-snapshot[elected], kind='stable')][:seats - len(winners)]
+        else:
+            elected = candidates[snapshot[candidates] > needed]
+        if elected.size:
+            hopeful[elected] = False
+            winners.extend(elected.tolist())
+            if quota is not None and len(winners) < seats:
+                # Gregory transfer: every ballot of a winner carries on at surplus / votes of its value
+                for candidate in elected:
+                    pile = take(candidate)
+                    weight[pile] *= (snapshot[candidate] - quota) / snapshot[candidate]
+                    transfer(pile)
+            rounds.append((snapshot, exhausted_before, elected.tolist(), [], candidates.tolist()))
+            continue
+
+        lowest = _lowest(candidates, history)
+        hopeful[lowest] = False
+        transfer(take(lowest))
+        rounds.append((snapshot, exhausted_before, [], [lowest], candidates.tolist()))
+    return rounds, winners, quota if quota is not None else needed
+
+
+def _lowest(candidates, history):
+    """The candidate to eliminate: fewest votes now, then fewest in the latest earlier
+    round that separates them, then the highest index (the last one added)."""
+    import numpy as np
+    tied = candidates
+    for votes in reversed(history):
+        tied = tied[np.isclose(votes[tied], votes[tied].min())]
+        if tied.size == 1:
+            break
+    return int(tied.max())
+
+
+def compute_ranked_result(election_id):
+    """Tabulate a ranked election (method and seats from the Election row)."""
+    election = db.session.get(Election, election_id)
+    candidates = db.session.query(Candidate.id, Candidate.name).filter(
+        Candidate.election_id == election_id).order_by(Candidate.id).all()
+    candidate_ids = [id for id, _ in candidates]
+    seats = election.seats if election.voting_method == 'stv' else 1
+
+    rankings = load_rankings(election_id, candidate_ids)
+    raw_rounds, winners, quota = tabulate(rankings, len(candidate_ids), seats)
+
+    def amount(value):
+        # Whole ballots in IRV; STV transfers leave fractions
+        return int(round(value)) if seats == 1 else round(float(value), 4)
+
+    rounds = tuple(
+        Round(number=i + 1,
+              votes={candidate_ids[c]: amount(votes[c]) for c in continuing},
+              exhausted=amount(exhausted),
+              elected=tuple(candidate_ids[c] for c in elected),
+              eliminated=tuple(candidate_ids[c] for c in eliminated))
+        for i, (votes, exhausted, elected, eliminated, continuing) in enumerate(raw_rounds)
+    )
+    return RankedResult(election_id=election_id,
+                        method=election.voting_method,
+                        seats=seats,
+                        total_ballots=int(rankings.shape[0]),
+                        quota=amount(quota),
+                        candidates=tuple((id, name) for id, name in candidates),
+                        rounds=rounds,
+                        winners=tuple(candidate_ids[c] for c in winners),
+                        first_preferences=compute_tally(election_id))
@@ -0,0 +1,284 @@
+# roster.py
+# Voter roster: keyset-paginated listing for manage_voters and bulk import
+# from a CSV roster.
+#
+# Listing pages by User.id (the primary key), so a page costs the same
+# however large the roster is, and vote counts are computed for the visible
+# page only.
+#
+# The file is streamed and handled in chunks: each chunk is checked against
+# existing User ids with ONE query, its passwords are hashed in a process
+# pool, and it is inserted with a single executemany and one commit.
+# Bad rows are reported and skipped; they never abort the rest of the file.
+#
+# An upload from Manage Voters is saved to instance/imports and imported on
+# a background thread, with progress in ImportJob: hashing a real roster
+# takes far longer than a request may. That thread hashes on a thread pool
+# (hashlib's scrypt and PBKDF2 release the GIL) because forking a process
+# pool from a multithreaded server worker isn't safe.
+#
+# CSV columns: user_id,password[,is_admin]   (a header row is optional)
+import os
+import csv
+import sys
+import logging
+import itertools
+import threading
+from typing import NamedTuple
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+from models import db, User, UserVoteStatus, ImportJob
+from hashing import password_hasher
+from stats import bump_counter
+from identity import identity_cache
+from timeutil import utcnow
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+TRUE_VALUES = {'1', 'y', 'yes', 'true', 'admin'}
+# Row errors kept on an ImportJob for the Manage Voters page
+JOB_ERROR_LIMIT = 50
+
+
+class VoterPage(NamedTuple):
+    voters: list            # User objects, ordered by id
+    vote_counts: dict       # user id -> number of elections voted in
+    prev_before: str        # pass as ?before= for the previous page, or None
+    next_after: str         # pass as ?after= for the next page, or None
+
+
+def _prefix_end(prefix):
+    """The smallest string after every string that starts with `prefix` (None: no such string)."""
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    following = ord(prefix[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000  # Surrogates can't be encoded
+    return prefix[:-1] + chr(following)
+
+
+def voter_page(page_size, after=None, before=None, prefix=None):
+    """One page of voters in id order, starting after `after` (or ending before `before`).
+
+    A single query: the page of ids is picked by a LIMITed subquery on the
+    primary key and only those users are joined to UserVoteStatus for counts.
+    The `prefix` search is a range on the primary key (case-sensitive): SQLite
+    can't serve LIKE .. ESCAPE from the index and would scan the whole roster.
+    """
+    ids = select(User.id)
+    if prefix:
+        ids = ids.where(User.id >= prefix)
+        end = _prefix_end(prefix)
+        if end is not None:
+            ids = ids.where(User.id < end)
+    if before is not None:
+        ids = ids.where(User.id < before).order_by(User.id.desc())
+    else:
+        if after is not None:
+            ids = ids.where(User.id > after)
+        ids = ids.order_by(User.id)
+    # One extra row tells us whether there is another page in this direction
+    page_ids = ids.limit(page_size + 1).subquery()
+
+    rows = db.session.query(
+        User, func.count(UserVoteStatus.id)
+    ).join(
+        page_ids, page_ids.c.id == User.id
+    ).outerjoin(
+        UserVoteStatus, UserVoteStatus.user_id == User.id
+    ).group_by(User.id).order_by(User.id).all()
+
+    more = len(rows) > page_size
+    if before is not None:
+        rows = rows[-page_size:] if more else rows
+        has_prev, has_next = more, True
+    else:
+        rows = rows[:page_size]
+        has_prev, has_next = after is not None, more
+    voters = [user for user, _ in rows]
+    return VoterPage(
+        voters=voters,
+        vote_counts={user.id: count for user, count in rows},
+        prev_before=voters[0].id if voters and has_prev else None,
+        next_after=voters[-1].id if voters and has_next else None,
+    )
+
+
+class RosterError(NamedTuple):
+    line: int
+    user_id: str
+    message: str
+
+
+class ImportReport(NamedTuple):
+    imported: int
+    errors: list  # list of RosterError
+
+    @property
+    def skipped(self):
+        return len(self.errors)
+
+
+def _hash_password(password, method, salt_length):
+    # Module-level so the process pool can pickle it; the worker processes
+    # have no app config, so the hashing parameters are passed in
+    return generate_password_hash(password, method, salt_length)
+
+
+def _parse_rows(lines):
+    """Yield (line_no, user_id, password, is_admin) or (line_no, user_id, None, error)."""
+    reader = csv.reader(lines)
+    for line_no, row in enumerate(reader, start=1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        cells = [cell.strip() for cell in row]
+        if line_no == 1 and cells[0].lower() in ('user_id', 'college id', 'id'):
+            continue  # Header row
+        user_id = cells[0]
+        if len(cells) < 2:
+            yield line_no, user_id, None, 'Missing password column.'
+        elif not 4 <= len(user_id) <= 50:
+            yield line_no, user_id, None, 'College ID must be 4-50 characters.'
+        elif len(cells[1]) < 8:
+            yield line_no, user_id, None, 'Password must be at least 8 characters.'
+        else:
+            is_admin = len(cells) > 2 and cells[2].lower() in TRUE_VALUES
+            yield line_no, user_id, cells[1], is_admin
+
+
+def _insert_chunk(rows, errors):
+    """Insert [(line_no, values)] in one executemany; fall back row by row on a conflict."""
+    try:
+        db.session.execute(User.__table__.insert(), [values for _, values in rows])
+        bump_counter('users', len(rows))
+        db.session.commit()
+        return len(rows)
+    except IntegrityError:
+        # Someone added one of these ids since the existence check
+        db.session.rollback()
+    inserted = 0
+    for line_no, values in rows:
+        try:
+            db.session.execute(User.__table__.insert(), values)
+            bump_counter('users')
+            db.session.commit()
+            inserted += 1
+        except IntegrityError:
+            db.session.rollback()
+            errors.append(RosterError(line_no, values['id'], 'This College ID already exists.'))
+    return inserted
+
+
+def import_roster(lines, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, threads=False, progress=None):
+    """Import voters from an iterable of CSV lines (an open text file works).
+
+    Returns an ImportReport; rows that fail validation or already exist are
+    listed in report.errors and skipped. threads=True hashes on a thread pool
+    instead of a process pool; `progress(imported, errors)` is called after
+    each chunk.
+    """
+    imported = 0
+    errors = []
+    seen = set()  # ids already taken earlier in this file
+    parsed = _parse_rows(lines)
+    # Deferred: the process pool pulls in multiprocessing
+    if threads:
+        from concurrent.futures import ThreadPoolExecutor as Executor
+    else:
+        from concurrent.futures import ProcessPoolExecutor as Executor
+    with Executor(max_workers=workers) as pool:
+        while True:
+            chunk = list(itertools.islice(parsed, chunk_size))
+            if not chunk:
+                break
+
+            candidates = []
+            for line_no, user_id, password, extra in chunk:
+                if password is None:
+                    errors.append(RosterError(line_no, user_id, extra))
+                elif user_id in seen:
+                    errors.append(RosterError(line_no, user_id, 'Duplicate College ID in this file.'))
+                else:
+                    seen.add(user_id)
+                    candidates.append((line_no, user_id, password, extra))
+
+            # One set-based existence check per chunk
+            existing = {id for (id,) in db.session.query(User.id).filter(
+                User.id.in_([user_id for _, user_id, _, _ in candidates])).all()} if candidates else set()
+            new_rows = []
+            for line_no, user_id, password, is_admin in candidates:
+                if user_id in existing:
+                    errors.append(RosterError(line_no, user_id, 'This College ID already exists.'))
+                else:
+                    new_rows.append((line_no, user_id, password, is_admin))
+
+            hashes = pool.map(_hash_password, [password for _, _, password, _ in new_rows],
+                              itertools.repeat(password_hasher.method),
+                              itertools.repeat(password_hasher.salt_length),
+                              chunksize=max(1, len(new_rows) // 32))
+            rows = [(line_no, {'id': user_id, 'password_hash': password_hash,
+                               'is_admin': is_admin, 'has_voted': False})
+                    for (line_no, user_id, _, is_admin), password_hash in zip(new_rows, hashes)]
+            if rows:
+                imported += _insert_chunk(rows, errors)
+            if progress is not None:
+                progress(imported, errors)
+    return ImportReport(imported=imported, errors=errors)
+
+
+def _record_progress(job_id, imported, errors, **values):
+    ImportJob.query.filter_by(id=job_id).update(dict(
+        imported=imported, skipped=len(errors), updated_at=utcnow(),
+        errors='\n'.join(f'Line {e.line} ({e.user_id}): {e.message}' for e in errors[:JOB_ERROR_LIMIT]),
+        **values))
+    db.session.commit()
+
+
+def start_import(upload):
+    """Save an uploaded roster (a werkzeug FileStorage) to instance/imports and
+    record an ImportJob for it. Returns (job, path); run import_in_background next."""
+    job = ImportJob(filename=os.path.basename(upload.filename or 'roster.csv')[:255])
+    db.session.add(job)
+    db.session.commit()
+    directory = os.path.join(current_app.instance_path, 'imports')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'import-{job.id}.csv')
+    upload.save(path)  # Copied in blocks, never held in memory
+    return job, path
+
+
+def _run_import(app, job_id, path):
+    with app.app_context():
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as lines:
+                report = import_roster(lines, workers=app.config['PASSWORD_HASH_WORKERS'], threads=True,
+                                       progress=lambda imported, errors: _record_progress(job_id, imported, errors))
+            _record_progress(job_id, report.imported, report.errors, status='done', finished_at=utcnow())
+        except Exception as e:
+            logger.exception('Importing roster (job %s) failed', job_id)
+            db.session.rollback()
+            ImportJob.query.filter_by(id=job_id).update(
+                {'status': 'failed', 'error': str(e)[:500], 'finished_at': utcnow()})
+            db.session.commit()
+        finally:
+            db.session.remove()
+            os.remove(path)
+        # Drop any cached "no such user" entries for the new ids
+        identity_cache.clear()
+
+
+def import_in_background(job_id, path):
+    """Run the import of a saved roster on a daemon thread with its own app context."""
+    thread = threading.Thread(target=_run_import, name=f'import-roster-{job_id}',
+                              args=(current_app._get_current_object(), job_id, path), daemon=True)
+    thread.start()
+    return thread
+
+
+def recent_imports(limit=3):
+    """The latest ImportJobs, newest first, for the Manage Voters page."""
+    return ImportJob.query.order_by(ImportJob.id.desc()).limit(limit).all()
@@ -24,4 +24,25 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         }, 100);
     }
+
+    // Footer clock in the display timezone. It runs here rather than being
+    // rendered by the server, so a cached page still shows the current time
+    const clock = document.getElementById('footer-clock');
+    if (clock) {
+        const format = new Intl.DateTimeFormat('en-US', {
+            timeZone: clock.getAttribute('data-timezone'), hourCycle: 'h23', timeZoneName: 'short',
+            year: 'numeric', month: '2-digit', day: '2-digit', hour: '2-digit', minute: '2-digit', second: '2-digit'
+        });
+        const year = document.getElementById('footer-year');
+        const zone = document.getElementById('footer-timezone');
+        const tick = () => {
+            const parts = {};
+            format.formatToParts(new Date()).forEach(part => { parts[part.type] = part.value; });
+            clock.textContent = `${parts.year}-${parts.month}-${parts.day} ${parts.hour}:${parts.minute}:${parts.second}`;
+            year.textContent = parts.year;
+            zone.textContent = parts.timeZoneName;
+        };
+        tick();
+        setInterval(tick, 1000);
+    }
 });
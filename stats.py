@@ -0,0 +1,127 @@
+# stats.py
+# Admin dashboard statistics kept as running counters instead of COUNT(*)s.
+#
+# - 'users' and 'elections' live in SiteCounter and are bumped in the same
+#   transaction as the insert/delete that changes them.
+# - Each election's ballot count is Election.vote_count, bumped together with
+#   tally_version (tally.bump_tally_version), so counting a vote costs no extra
+#   write. The site-wide vote total is the sum over elections: O(elections),
+#   no matter how many votes there are, and no single row every ballot fights over.
+#
+# `flask reconcile-stats` (run it from cron) recounts everything from the
+# underlying tables and fixes any drift.
+from typing import NamedTuple
+from sqlalchemy import func, select
+from models import db, User, Election, Vote, SiteCounter
+from tally import bump_tally_version
+from timeutil import utcnow
+
+
+class ElectionTurnout(NamedTuple):
+    election: Election
+    votes: int
+    turnout: float  # percent of registered users who have voted
+
+
+class SiteStats(NamedTuple):
+    users: int
+    elections: int
+    votes: int
+    active: list  # ElectionTurnout for each election open right now
+
+
+def bump_counter(name, delta=1):
+    """Add `delta` to a site counter inside the caller's transaction.
+
+    One INSERT .. ON CONFLICT DO UPDATE on SQLite and PostgreSQL (see
+    tally.add_to_counter), so two writers can't race to create a missing row.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.session.execute(
+            insert(SiteCounter.__table__)
+            .values(name=name, value=delta)
+            .on_conflict_do_update(index_elements=[SiteCounter.name],
+                                   set_={'value': SiteCounter.value + delta})
+        )
+        return
+    updated = db.session.execute(
+        SiteCounter.__table__.update()
+        .where(SiteCounter.name == name)
+        .values(value=SiteCounter.value + delta)
+    ).rowcount
+    if not updated:
+        db.session.execute(SiteCounter.__table__.insert(), {'name': name, 'value': delta})
+
+
+def read_counters():
+    """Return {name: value} for every site counter (missing counters read as 0)."""
+    counters = {'users': 0, 'elections': 0}
+    counters.update(db.session.query(SiteCounter.name, SiteCounter.value).all())
+    return counters
+
+
+def turnout(votes, users):
+    return (votes / users) * 100 if users > 0 else 0
+
+
+def site_stats(now=None):
+    """Everything the admin dashboard shows, in three small queries."""
+    now = now or utcnow()
+    counters = read_counters()
+    total_votes = db.session.query(func.coalesce(func.sum(Election.vote_count), 0)).scalar()
+    active = Election.query.filter(
+        Election.is_active == True,
+        Election.start_time <= now,
+        Election.end_time >= now
+    ).order_by(Election.end_time).all()
+    return SiteStats(
+        users=counters['users'],
+        elections=counters['elections'],
+        votes=total_votes,
+        active=[ElectionTurnout(election, election.vote_count, turnout(election.vote_count, counters['users']))
+                for election in active],
+    )
+
+
+def reconcile_stats():
+    """Recount users, elections and per-election votes from the tables.
+
+    Returns a list of (counter, stored, actual) for everything that had
+    drifted; per-election counters are named 'election <id> votes'. Caller commits.
+    Corrections are applied as deltas (value + actual - stored), so a ballot
+    committed between the count and the fix isn't overwritten.
+    """
+    drift = []
+    def stored(name):
+        return func.coalesce(select(SiteCounter.value).where(SiteCounter.name == name).scalar_subquery(), 0)
+
+    def count(column):
+        return select(func.count(column)).scalar_subquery()
+
+    # Each counter and its count come from ONE statement, so they describe the same moment
+    users, counted_users, elections, counted_elections = db.session.query(
+        stored('users'), count(User.id), stored('elections'), count(Election.id)).one()
+    for name, value, actual in (('users', users, counted_users), ('elections', elections, counted_elections)):
+        if value != actual:
+            drift.append((name, value, actual))
+            bump_counter(name, actual - value)
+
+    # Likewise each election's vote_count and its votes
+    counted = select(Vote.election_id, func.count(Vote.id).label('votes')).group_by(Vote.election_id).subquery()
+    rows = db.session.query(Election.id, Election.vote_count, func.coalesce(counted.c.votes, 0)).outerjoin(
+        counted, counted.c.election_id == Election.id
+    ).filter(
+        # An archived election's votes are in the archive database; its count is final
+        Election.archived_at.is_(None)
+    ).all()
+    for election_id, vote_count, votes in rows:
+        if vote_count != votes:
+            drift.append((f'election {election_id} votes', vote_count, votes))
+            # Also retires the election's cached results and live-feed state
+            bump_tally_version(election_id, votes=votes - vote_count)
+    return drift
@@ -0,0 +1,198 @@
+# tally.py
+from sqlalchemy import func, select
+from models import db, Election, Candidate, Vote, CandidateTally
+from timeutil import utcnow
+from typing import NamedTuple
+
+
+class CandidateResult(NamedTuple):
+    candidate_id: int
+    name: str
+    votes: int
+    percentage: float
+
+
+class TallyResult(NamedTuple):
+    election_id: int
+    total_votes: int
+    candidates: tuple  # tuple of CandidateResult, highest vote count first
+
+    @property
+    def leader(self):
+        return self.candidates[0] if self.candidates and self.total_votes else None
+
+    def as_dict(self):
+        # Plain dict form for JSON/export consumers
+        return {
+            'election_id': self.election_id,
+            'total_votes': self.total_votes,
+            'candidates': [row._asdict() for row in self.candidates],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Inverse of as_dict(), for results frozen by archive.py
+        return cls(election_id=data['election_id'],
+                   total_votes=data['total_votes'],
+                   candidates=tuple(CandidateResult(**row) for row in data['candidates']))
+
+
+def count_votes(election_id):
+    """Return [(candidate_id, name, votes)] counted from the raw vote table in ONE query.
+
+    Outer join from Candidate so candidates with no votes still show up with 0.
+    """
+    vote_count = func.count(Vote.id)
+    return db.session.query(
+        Candidate.id,
+        Candidate.name,
+        vote_count
+    ).outerjoin(
+        Vote,
+        (Vote.candidate_id == Candidate.id) & (Vote.election_id == election_id)
+    ).filter(
+        Candidate.election_id == election_id
+    ).group_by(
+        Candidate.id, Candidate.name
+    ).order_by(
+        vote_count.desc(), Candidate.id
+    ).all()
+
+
+def read_counters(election_id):
+    """Return [(candidate_id, name, votes)] from the CandidateTally counters.
+
+    Reads one row per candidate, so the cost does not grow with turnout.
+    """
+    vote_count = func.coalesce(CandidateTally.votes, 0)
+    return db.session.query(
+        Candidate.id,
+        Candidate.name,
+        vote_count
+    ).outerjoin(
+        CandidateTally, CandidateTally.candidate_id == Candidate.id
+    ).filter(
+        Candidate.election_id == election_id
+    ).order_by(
+        vote_count.desc(), Candidate.id
+    ).all()
+
+
+def bump_tally_version(election_id, votes=0):
+    """Mark an election's tally as changed (invalidates results ETags).
+
+    `votes` new ballots are added to Election.vote_count in the same UPDATE.
+    """
+    db.session.execute(
+        Election.__table__.update()
+        .where(Election.id == election_id)
+        .values(tally_version=Election.tally_version + 1, tally_updated_at=utcnow(),
+                vote_count=Election.vote_count + votes)
+    )
+
+
+def add_to_counter(election_id, candidate_id, votes):
+    """Add `votes` to a candidate's counter inside the caller's transaction.
+
+    On SQLite and PostgreSQL this is one INSERT .. ON CONFLICT DO UPDATE, so
+    two first ballots for a candidate can't race to create its counter row
+    (the loser's whole transaction, ballot included, would be rolled back).
+    Other databases get an UPDATE, then an INSERT if there was no row.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.session.execute(
+            insert(CandidateTally.__table__)
+            .values(candidate_id=candidate_id, election_id=election_id, votes=votes)
+            .on_conflict_do_update(index_elements=[CandidateTally.candidate_id],
+                                   set_={'votes': CandidateTally.votes + votes})
+        )
+        return
+    updated = db.session.execute(
+        CandidateTally.__table__.update()
+        .where(CandidateTally.candidate_id == candidate_id)
+        .values(votes=CandidateTally.votes + votes)
+    ).rowcount
+    if not updated:
+        db.session.execute(CandidateTally.__table__.insert(),
+                           {'candidate_id': candidate_id, 'election_id': election_id, 'votes': votes})
+
+
+def increment_counter(election_id, candidate_id):
+    """Add one vote to a candidate's counter inside the caller's transaction.
+
+    The election's tally_version and vote_count are bumped in the same transaction.
+    """
+    bump_tally_version(election_id, votes=1)
+    add_to_counter(election_id, candidate_id, 1)
+
+
+def reconcile_counters(election_id=None):
+    """Rebuild counters from the raw vote table.
+
+    Returns a list of (election_id, candidate_id, counter_value, actual_votes)
+    for every counter that had drifted. Caller commits. Archived elections are
+    skipped: their votes have moved to the archive database (see archive.py).
+    Corrections are applied as deltas through add_to_counter, so a ballot
+    counted between the recount and the fix isn't overwritten.
+    """
+    query = db.session.query(Candidate.election_id).join(Election, Election.id == Candidate.election_id).filter(
+        Election.archived_at.is_(None))
+    if election_id is not None:
+        query = query.filter(Candidate.election_id == election_id)
+    election_ids = [id for (id,) in query.distinct().all()]
+
+    drift = []
+    for eid in election_ids:
+        drifted = len(drift)
+        # Counters and counts come from ONE statement, so they describe the same moment
+        counted = select(Vote.candidate_id, func.count(Vote.id).label('votes')).where(
+            Vote.election_id == eid).group_by(Vote.candidate_id).subquery()
+        rows = db.session.query(
+            Candidate.id,
+            # A missing counter row reads as 0 (see read_counters)
+            func.coalesce(CandidateTally.votes, 0),
+            func.coalesce(counted.c.votes, 0)
+        ).outerjoin(
+            CandidateTally, CandidateTally.candidate_id == Candidate.id
+        ).outerjoin(
+            counted, counted.c.candidate_id == Candidate.id
+        ).filter(
+            Candidate.election_id == eid
+        ).all()
+        for candidate_id, stored, actual in rows:
+            if stored != actual:
+                drift.append((eid, candidate_id, stored, actual))
+                add_to_counter(eid, candidate_id, actual - stored)
+        if len(drift) > drifted:
+            bump_tally_version(eid)
+    return drift
+
+
+def build_tally(election_id, rows):
+    """Turn (candidate_id, name, votes) rows into an immutable TallyResult."""
+    total_votes = sum(votes for _, _, votes in rows)
+    candidates = tuple(
+        CandidateResult(
+            candidate_id=candidate_id,
+            name=name,
+            votes=votes,
+            percentage=(votes / total_votes) * 100 if total_votes > 0 else 0
+        )
+        for candidate_id, name, votes in rows
+    )
+    return TallyResult(election_id=election_id, total_votes=total_votes, candidates=candidates)
+
+
+def compute_tally(election_id):
+    """Tally an election from the per-candidate counters (one O(candidates) query)."""
+    return build_tally(election_id, read_counters(election_id))
+
+
+def compute_tally_from_votes(election_id):
+    """Tally an election straight from the vote table (one GROUP BY over its votes)."""
+    return build_tally(election_id, count_votes(election_id))
@@ -0,0 +1,91 @@
+# tests/conftest.py
+# Shared fixtures: one app per test run (the extensions are module-level
+# singletons, see create_app), bound to a scratch SQLite file that is
+# emptied before every test. Never touches instance/election.db.
+import os
+import sys
+import datetime
+
+import pytest
+
+# Make the project modules importable when run as `python -m pytest` from anywhere
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1')
+
+
+@pytest.fixture(scope='session')
+def _app(tmp_path_factory):
+    from app import create_app
+    directory = tmp_path_factory.mktemp('db')
+    return create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(directory / 'election.db'),
+        'ARCHIVE_DATABASE_URL': 'sqlite:///' + str(directory / 'archive.db'),
+        'VOTE_INGEST_MODE': 'direct',
+        'LIVE_TICK_INTERVAL': 0.02,
+        'LIVE_KEEPALIVE': 0.2,
+    })
+
+
+@pytest.fixture
+def app(_app):
+    """The app, inside an app context, with freshly created (empty) tables."""
+    from models import db
+    from cache import results_cache
+    with _app.app_context():
+        db.drop_all()
+        db.create_all()
+        results_cache.clear()
+        yield _app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_election(app):
+    """make_election(candidates=3, voters=0, ended=False) -> (election_id, [candidate ids], [voter ids])"""
+    from models import db, Election, Candidate, User
+
+    def make(candidates=3, voters=0, ended=False):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        election = Election(name='Test Election', position='Test',
+                            start_time=now - datetime.timedelta(days=2),
+                            end_time=now - datetime.timedelta(days=1) if ended else now + datetime.timedelta(days=1),
+                            is_active=True)
+        db.session.add(election)
+        db.session.flush()
+        rows = [Candidate(name=f'Candidate {i}', election_id=election.id) for i in range(candidates)]
+        db.session.add_all(rows)
+        voter_ids = [f'TV{election.id:03d}{i:05d}' for i in range(voters)]
+        if voter_ids:
+            db.session.execute(User.__table__.insert(), [
+                {'id': user_id, 'password_hash': '', 'is_admin': False, 'has_voted': False}
+                for user_id in voter_ids])
+        db.session.commit()
+        return election.id, [candidate.id for candidate in rows], voter_ids
+    return make
+
+
+@pytest.fixture
+def query_plan(app):
+    """query_plan(fn, *args) -> SQLite's EXPLAIN QUERY PLAN of the last statement fn(*args) runs."""
+    from sqlalchemy import event
+    from models import db
+
+    def plan(fn, *args):
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            fn(*args)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        statement, parameters = statements[-1]
+        return ' '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+            'EXPLAIN QUERY PLAN ' + statement, parameters))
+    return plan
@@ -0,0 +1,62 @@
+# tests/test_api.py
+import pytest
+
+from models import db, User
+
+PASSWORD = 'test-password'
+
+
+def _login(client, user_id, is_admin=False):
+    user = User(id=user_id, is_admin=is_admin)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    client.post('/login', data={'user_id': user_id, 'password': PASSWORD})
+
+
+@pytest.fixture
+def elections(make_election):
+    """(running election id, ended election id)"""
+    running, _, _ = make_election()
+    ended, _, _ = make_election(ended=True)
+    return running, ended
+
+
+def test_list_hides_running_turnout_from_voters(app, elections):
+    running, ended = elections
+    client = app.test_client()
+    response = client.get('/api/v1/elections')
+    items = {item['id']: item for item in response.get_json()['items']}
+    assert 'vote_count' not in items[running]
+    assert items[ended]['vote_count'] == 0
+    assert response.cache_control.public
+
+    # Asked for explicitly: still left out, and the helper columns don't leak in
+    items = client.get('/api/v1/elections?fields=name,vote_count').get_json()['items']
+    assert items == [{'name': 'Test Election'}, {'name': 'Test Election', 'vote_count': 0}]
+
+    _login(client, 'VOTER')
+    assert 'vote_count' not in client.get(f'/api/v1/elections/{running}').get_json()
+    assert 'vote_count' not in client.get('/api/v1/me/elections').get_json()['available'][0]
+
+
+def test_list_shows_running_turnout_to_admins(app, elections):
+    running, _ = elections
+    client = app.test_client()
+    _login(client, 'ADMIN', is_admin=True)
+    response = client.get(f'/api/v1/elections/{running}?fields=vote_count')
+    assert response.get_json() == {'vote_count': 0}
+    assert not response.cache_control.public
+
+
+def test_results_public_only_when_shareable(app, elections):
+    _, ended = elections
+    client = app.test_client()
+    assert client.get(f'/api/v1/elections/{ended}/results').cache_control.public
+
+    # A flash waiting in the session makes the response this visitor's own
+    with client.session_transaction() as session:
+        session['_flashes'] = [('info', 'hello')]
+    response = client.get(f'/api/v1/elections/{ended}/results')
+    assert response.status_code == 200
+    assert not response.cache_control.public
@@ -0,0 +1,88 @@
+# tests/test_export.py
+import io
+import csv
+import datetime
+
+import pytest
+
+import export
+
+CHUNK_SIZE = 7
+VOTES = 3 * CHUNK_SIZE + 2
+TIMESTAMP = datetime.datetime(2025, 4, 10, 13, 10, 5, 123456, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def election(app, make_election, monkeypatch):
+    """An ended election with VOTES ballots and as many turnout rows; every third timestamp is missing."""
+    from models import db, Vote, UserVoteStatus
+    monkeypatch.setitem(app.config, 'EXPORT_CHUNK_SIZE', CHUNK_SIZE)
+    election_id, candidate_ids, voter_ids = make_election(candidates=3, voters=VOTES, ended=True)
+
+    def timestamp(i):
+        return None if i % 3 == 0 else TIMESTAMP + datetime.timedelta(seconds=i)
+    db.session.execute(Vote.__table__.insert(), [
+        {'election_id': election_id, 'candidate_id': candidate_ids[i % 3], 'timestamp': timestamp(i)}
+        for i in range(VOTES)])
+    db.session.execute(UserVoteStatus.__table__.insert(), [
+        {'election_id': election_id, 'user_id': user_id, 'timestamp': timestamp(i)}
+        for i, user_id in enumerate(voter_ids)])
+    db.session.commit()
+    return election_id
+
+
+def _export(election_id, table, fmt, archived=False):
+    from flask import current_app
+    return list(export.export_election(election_id, table, fmt, current_app.config['EXPORT_CHUNK_SIZE'],
+                                       archived=archived))
+
+
+def _expected(election_id, table):
+    """The table's rows as read_columnar returns them, in export order."""
+    from models import db, Vote, UserVoteStatus
+    if table == 'votes':
+        rows = db.session.query(Vote.id, Vote.candidate_id, Vote.timestamp).filter_by(
+            election_id=election_id).order_by(Vote.candidate_id, Vote.id).all()
+        names = ('vote_id', 'candidate_id', 'timestamp')
+    else:
+        rows = db.session.query(UserVoteStatus.id, UserVoteStatus.user_id, UserVoteStatus.timestamp).filter_by(
+            election_id=election_id).order_by(UserVoteStatus.id).all()
+        names = ('status_id', 'user_id', 'timestamp')
+    return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+
+
+@pytest.mark.parametrize('table', export.TABLES)
+def test_csv_chunks_hold_at_most_chunk_size_rows(election, table):
+    chunks = _export(election, table, 'csv')
+    rows = [list(csv.reader(io.StringIO(chunk.decode('utf-8')))) for chunk in chunks]
+    header = rows[0].pop(0)
+    assert header[0] == export.TABLES[table][1][0][0]
+    assert all(len(chunk) <= CHUNK_SIZE for chunk in rows)
+    assert sum(map(len, rows)) == VOTES
+    # Missing timestamps are written as empty fields
+    assert sum(row[-1] == '' for chunk in rows for row in chunk) == len(range(0, VOTES, 3))
+
+
+@pytest.mark.parametrize('table', export.TABLES)
+def test_columnar_round_trips(election, table):
+    header, blocks = export.read_columnar(io.BytesIO(b''.join(_export(election, table, 'columnar'))))
+    blocks = list(blocks)
+    assert header['table'] == table
+    assert header['election_id'] == election
+    assert all(0 < len(block['timestamp']) <= CHUNK_SIZE for block in blocks)
+
+    expected = _expected(election, table)
+    assert {name: [value for block in blocks for value in block[name]] for name in expected} == expected
+    assert expected['timestamp'].count(None) == len(range(0, VOTES, 3))
+    if table == 'votes':
+        assert set(header['candidates']) == {str(id) for id in expected['candidate_id']}
+
+
+def test_archived_export_matches_live_export(election):
+    from models import db, Election
+    from archive import archive_election
+    before = {(table, fmt): b''.join(_export(election, table, fmt)) for table in export.TABLES for fmt in export.FORMATS}
+    archive_election(db.session.get(Election, election), chunk_size=CHUNK_SIZE, pause=0)
+    assert _expected(election, 'votes')['vote_id'] == []
+    for (table, fmt), data in before.items():
+        assert b''.join(_export(election, table, fmt, archived=True)) == data
@@ -0,0 +1,80 @@
+# tests/test_httpcache.py
+import datetime
+
+from werkzeug.http import http_date
+
+from models import db, User, Election
+from dashboard import listing_version, bump_listing_version
+from timeutil import utcnow
+
+PASSWORD = 'test-password'
+
+
+def _login(client, is_admin=False):
+    user = User(id='VIEWER', is_admin=is_admin)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    client.post('/login', data={'user_id': 'VIEWER', 'password': PASSWORD})
+
+
+def test_index_etag_follows_listing_changes(app, make_election):
+    client = app.test_client()
+    make_election()
+    bump_listing_version()
+    db.session.commit()
+    first = client.get('/')
+    assert first.status_code == 200 and first.cache_control.public
+    assert client.get('/', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # Another election: the listing counter moves
+    make_election()
+    bump_listing_version()
+    db.session.commit()
+    second = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+
+    # An election closes: the nearest passed boundary moves
+    Election.query.filter_by(id=1).update({'end_time': utcnow() - datetime.timedelta(seconds=1)})
+    db.session.commit()
+    assert client.get('/', headers={'If-None-Match': second.headers['ETag']}).status_code == 200
+
+
+def test_listing_version_never_scans_elections(app, make_election, query_plan):
+    for _ in range(3):
+        make_election()
+    plan = query_plan(listing_version, utcnow())
+    assert 'SCAN election' not in plan
+    assert 'ix_election_end_time' in plan and 'ix_election_active_start' in plan
+
+
+def test_if_modified_since_only_for_shareable_pages(app, make_election):
+    client = app.test_client()
+    election_id, _, _ = make_election(ended=True)
+    response = client.get(f'/results/{election_id}')
+    assert response.cache_control.public
+    since = {'If-Modified-Since': response.headers['Last-Modified']}
+    assert client.get(f'/results/{election_id}', headers=since).status_code == 304
+
+    # The same date from a signed-in viewer proves nothing about their copy
+    _login(client)
+    assert client.get(f'/results/{election_id}', headers=since).status_code == 200
+
+
+def test_if_modified_since_from_before_the_end(app, make_election):
+    client = app.test_client()
+    election_id, _, _ = make_election(ended=True)
+    election = db.session.get(Election, election_id)
+    # A copy taken while the election was still running (no ballots since)
+    since = {'If-Modified-Since': http_date(election.end_time - datetime.timedelta(hours=1))}
+    response = client.get(f'/results/{election_id}', headers=since)
+    assert response.status_code == 200
+    assert response.last_modified == election.end_time.replace(microsecond=0)
+
+
+def test_footer_clock_runs_client_side(app):
+    from timeutil import display_timezone
+    body = app.test_client().get('/').get_data(as_text=True)
+    footer = body.split('<footer')[1]
+    assert 'id="footer-clock"' in footer
+    assert datetime.datetime.now(display_timezone()).strftime('%Y-%m-%d') not in footer
@@ -0,0 +1,93 @@
+# tests/test_live.py
+import time
+import threading
+
+import live
+from live import live_feed
+
+SUBSCRIBERS = 20
+TIMEOUT = 10
+
+
+def _read_until(stream, done, received):
+    """Collect messages from one stream until `done(message)`, or give up after TIMEOUT."""
+    deadline = time.monotonic() + TIMEOUT
+    for message in stream:
+        received.append(message)
+        if done(message) or time.monotonic() > deadline:
+            return
+
+
+def _settle():
+    """Wait until the publisher has no subscribers left and has finished its last tick."""
+    deadline = time.monotonic() + TIMEOUT
+    while live_feed.subscriber_count() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    ticks = None
+    while ticks != live_feed.ticks and time.monotonic() < deadline:
+        ticks = live_feed.ticks
+        time.sleep(live_feed.tick_interval * 5)
+
+
+def test_stream_fans_out_one_aggregation_per_tick(app, make_election, monkeypatch):
+    from ballot import cast_ballot
+    election_id, candidate_ids, voter_ids = make_election(candidates=3, voters=1)
+
+    collected, counter_reads = [], []
+    collect, read_counters = live.LiveFeed._collect, live.read_counters
+    monkeypatch.setattr(live.LiveFeed, '_collect',
+                        lambda self, election_ids: collected.append(list(election_ids)) or collect(self, election_ids))
+    monkeypatch.setattr(live, 'read_counters',
+                        lambda election_id: counter_reads.append(election_id) or read_counters(election_id))
+    _settle()
+    ticks_before = live_feed.ticks
+
+    # Half the subscribers are admins (turnout + tally), half see turnout only
+    streams = [live_feed.stream(election_id, include_tally=i % 2 == 0) for i in range(SUBSCRIBERS)]
+    received = [[] for _ in streams]
+
+    def first_snapshot(message):
+        return message.startswith('event: turnout')
+
+    def after_ballot(message):
+        return message.startswith('event: turnout') and '"votes":1,' in message
+
+    threads = [threading.Thread(target=_read_until, args=(stream, first_snapshot, messages))
+               for stream, messages in zip(streams, received)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    assert live_feed.subscriber_count(election_id) == SUBSCRIBERS
+
+    cast_ballot(voter_ids[0], election_id, candidate_ids[1])
+    updates = [[] for _ in streams]
+    threads = [threading.Thread(target=_read_until, args=(stream, after_ballot, messages))
+               for stream, messages in zip(streams, updates)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    for stream in streams:
+        stream.close()
+    _settle()
+
+    # Every subscriber got the snapshot on connect and then the ballot
+    for i, (first, update) in enumerate(zip(received, updates)):
+        assert first[0].startswith('retry: ')
+        assert '"votes":0,' in first[-1]
+        assert after_ballot(update[-1])
+        if i % 2 == 0:
+            assert '"full":true' in first[-1]
+            assert update[-1].endswith(f'"full":false,"candidates":{{"{candidate_ids[1]}":1}}}}\n\n')
+        else:
+            assert 'event: tally' not in first[-1] + update[-1]
+    # ... rendered once and shared by the turnout-only streams
+    assert len({id(update[-1]) for update in updates[1::2]}) == 1
+
+    # One aggregation per tick however many streams are open, and the
+    # counters re-read only when the election changed (connect, ballot)
+    assert len(collected) == live_feed.ticks - ticks_before
+    assert all(election_ids == [election_id] for election_ids in collected)
+    assert counter_reads == [election_id, election_id]
+    assert live_feed.subscriber_count() == 0
@@ -0,0 +1,42 @@
+# tests/test_roster.py
+import pytest
+
+from models import db, User
+from roster import voter_page
+
+IDS = ['CS001', 'CS002', 'CS1%0', 'CSX', 'Cs003', 'CT001', 'EE001', 'CS_01']
+
+
+@pytest.fixture
+def roster(app):
+    db.session.execute(User.__table__.insert(), [
+        {'id': user_id, 'password_hash': '', 'is_admin': False, 'has_voted': False} for user_id in IDS])
+    db.session.commit()
+
+
+@pytest.mark.parametrize('prefix, expected', [
+    ('CS', ['CS001', 'CS002', 'CS1%0', 'CSX', 'CS_01']),
+    ('CS0', ['CS001', 'CS002']),
+    ('CS1%', ['CS1%0']),
+    ('CS_', ['CS_01']),
+    ('Cs', ['Cs003']),
+    ('EE001', ['EE001']),
+    ('ZZ', []),
+])
+def test_prefix_search(roster, prefix, expected):
+    page = voter_page(10, prefix=prefix)
+    assert [voter.id for voter in page.voters] == sorted(expected)
+
+
+def test_prefix_search_pages(roster):
+    first = voter_page(2, prefix='CS')
+    second = voter_page(2, after=first.next_after, prefix='CS')
+    back = voter_page(2, before=second.prev_before, prefix='CS')
+    assert [voter.id for voter in first.voters + second.voters] == ['CS001', 'CS002', 'CS1%0', 'CSX']
+    assert back.voters == first.voters
+
+
+def test_prefix_search_uses_the_primary_key(roster, query_plan):
+    plan = query_plan(voter_page, 10, None, None, 'CS0')
+    assert 'SEARCH user USING COVERING INDEX sqlite_autoindex_user_1 (id>? AND id<?)' in plan
+    assert 'SCAN user' not in plan
@@ -0,0 +1,41 @@
+# tests/test_stats.py
+from models import db, User, SiteCounter
+from stats import bump_counter, read_counters, reconcile_stats
+
+
+def test_bump_counter_creates_and_adds(app):
+    bump_counter('users', 3)
+    bump_counter('users', -1)
+    db.session.commit()
+    assert db.session.query(SiteCounter.name, SiteCounter.value).all() == [('users', 2)]
+
+
+def test_reconcile_stats_corrects_drift(app, make_election):
+    # Rows inserted behind the counters' back: 4 voters, 2 elections
+    make_election(voters=2)
+    make_election(voters=2)
+    bump_counter('users', 10)
+    db.session.commit()
+
+    drift = reconcile_stats()
+    db.session.commit()
+    assert drift == [('users', 10, 4), ('elections', 0, 2)]
+    assert read_counters() == {'users': 4, 'elections': 2}
+    assert reconcile_stats() == []
+
+
+def test_reconcile_stats_counts_votes(app, make_election):
+    from ballot import cast_ballot
+    from models import Election
+    election_id, candidate_ids, voter_ids = make_election(voters=2)
+    reconcile_stats()
+    db.session.commit()
+    for user_id in voter_ids:
+        cast_ballot(user_id, election_id, candidate_ids[0])
+    Election.query.filter_by(id=election_id).update({'vote_count': 5})
+    db.session.commit()
+
+    assert reconcile_stats() == [(f'election {election_id} votes', 5, 2)]
+    db.session.commit()
+    assert db.session.get(Election, election_id).vote_count == 2
+    assert User.query.count() == read_counters()['users']
@@ -0,0 +1,43 @@
+# tests/test_tally.py
+from models import db, CandidateTally
+from tally import compute_tally, reconcile_counters
+
+
+def _vote(election_id, candidate_ids, voter_ids, choices):
+    from ballot import cast_ballot
+    for user_id, choice in zip(voter_ids, choices):
+        cast_ballot(user_id, election_id, candidate_ids[choice])
+
+
+def _counters(election_id):
+    return dict(db.session.query(CandidateTally.candidate_id, CandidateTally.votes).filter_by(
+        election_id=election_id).all())
+
+
+def test_reconcile_counters_fixes_drift(app, make_election):
+    election_id, candidate_ids, voter_ids = make_election(candidates=3, voters=5)
+    _vote(election_id, candidate_ids, voter_ids, [0, 0, 1, 1, 1])
+    # One counter too high, one missing
+    CandidateTally.query.filter_by(candidate_id=candidate_ids[0]).update({'votes': 7})
+    CandidateTally.query.filter_by(candidate_id=candidate_ids[1]).delete()
+    db.session.commit()
+
+    drift = reconcile_counters(election_id)
+    db.session.commit()
+    assert sorted(drift) == [(election_id, candidate_ids[0], 7, 2), (election_id, candidate_ids[1], 0, 3)]
+    assert _counters(election_id) == {candidate_ids[0]: 2, candidate_ids[1]: 3}
+    assert [row.votes for row in compute_tally(election_id).candidates] == [3, 2, 0]
+    assert reconcile_counters(election_id) == []
+
+
+def test_upgrade_database_seeds_missing_counters(app, make_election):
+    from migrations import upgrade_database
+    election_id, candidate_ids, voter_ids = make_election(candidates=2, voters=3)
+    _vote(election_id, candidate_ids, voter_ids, [1, 1, 0])
+    # As on a database from before the counters existed
+    CandidateTally.query.delete()
+    db.session.commit()
+
+    assert 'recounted 2 candidate tallies' in upgrade_database()
+    assert _counters(election_id) == {candidate_ids[0]: 1, candidate_ids[1]: 2}
+    assert 'recounted 2 candidate tallies' not in upgrade_database()
@@ -0,0 +1,57 @@
+# tests/test_voting.py
+import datetime
+
+import pytest
+
+PASSWORD = 'test-password'
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as a voter."""
+    from models import db, User
+    voter = User(id='VOTER', is_admin=False)
+    voter.set_password(PASSWORD)
+    db.session.add(voter)
+    db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'user_id': 'VOTER', 'password': PASSWORD})
+    return client
+
+
+def _ballots(election_id):
+    from models import Vote
+    return Vote.query.filter_by(election_id=election_id).count()
+
+
+def _move(election_id, **changes):
+    from models import db, Election
+    Election.query.filter_by(id=election_id).update(changes)
+    db.session.commit()
+
+
+def test_vote_is_recorded_while_open(client, make_election):
+    election_id, candidate_ids, _ = make_election()
+    response = client.post(f'/vote/{election_id}', data={'candidate_id': candidate_ids[0]})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/results/{election_id}')
+    assert _ballots(election_id) == 1
+
+
+@pytest.mark.parametrize('state', ['inactive', 'not started', 'ended', 'archived'])
+def test_vote_is_refused_unless_open(client, make_election, state):
+    election_id, candidate_ids, _ = make_election()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if state == 'inactive':
+        _move(election_id, is_active=False)
+    elif state == 'not started':
+        _move(election_id, start_time=now + datetime.timedelta(hours=1))
+    elif state == 'ended':
+        _move(election_id, end_time=now - datetime.timedelta(seconds=1))
+    else:
+        _move(election_id, archived_at=now)
+    for method in ('get', 'post'):
+        response = getattr(client, method)(f'/vote/{election_id}', data={'candidate_id': candidate_ids[0]})
+        assert response.status_code == 302
+        assert response.headers['Location'] == '/'
+    assert _ballots(election_id) == 0
@@ -0,0 +1,46 @@
+# timeutil.py
+# Election timestamps are stored as UTC (see models.UTCDateTime). Admins enter
+# and voters read times in the portal's display timezone (Config.DISPLAY_TIMEZONE,
+# IST by default); conversion happens only at the edges: when a form is saved
+# and when a template renders a timestamp.
+import datetime
+from functools import lru_cache
+from flask import current_app
+
+
+@lru_cache(maxsize=None)
+def _timezone(name):
+    import pytz  # Deferred: only needed once a time is displayed or entered
+    return pytz.timezone(name)
+
+
+def display_timezone():
+    return _timezone(current_app.config['DISPLAY_TIMEZONE'])
+
+
+def utcnow():
+    """Timezone-aware current UTC time; compare this against stored election times."""
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def local_to_utc(value):
+    """Interpret a naive wall-clock datetime in the display timezone and return aware UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = display_timezone().localize(value)
+    return value.astimezone(datetime.timezone.utc)
+
+
+@lru_cache(maxsize=4096)
+def _format_local(value, fmt, tz_name):
+    return value.astimezone(_timezone(tz_name)).strftime(fmt)
+
+
+def format_local(value, fmt='%Y-%m-%d %H:%M %Z'):
+    """Jinja filter `localtime`: render a stored UTC timestamp in the display timezone."""
+    if value is None:
+        return 'N/A'
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return _format_local(value, fmt, current_app.config['DISPLAY_TIMEZONE'])
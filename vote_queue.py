@@ -0,0 +1,292 @@
+# vote_queue.py
+# Optional queued ballot ingestion (VOTE_INGEST_MODE = 'queue').
+#
+# vote() hands the ballot to VoteQueue.submit(), which checks that the
+# election is taking ballots and for a duplicate (database + ballots still
+# in the queue), appends the ballot to
+# an append-only journal file and returns a receipt once the journal has
+# been fsynced. A background writer group-commits: every fsync covers all
+# ballots that arrived since the last one, and every database transaction
+# writes a whole batch into user_vote_status/vote/candidate_tally.
+#
+# After a crash, start() replays journal entries that were never marked
+# committed. Replay is idempotent: a ballot whose UserVoteStatus row already
+# exists is skipped by the unique constraint.
+#
+# Only the serving process runs the queue: wsgi.py (and `python app.py`) call
+# start(), while CLI commands and scripts that merely build the app never
+# touch the journal. start() takes an exclusive lock on the journal file, so
+# a second process can't replay ballots the server hasn't committed yet or
+# truncate the file under it. The in-memory duplicate check only covers this
+# process too, so run queue mode with a single worker process (threads are fine).
+import os
+import json
+import time
+import datetime
+import uuid
+import atexit
+import logging
+import threading
+from collections import Counter
+from typing import NamedTuple
+from sqlalchemy.exc import IntegrityError
+from models import db, Election, Vote, UserVoteStatus
+from ballot import AlreadyVoted, ElectionClosed, cast_ballot
+from tally import bump_tally_version, add_to_counter
+from timeutil import utcnow
+from eligibility import eligibility_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: no journal lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts to write a batch the database keeps rejecting (doubling up to the cap)
+RETRY_DELAY = 0.05
+MAX_RETRY_DELAY = 5
+
+
+class Ballot(NamedTuple):
+    seq: int
+    receipt: str
+    user_id: str
+    election_id: int
+    candidate_id: int
+    cast_at: str  # ISO-8601 UTC
+
+
+class VoteQueue:
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._buffer = []          # accepted, not yet journaled
+        self._pending = set()      # (user_id, election_id) accepted but not yet in the database
+        self._next_seq = 1
+        self._durable_seq = 0      # highest seq fsynced to the journal
+        self._journal = None
+        self._writer = None
+        self._stopping = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('VOTE_INGEST_MODE', 'direct') == 'queue'
+        self.journal_path = app.config.get('VOTE_JOURNAL_PATH') or os.path.join(app.instance_path, 'vote-journal.log')
+        self.batch_size = app.config.get('VOTE_QUEUE_BATCH_SIZE', 500)
+        self.flush_interval = app.config.get('VOTE_QUEUE_FLUSH_INTERVAL', 0.01)
+        app.extensions['vote_queue'] = self
+
+    @property
+    def running(self):
+        return self._writer is not None and self._writer.is_alive()
+
+    # --- Journal -----------------------------------------------------------
+
+    def _read_journal(self):
+        """Return (ballots not marked committed, highest seq seen)."""
+        ballots, committed, max_seq = {}, 0, 0
+        if not os.path.exists(self.journal_path):
+            return [], 0
+        with open(self.journal_path, 'r', encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Torn final write: never fsynced, so never receipted
+                if 'committed' in entry:
+                    committed = max(committed, entry['committed'])
+                else:
+                    ballot = Ballot(**entry)
+                    ballots[ballot.seq] = ballot
+                    max_seq = max(max_seq, ballot.seq)
+        return [b for seq, b in sorted(ballots.items()) if seq > committed], max_seq
+
+    def _append(self, entries):
+        for entry in entries:
+            self._journal.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def start(self):
+        """Lock the journal, replay what it still holds and start the writer thread.
+
+        Call it only in the process that serves votes. Raises RuntimeError if
+        another process holds the journal.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        if fcntl is not None:
+            try:
+                # Released when the file is closed, or when the process dies
+                fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._journal.close()
+                raise RuntimeError(f'Another process is running the vote queue on {self.journal_path}')
+        uncommitted, max_seq = self._read_journal()
+        self._next_seq = max_seq + 1
+        if uncommitted:
+            logger.warning('Replaying %d uncommitted ballot(s) from %s', len(uncommitted), self.journal_path)
+            self._apply(uncommitted)
+            self._append([{'committed': uncommitted[-1].seq}])
+        self._truncate_if_idle()
+        self._stopping = False
+        self._writer = threading.Thread(target=self._run, name='vote-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.stop)
+
+    def _truncate_if_idle(self):
+        # Everything in the file is committed once nothing is buffered or pending
+        with self._lock:
+            if not self._buffer and not self._pending:
+                self._journal.truncate(0)
+
+    def stop(self):
+        """Flush everything still queued, then stop the writer thread."""
+        if self._writer is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._writer.join()
+        self._writer = None
+        self._journal.close()
+
+    # --- Voter side --------------------------------------------------------
+
+    def submit(self, user_id, election_id, candidate_id):
+        """Accept a ballot; returns its Ballot (with receipt) once it is durable.
+
+        Raises ElectionClosed unless the election is taking ballots, AlreadyVoted
+        if the user has a ballot in the database or in the queue, and
+        RuntimeError if this process isn't running the queue.
+        """
+        if not self.running:
+            raise RuntimeError('The vote queue is not running in this process.')
+        election = db.session.get(Election, election_id)
+        accepts_ballots = election is not None and election.accepts_ballots(utcnow())
+        already_voted = accepts_ballots and UserVoteStatus.query.filter_by(
+            user_id=user_id, election_id=election_id).first()
+        # Hand the connection back to the pool before waiting on the writer, which needs one too
+        db.session.rollback()
+        if not accepts_ballots:
+            raise ElectionClosed(f'Election {election_id} is not taking ballots')
+        if already_voted:
+            raise AlreadyVoted(f'{user_id} has already voted in election {election_id}')
+        with self._cond:
+            key = (user_id, election_id)
+            if key in self._pending:
+                raise AlreadyVoted(f'{user_id} has already voted in election {election_id}')
+            ballot = Ballot(seq=self._next_seq, receipt=uuid.uuid4().hex[:12], user_id=user_id,
+                            election_id=election_id, candidate_id=candidate_id,
+                            cast_at=utcnow().isoformat())
+            self._next_seq += 1
+            self._pending.add(key)
+            self._buffer.append(ballot)
+            self._cond.notify_all()
+            # Wait for the group fsync that covers this ballot
+            while self._durable_seq < ballot.seq:
+                self._cond.wait(timeout=1)
+                if self._durable_seq < ballot.seq and not self.running:
+                    raise RuntimeError('The vote queue stopped before your ballot was saved.')
+        return ballot
+
+    # --- Writer side -------------------------------------------------------
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._stopping:
+                    self._cond.wait()
+                if not self._buffer and self._stopping:
+                    return
+            # Let a group of ballots gather before paying for the fsync
+            time.sleep(self.flush_interval)
+            with self._cond:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:len(batch)]
+            self._append([ballot._asdict() for ballot in batch])
+            with self._cond:
+                self._durable_seq = batch[-1].seq
+                self._cond.notify_all()
+
+            self._apply(batch)
+            self._append([{'committed': batch[-1].seq}])
+            with self._cond:
+                self._pending.difference_update((b.user_id, b.election_id) for b in batch)
+            self._truncate_if_idle()
+
+    def _apply(self, batch):
+        """Write a batch to the database in one transaction (row by row if a duplicate slips in).
+
+        Retries until it succeeds, backing off up to MAX_RETRY_DELAY: the ballots
+        are safe in the journal, and the writer thread must never die with
+        ballots outstanding.
+        """
+        with self.app.app_context():
+            one_by_one = False
+            attempt = 0
+            while True:
+                try:
+                    if one_by_one:
+                        self._insert_one_by_one(batch)
+                    else:
+                        self._insert_batch(batch)
+                    break
+                except IntegrityError:
+                    db.session.rollback()
+                    if not one_by_one:
+                        one_by_one = True
+                        continue
+                    # _insert_one_by_one handles these itself; anything left is a bug, so keep retrying loudly
+                    delay = self._retry_delay(attempt, batch)
+                except Exception:
+                    # Locked past every cast_ballot retry, connection lost, ...
+                    db.session.rollback()
+                    delay = self._retry_delay(attempt, batch)
+                time.sleep(delay)
+                attempt += 1
+            # Dashboards cached between submit() and this commit still offer the election
+            for b in batch:
+                eligibility_cache.invalidate(b.user_id)
+            db.session.remove()
+
+    def _retry_delay(self, attempt, batch):
+        delay = min(MAX_RETRY_DELAY, RETRY_DELAY * (2 ** attempt))
+        logger.warning('Writing %d queued ballot(s) failed (attempt %d); retrying in %.2fs',
+                       len(batch), attempt + 1, delay, exc_info=True)
+        return delay
+
+    def _insert_batch(self, batch):
+        cast_at = [datetime.datetime.fromisoformat(b.cast_at) for b in batch]
+        db.session.execute(UserVoteStatus.__table__.insert(), [
+            {'user_id': b.user_id, 'election_id': b.election_id, 'timestamp': ts} for b, ts in zip(batch, cast_at)])
+        db.session.execute(Vote.__table__.insert(), [
+            {'election_id': b.election_id, 'candidate_id': b.candidate_id, 'timestamp': ts} for b, ts in zip(batch, cast_at)])
+        per_candidate = Counter((b.election_id, b.candidate_id) for b in batch)
+        for (election_id, candidate_id), count in per_candidate.items():
+            add_to_counter(election_id, candidate_id, count)
+        for election_id, count in Counter(b.election_id for b in batch).items():
+            bump_tally_version(election_id, votes=count)
+        db.session.commit()
+
+    def _insert_one_by_one(self, batch):
+        for b in batch:
+            try:
+                cast_ballot(b.user_id, b.election_id, b.candidate_id)
+            except AlreadyVoted:
+                # Already committed before a crash or an earlier attempt, or voted through another process
+                logger.warning('Dropping duplicate queued ballot %s for %s in election %s',
+                               b.receipt, b.user_id, b.election_id)
+            except IntegrityError:
+                # Can never be written (its candidate or election was deleted); the journal keeps it
+                logger.error('Dropping queued ballot %s for %s in election %s that cannot be recorded',
+                             b.receipt, b.user_id, b.election_id, exc_info=True)
+
+
+vote_queue = VoteQueue()
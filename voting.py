@@ -0,0 +1,85 @@
+# voting.py
+# Casting a ballot.
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash
+from flask_login import login_required, current_user
+from models import db, Election, Candidate, UserVoteStatus
+from ballot import cast_ballot, AlreadyVoted, BallotContention, ElectionClosed
+from eligibility import eligibility_cache
+from timeutil import utcnow
+
+voting = Blueprint('voting', __name__)
+
+
+# Vote route
+@voting.route('/vote/<int:election_id>', methods=['GET', 'POST'])
+@login_required
+def vote(election_id):
+    # Get the election
+    election = Election.query.get_or_404(election_id)
+
+    # Check if election is active, within its time window and not archived
+    if not election.accepts_ballots(utcnow()):
+        flash('This election is not currently active.', 'warning')
+        return redirect(url_for('public.index'))
+
+    # Check if user already voted in this election
+    if UserVoteStatus.query.filter_by(user_id=current_user.id, election_id=election_id).first():
+        flash('You have already voted in this election.', 'info')
+        return redirect(url_for('public.results', election_id=election_id))
+
+    # Get candidates
+    candidates = Candidate.query.filter_by(election_id=election_id).all()
+    if not candidates:
+        flash('No candidates available for this election.', 'warning')
+        return redirect(url_for('public.index'))
+
+    if election.is_ranked:
+        # One rank select per candidate
+        from forms import ranked_vote_form
+        form = ranked_vote_form(candidates)
+    else:
+        # Create form with dynamic choices
+        from forms import VoteForm
+        form = VoteForm()
+        form.candidate_id.choices = [(c.id, c.name) for c in candidates]
+
+    if form.validate_on_submit():
+        try:
+            ranking = form.ranking() if election.is_ranked else None
+            candidate_id = ranking[0] if ranking else form.candidate_id.data
+            # Set up by create_app() only when VOTE_INGEST_MODE = 'queue'; ranked ballots
+            # don't fit its one-candidate journal, so they are always written directly
+            vote_queue = current_app.extensions.get('vote_queue')
+            if vote_queue is not None and ranking is None:
+                # Journaled and group-committed in the background; durable once this returns
+                ballot = vote_queue.submit(current_user.id, election_id, form.candidate_id.data)
+                eligibility_cache.invalidate(current_user.id)
+                flash(f'Your vote has been recorded (receipt {ballot.receipt}). Thank you for voting!', 'success')
+                return redirect(url_for('public.results', election_id=election_id))
+            # Status row, vote and counter in one insert-or-fail transaction (see ballot.py)
+            cast_ballot(current_user.id, election_id, candidate_id,
+                        max_retries=current_app.config['BALLOT_MAX_RETRIES'],
+                        base_delay=current_app.config['BALLOT_RETRY_DELAY'],
+                        ranking=ranking)
+            # This voter's dashboard is now stale (the tally's version was bumped with the ballot)
+            eligibility_cache.invalidate(current_user.id)
+            flash('Your vote has been recorded. Thank you for voting!', 'success')
+            return redirect(url_for('public.results', election_id=election_id))
+        except AlreadyVoted:
+            eligibility_cache.invalidate(current_user.id)
+            flash('You have already voted in this election.', 'info')
+            return redirect(url_for('public.results', election_id=election_id))
+        except ElectionClosed:
+            flash('This election is not currently active.', 'warning')
+            return redirect(url_for('public.index'))
+        except BallotContention as e:
+            flash(str(e), 'warning')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'An error occurred while recording your vote: {e}', 'danger')
+
+    return render_template('vote.html',
+                          title=f'Vote: {election.name}',
+                          election=election,
+                          form=form,
+                          candidates=candidates)
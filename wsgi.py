@@ -0,0 +1,17 @@
+# wsgi.py
+# Production entry point. Each server worker imports this module once and
+# gets its own app (and its own database engine and connection pool):
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Any WSGI server can serve `wsgi:app`, e.g. `waitress-serve wsgi:app` on Windows.
+# `python app.py` remains the single-process development server.
+import logging
+from app import create_app, start_vote_queue
+
+app = create_app()
+# This is the serving process, so it owns the vote journal (VOTE_INGEST_MODE = 'queue')
+start_vote_queue(app)
+
+if app.config['SECRET_KEY'] == 'a-very-secret-key-change-this':
+    logging.getLogger(__name__).warning('SECRET_KEY is the built-in default; set the SECRET_KEY environment variable')